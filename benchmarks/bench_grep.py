@@ -0,0 +1,62 @@
+"""
+Сравнение скорости grep -r в одном процессе и в пуле процессов.
+
+Запуск:
+    python -m benchmarks.bench_grep                 # дерево 100 MB, 1/2/4/8 процессов
+    python -m benchmarks.bench_grep 1024 1 4 8      # дерево 1 GB, свои значения -j
+
+Создаётся временное дерево из файлов по 256 KB с редкими совпадениями,
+после чего замеряется время `grep -r -j N needle <tree>`.
+"""
+import contextlib
+import io
+import pathlib
+import random
+import sys
+import tempfile
+import time
+
+import src.history as history
+from src.commands.grep import cmd_grep
+
+DEFAULT_SIZE_MB = 100
+DEFAULT_JOBS = [1, 2, 4, 8]
+FILE_SIZE = 256 * 1024
+FILES_PER_DIR = 100
+WORDS = ["alpha", "beta", "gamma", "delta", "epsilon", "zeta", "eta", "theta", "iota", "kappa"]
+
+
+def make_tree(root: pathlib.Path, size_mb: int):
+    """
+    Создаёт в root дерево файлов общим объёмом size_mb мегабайт; примерно одна строка из 1000 содержит 'needle'.
+    """
+    rng = random.Random(0)
+    lines = [" ".join(rng.choice(WORDS) for _ in range(12)) + "\n" for _ in range(1000)]
+    lines[500] = lines[500].rstrip("\n") + " needle\n"
+    block = "".join(lines).encode()
+    content = (block * (FILE_SIZE // len(block) + 1))[:FILE_SIZE]
+    for i in range(size_mb * 1024 * 1024 // FILE_SIZE):
+        directory = root / f"dir{i // FILES_PER_DIR}"
+        directory.mkdir(exist_ok=True)
+        (directory / f"file{i}.txt").write_bytes(content)
+
+
+def main(size_mb: int, jobs_list):
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = pathlib.Path(tmp)
+        history.HISTORY_PATH = tmp_path / ".history"
+        tree = tmp_path / "tree"
+        tree.mkdir()
+        make_tree(tree, size_mb)
+        print(f"{'jobs':>5} {'seconds':>9} {'MB/s':>9}")
+        for jobs in jobs_list:
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                cmd_grep(["-r", "-j", str(jobs), "needle", str(tree)])
+            elapsed = time.perf_counter() - started
+            print(f"{jobs:>5} {elapsed:>9.2f} {size_mb / elapsed:>9.1f}")
+
+
+if __name__ == "__main__":
+    argv = [int(i) for i in sys.argv[1:]]
+    main(argv[0] if argv else DEFAULT_SIZE_MB, argv[1:] or DEFAULT_JOBS)
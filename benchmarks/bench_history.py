@@ -0,0 +1,58 @@
+"""
+Замер времени чтения конца истории при разном её размере.
+
+Запуск:
+    python -m benchmarks.bench_history                 # 1k, 10k, 100k, 1M записей
+    python -m benchmarks.bench_history 1000 10000000   # свои размеры
+
+Для каждого размера создаётся временный файл истории, после чего замеряются
+`history 10` (get_last_history), поиск команды для undo и номер последней команды.
+Время не должно расти вместе с размером истории.
+"""
+import json
+import pathlib
+import sys
+import tempfile
+import timeit
+
+import src.history as history
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+REPEAT = 200
+
+
+def fill_history(path: pathlib.Path, size: int):
+    """
+    Записывает в path size записей истории вперемешку cp и ls.
+    """
+    with open(path, "w") as f:
+        for number in range(1, size + 1):
+            cmd = "cp" if number % 3 == 0 else "ls"
+            record = {"cmd": cmd, "src": f"file{number}", "dest": f"copy{number}",
+                      "user_input": f"{cmd} file{number} copy{number}", "number": number}
+            f.write(json.dumps(record) + "\n")
+    history.rebuild_history_index()
+
+
+def measure(func) -> float:
+    """
+    Возвращает лучшее среднее время вызова func в микросекундах.
+    """
+    best = min(timeit.repeat(func, number=REPEAT, repeat=3))
+    return best / REPEAT * 1e6
+
+
+def main(sizes):
+    with tempfile.TemporaryDirectory() as tmp:
+        history.HISTORY_PATH = pathlib.Path(tmp) / ".history"
+        print(f"{'records':>10} {'history 10, us':>15} {'undo lookup, us':>16} {'last number, us':>16}")
+        for size in sizes:
+            fill_history(history.HISTORY_PATH, size)
+            last = measure(lambda: history.get_last_history(10))
+            undo = measure(history.get_last_history_undo_cmd)
+            number = measure(history.get_last_history_number)
+            print(f"{size:>10} {last:>15.1f} {undo:>16.1f} {number:>16.1f}")
+
+
+if __name__ == "__main__":
+    main([int(i) for i in sys.argv[1:]] or DEFAULT_SIZES)
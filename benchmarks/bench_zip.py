@@ -0,0 +1,68 @@
+"""
+Сравнение скорости zip в одном потоке и в пуле потоков на смешанном дереве.
+
+Запуск:
+    python -m benchmarks.bench_zip                  # дерево 256 MB, 1/2/4/8 потоков
+    python -m benchmarks.bench_zip 5120 1 4 8       # дерево 5 GB, свои значения -j
+
+Дерево состоит из текстовых файлов (хорошо сжимаются), случайных данных (не сжимаются)
+и файлов .jpg со случайными данными (сохраняются без сжатия по расширению).
+Для каждого -j выводится время, скорость и размер архива.
+"""
+import os
+import pathlib
+import random
+import sys
+import tempfile
+import time
+
+import src.history as history
+from src.commands.zip_archives import cmd_zip
+
+DEFAULT_SIZE_MB = 256
+DEFAULT_JOBS = [1, 2, 4, 8]
+FILE_SIZE = 1024 * 1024
+FILES_PER_DIR = 100
+WORDS = ["alpha", "beta", "gamma", "delta", "epsilon", "zeta", "eta", "theta", "iota", "kappa"]
+
+
+def make_tree(root: pathlib.Path, size_mb: int):
+    """
+    Создаёт в root дерево файлов по 1 MB общим объёмом size_mb мегабайт:
+    половина — текст, четверть — случайные данные, четверть — случайные данные с расширением .jpg.
+    """
+    rng = random.Random(0)
+    text = "".join(" ".join(rng.choice(WORDS) for _ in range(12)) + "\n" for _ in range(20000)).encode()
+    text = (text * (FILE_SIZE // len(text) + 1))[:FILE_SIZE]
+    for i in range(size_mb * 1024 * 1024 // FILE_SIZE):
+        directory = root / f"dir{i // FILES_PER_DIR}"
+        directory.mkdir(exist_ok=True)
+        kind = i % 4
+        if kind < 2:
+            (directory / f"file{i}.txt").write_bytes(text)
+        else:
+            name = f"file{i}.bin" if kind == 2 else f"photo{i}.jpg"
+            (directory / name).write_bytes(os.urandom(FILE_SIZE))
+
+
+def main(size_mb: int, jobs_list):
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = pathlib.Path(tmp)
+        history.HISTORY_PATH = tmp_path / ".history"
+        tree = tmp_path / "tree"
+        tree.mkdir()
+        make_tree(tree, size_mb)
+        archive = tmp_path / "archive.zip"
+        print(f"{'jobs':>5} {'seconds':>9} {'MB/s':>9} {'archive MB':>11}")
+        for jobs in jobs_list:
+            started = time.perf_counter()
+            cmd_zip(["-j", str(jobs), str(tree), str(archive)])
+            elapsed = time.perf_counter() - started
+            archive_mb = archive.stat().st_size / 1024 / 1024
+            print(f"{jobs:>5} {elapsed:>9.2f} {size_mb / elapsed:>9.1f} {archive_mb:>11.1f}")
+            archive.unlink()
+
+
+if __name__ == "__main__":
+    argv = [int(i) for i in sys.argv[1:]]
+    main(argv[0] if argv else DEFAULT_SIZE_MB, argv[1:] or DEFAULT_JOBS)
@@ -1,9 +1,10 @@
 from .filesystem import cmd_cp, cmd_mv, cmd_rm
 from .grep import cmd_grep
-from .info import cmd_ls, cmd_pwd
+from .info import cmd_du, cmd_ls, cmd_pwd
 from .tar_archives import cmd_tar, cmd_untar
+from .trash import cmd_trash
 from .undo import cmd_undo
-from .viewer import cmd_cat, cmd_cd, cmd_history
+from .viewer import cmd_cat, cmd_cd, cmd_head, cmd_history, cmd_tail
 from .zip_archives import cmd_unzip, cmd_zip
 
 commands = {
@@ -21,6 +22,10 @@ commands = {
     "tar": cmd_tar,
     "untar": cmd_untar,
     "grep": cmd_grep,
+    "trash": cmd_trash,
+    "du": cmd_du,
+    "head": cmd_head,
+    "tail": cmd_tail,
 }
 
 __all__ = [
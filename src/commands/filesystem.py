@@ -2,21 +2,62 @@ import pathlib
 import shutil
 
 from errors.shell_errors import ShellError
-from src.history import create_history_record, get_last_history_number
-from src.utils import ensure_exists, move_to_trash, normalize
+from src.history import HistorySession, create_history_record, get_last_history_number
+from src.utils import ensure_exists, move_to_trash, normalize, parse_jobs
+from src.utils.copying import copy_file, copy_tree_parallel, move_path, pending_move_target
 
 
+def copy_with_report(src, dest, verbose: bool = False, metadata: bool = False) -> str:
+    """
+    Копирует файл через copy_file и при verbose печатает, каким способом он скопирован.
+
+    Возвращает название способа копирования.
+    """
+    strategy = copy_file(src, dest, metadata)
+    if verbose:
+        print(f"cp: '{src}' -> '{dest}' ({strategy})")
+    return strategy
+
+def copy_tree(src: pathlib.Path, dest: pathlib.Path, jobs: int, verbose: bool = False) -> int:
+    """
+    Рекурсивно копирует директорию src в dest.
+
+    jobs: количество потоков; при jobs > 1 файлы копируются параллельно,
+        а ошибки отдельных файлов печатаются и не прерывают копирование
+    verbose: печатать способ копирования каждого файла
+
+    Возвращает количество файлов, которые не удалось скопировать.
+    """
+    def copy_function(path, target):
+        return copy_with_report(path, target, verbose, metadata=True)
+
+    if jobs == 1:
+        shutil.copytree(src, dest, copy_function=copy_function)
+        return 0
+    errors = copy_tree_parallel(src, dest, jobs, copy_function=copy_function)
+    for path, e in errors:
+        print(f"cp: cannot copy '{path}': {e.strerror or e}")
+    return len(errors)
+
 def cmd_cp(args):
     """
     Копирует файлы или каталоги.
 
     args: список аргументов команды cp.
         Если указан '-r', копируется директория.
+        Если указан '-j N', директории копируются в N потоков с выводом прогресса.
+        Если указан '-v', для каждого файла печатается способ копирования
+        (reflink, copy_file_range, sendfile или buffered).
 
     Вызывает ошибку ShellError при неправильных аргументах или попытке копирования директории без '-r'.
+    Если часть файлов не удалось скопировать, ShellError вызывается после записи в историю,
+    чтобы скопированное можно было отменить через undo.
     Создает запись в истории команд.
     """
-    clean_args = [i for i in args if i != '-r']
+    jobs, cp_args = parse_jobs(args, "cp")
+    verbose = '-v' in cp_args
+    clean_args = [i for i in cp_args if i not in ['-r', '-v']]
+    failed = 0
 
     if len(clean_args) < 2:
         raise ShellError(f"cp: not enough arguments: '{args}'")
@@ -24,22 +65,22 @@ def cmd_cp(args):
         dest = normalize(clean_args[-1])
         if not dest.is_dir():
             raise ShellError(f"cp: not a directory: '{dest}'")
-        last_cmd_number = get_last_history_number() + 1
-        for p in clean_args[:-1]:
-            src = ensure_exists(normalize(p), "cp")
-            if src.is_dir() and '-r' not in args:
-                raise ShellError(f"cp: is a directory: '{src}'. Use -r option.")
-            elif src.is_dir():
-                target = dest / src.name
-                if target.exists():
-                    raise ShellError(f"cp: destination directory '{target}' already exists.")
-                shutil.copytree(src, target)
+        with HistorySession() as session:
+            for p in clean_args[:-1]:
+                src = ensure_exists(normalize(p), "cp")
+                if src.is_dir() and '-r' not in args:
+                    raise ShellError(f"cp: is a directory: '{src}'. Use -r option.")
+                elif src.is_dir():
+                    target = dest / src.name
+                    if target.exists():
+                        raise ShellError(f"cp: destination directory '{target}' already exists.")
+                    failed += copy_tree(src, target, jobs, verbose)
 
-            else:
-                shutil.copy(src, dest / src.name)
-            record = {"cmd": "cp", "src": str(src), "dest": str(dest / src.name),
-                      "user_input": "cp " + " ".join(args), "number": last_cmd_number, "multi": len(clean_args)-1}
-            create_history_record(record)
+                else:
+                    copy_with_report(src, dest / src.name, verbose)
+                record = {"cmd": "cp", "src": str(src), "dest": str(dest / src.name),
+                          "user_input": "cp " + " ".join(args), "number": session.number, "multi": len(clean_args)-1}
+                create_history_record(record)
     else:
         if '-r' in args:
             src = ensure_exists(normalize(clean_args[0]), "cp")
@@ -59,7 +100,7 @@ def cmd_cp(args):
             if not dest.parent.exists():
                 raise ShellError(f"cp: no such directory: '{dest}'")
             if not src.is_dir():
-                shutil.copy(src, dest)
+                copy_with_report(src, dest, verbose)
                 last_cmd_number = get_last_history_number() + 1
                 record = {"cmd": "cp", "src": str(src), "dest": str(dest), "is_dir": False,
                           "user_input": "cp " + " ".join(args), "number": last_cmd_number}
@@ -67,23 +108,40 @@ def cmd_cp(args):
             else:
                 if dest.exists():
                     raise ShellError(f"cp: destination directory '{dest}' already exists.")
-                shutil.copytree(src, dest)
+                failed = copy_tree(src, dest, jobs, verbose)
                 last_cmd_number = get_last_history_number() + 1
                 record = {"cmd": "cp", "src": str(src), "dest": str(dest), "is_dir": True,
                           "user_input": "cp " + " ".join(args), "number": last_cmd_number}
                 create_history_record(record)
 
         else:
-            src = ensure_exists(normalize(args[0]), "cp")
-            dest = pathlib.Path(args[1]).expanduser().resolve()
+            src = ensure_exists(normalize(clean_args[0]), "cp")
+            dest = pathlib.Path(clean_args[1]).expanduser().resolve()
             if src.is_dir():
                 raise ShellError(f"cp: is a directory: '{src}'. Use -r option.")
-            shutil.copy(src, dest)
+            copy_with_report(src, dest, verbose)
             last_cmd_number = get_last_history_number() + 1
             record = {"cmd": "cp", "src": str(src), "dest": str(dest), "is_dir": False,
                       "user_input": "cp " + " ".join(args), "number": last_cmd_number}
             create_history_record(record)
+    if failed:
+        raise ShellError(f"cp: {failed} files could not be copied")
+
+
+def move_target(src: pathlib.Path, dest: pathlib.Path) -> pathlib.Path:
+    """
+    Возвращает итоговый путь при перемещении src в dest.
+
+    Если dest — директория, src перемещается внутрь неё. Если перемещение src было прервано,
+    возвращает путь незавершённого перемещения, чтобы оно продолжилось.
 
+    Вызывает ShellError, если незавершённое перемещение src шло в другое место.
+    """
+    target = dest / src.name if dest.is_dir() else dest
+    pending = pending_move_target(src)
+    if pending is not None and pending not in (target, dest):
+        raise ShellError(f"mv: unfinished move of '{src}' to '{pending}'; run 'mv {src} {pending}' to resume it")
+    return pending or target
 
 def cmd_mv(args):
     """
@@ -91,47 +149,49 @@ def cmd_mv(args):
 
         args: список аргументов команды mv.
             Последний аргумент — путь назначения.
+            Если указан '-j N', перемещение на другую файловую систему копирует данные в N потоков.
+
+        Сначала выполняется переименование; между файловыми системами данные копируются частями
+        с выводом скорости и оставшегося времени, после чего исходные файлы удаляются.
+        Прерванное перемещение продолжается повторным запуском той же команды.
 
         Вызывает ShellError при ошибках аргументов или при попытке перемещения директории в саму себя.
         Создает запись в истории команд.
         """
-    if len(args) < 2:
+    jobs, mv_args = parse_jobs(args, "mv")
+    if len(mv_args) < 2:
         raise ShellError(f"mv: not enough arguments: '{args}'")
-    elif len(args) > 2:
-        dest = normalize(args[-1])
+    elif len(mv_args) > 2:
+        dest = normalize(mv_args[-1])
         if not dest.is_dir():
             raise ShellError(f"mv: not a directory: '{dest}'")
-        last_cmd_number = get_last_history_number() + 1
-        for p in args[:-1]:
-            src = ensure_exists(normalize(p), "mv")
-            if src.is_dir():
-                try:
-                    if dest.relative_to(src):
-                        raise ShellError(f"mv: cannot move directory into itself: '{dest}'")
-                except ValueError:
-                    pass
-            else:
-                dest = dest / src.name
-            shutil.move(src, dest)
-            record = {"cmd": "mv", "src": str(src), "dest": str(dest),
-                      "user_input": "mv " + " ".join(args), "number": last_cmd_number, "multi": len(args)}
-            create_history_record(record)
+        with HistorySession() as session:
+            for p in mv_args[:-1]:
+                src = ensure_exists(normalize(p), "mv")
+                if src.is_dir():
+                    try:
+                        if dest.relative_to(src):
+                            raise ShellError(f"mv: cannot move directory into itself: '{dest}'")
+                    except ValueError:
+                        pass
+                target = move_target(src, dest)
+                cross_device = move_path(src, target, jobs)
+                record = {"cmd": "mv", "src": str(src), "dest": str(target), "cross_device": cross_device,
+                          "user_input": "mv " + " ".join(args), "number": session.number, "multi": len(mv_args) - 1}
+                create_history_record(record)
     else:
-        src = ensure_exists(normalize(args[0]), "mv")
-        dest = pathlib.Path(args[1]).expanduser().resolve()
+        src = ensure_exists(normalize(mv_args[0]), "mv")
+        dest = pathlib.Path(mv_args[1]).expanduser().resolve()
         if src == dest:
             raise ShellError(f"mv: '{src}' and '{dest}' are identical (not moved).")
         if src.is_dir() and dest.is_file():
             raise ShellError(f"mv: cannot overwrite non-directory '{dest}' with directory '{src}'")
         if str(dest.resolve()).startswith(str(src.resolve()) + "/"):
             raise ShellError(f"mv: cannot move directory into itself: '{dest}'")
-        if src.is_dir() and dest.is_file():
-            raise ShellError(f"mv: cannot overwrite non-directory '{dest}' with directory '{src}'")
-        if src.is_file() and dest.is_dir():
-            dest = dest / src.name
-        shutil.move(src, dest)
+        target = move_target(src, dest)
+        cross_device = move_path(src, target, jobs)
         last_cmd_number = get_last_history_number() + 1
-        record = {"cmd": "mv", "src": str(src), "dest": str(dest),
+        record = {"cmd": "mv", "src": str(src), "dest": str(target), "cross_device": cross_device,
                   "user_input": "mv " + " ".join(args), "number": last_cmd_number}
         create_history_record(record)
 
@@ -155,43 +215,45 @@ def cmd_rm(args):
         raise ShellError(f"rm: not enough arguments: '{args}'")
     else:
         if not recursive:
-            last_cmd_number = get_last_history_number() + 1
-            for path in clean_args:
-                src = ensure_exists(normalize(path), "rm")
-                if src.resolve() == pathlib.Path('/'):
-                    raise ShellError("rm: forbidden to delete root directory '/'")
-                if src.resolve() == pathlib.Path('..').resolve():
-                    raise ShellError("rm: forbidden to delete parent directory '..'")
-                if src.is_dir():
-                    raise ShellError(f"rm: '{src}' is a directory. Use '-r' option.")
-                if src.is_file():
+            with HistorySession() as session:
+                for path in clean_args:
+                    src = ensure_exists(normalize(path), "rm")
+                    if src.resolve() == pathlib.Path('/'):
+                        raise ShellError("rm: forbidden to delete root directory '/'")
+                    if src.resolve() == pathlib.Path('..').resolve():
+                        raise ShellError("rm: forbidden to delete parent directory '..'")
+                    if src.is_dir():
+                        raise ShellError(f"rm: '{src}' is a directory. Use '-r' option.")
+                    if src.is_file():
+                        ans = 'y'
+                        if not without_ask:
+                            ans = input(f"rm: delete file: '{src}'? [y/n] ")
+                        if ans.lower() == "y":
+                            trash_path = move_to_trash(src, session.number)
+                            record = {"cmd": "rm", "src": str(src), "trash_path": str(trash_path),
+                                      "trash_root": str(trash_path.parent),
+                                      "user_input": "rm " + " ".join(args), "number": session.number,"multi":len(clean_args)}
+                            create_history_record(record)
+                        else:
+                            print(f"rm: skipped file: '{src}'")
+                            record = {"cmd": "rm", "skipped": True, "user_input": "rm " + " ".join(args),
+                                      "number": session.number,"multi": len(clean_args)}
+                            create_history_record(record)
+        elif '-r' in args:
+            with HistorySession() as session:
+                for path in clean_args:
+                    src = ensure_exists(normalize(path), "rm")
                     ans = 'y'
                     if not without_ask:
-                        ans = input(f"rm: delete file: '{src}'? [y/n] ")
+                        ans = input(f"rm: delete file/directory: '{src}'? [y/n] ")
                     if ans.lower() == "y":
-                        trash_path = move_to_trash(src)
+                        trash_path = move_to_trash(src, session.number)
                         record = {"cmd": "rm", "src": str(src), "trash_path": str(trash_path),
-                                  "user_input": "rm " + " ".join(args), "number": last_cmd_number,"multi":len(clean_args)}
+                                  "trash_root": str(trash_path.parent),
+                                  "user_input": "rm " + " ".join(args), "number": session.number,"multi":len(clean_args)}
                         create_history_record(record)
                     else:
-                        print(f"rm: skipped file: '{src}'")
+                        print(f"rm: skipped file/directory: '{src}'")
                         record = {"cmd": "rm", "skipped": True, "user_input": "rm " + " ".join(args),
-                                  "number": last_cmd_number,"multi": len(clean_args)}
+                                  "number": session.number,"multi":len(clean_args)}
                         create_history_record(record)
-        elif '-r' in args:
-            last_cmd_number = get_last_history_number() + 1
-            for path in clean_args:
-                src = ensure_exists(normalize(path), "rm")
-                ans = 'y'
-                if not without_ask:
-                    ans = input(f"rm: delete file/directory: '{src}'? [y/n] ")
-                if ans.lower() == "y":
-                    trash_path = move_to_trash(src)
-                    record = {"cmd": "rm", "src": str(src), "trash_path": str(trash_path),
-                              "user_input": "rm " + " ".join(args), "number": last_cmd_number,"multi":len(clean_args)}
-                    create_history_record(record)
-                else:
-                    print(f"rm: skipped file/directory: '{src}'")
-                    record = {"cmd": "rm", "skipped": True, "user_input": "rm " + " ".join(args),
-                              "number": last_cmd_number,"multi":len(clean_args)}
-                    create_history_record(record)
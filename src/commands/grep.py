@@ -1,10 +1,242 @@
+import codecs
+import fnmatch
+import functools
+import itertools
+import mmap
 import os
+import pathlib
 import re
+from collections.abc import Callable, Iterator
+from concurrent.futures import ProcessPoolExecutor
 
 from errors.shell_errors import ShellError
+from src.constants import TRASH_DIR_NAME, TRASH_DIRS, TRASH_PATH
 from src.history import create_history_record, get_last_history_number
-from src.utils import normalize
+from src.utils import normalize, parse_jobs, write_lines
+from src.utils.grep_index import candidate_files
+from src.utils.ignore import is_ignored, load_ignore_rules
 
+# Меньше этого количества файлов или байт поиск выполняется в одном процессе:
+# запуск пула процессов обходится дороже самого поиска
+PARALLEL_MIN_FILES = 64
+PARALLEL_MIN_BYTES = 16 * 1024 * 1024
+# Сколько файлов отправляется процессу за один раз
+PARALLEL_CHUNK_SIZE = 16
+# Размер участка, в котором за раз считаются переводы строк при быстром поиске
+COUNT_CHUNK_SIZE = 16 * 1024 * 1024
+# Сколько первых байт файла проверяется, чтобы определить, двоичный ли он
+BINARY_SNIFF_SIZE = 8 * 1024
+# Опции с шаблонами имён, которые можно указывать несколько раз
+GREP_GLOB_OPTIONS = ("--include", "--exclude", "--exclude-dir")
+
+
+def _skip_escape(pattern: str, i: int) -> int:
+    """
+    Возвращает позицию после escape-последовательности с буквой или цифрой, начинающейся с '\\' в позиции i,
+    вместе с её операндами: '\\xhh', '\\uhhhh', '\\Uhhhhhhhh', '\\N{...}', восьмеричные коды и ссылки на группы.
+    """
+    char = pattern[i + 1]
+    i += 2
+    if char in "xuU":
+        return i + {"x": 2, "u": 4, "U": 8}[char]
+    if char == "N" and pattern[i:i + 1] == "{":
+        end = pattern.find("}", i)
+        return len(pattern) if end == -1 else end + 1
+    if char.isdigit():
+        digits = 0
+        while digits < 2 and pattern[i:i + 1].isdigit():
+            i += 1
+            digits += 1
+    return i
+
+def _quantifier(pattern: str, i: int):
+    """
+    Разбирает квантификатор в позиции i: '?', '*', '+' или '{m}', '{m,}', '{m,n}' (с '?' или '+' после него).
+
+    Возвращает кортеж (позиция после квантификатора, минимальное число повторений) или (i, 1),
+    если квантификатора нет. '{' без правильного квантификатора — обычный символ, как в re.
+    """
+    char = pattern[i:i + 1]
+    if char in ("?", "*", "+"):
+        minimum = 1 if char == "+" else 0
+        end = i + 1
+    elif char == "{":
+        match = re.match(r"\{(\d*)(?:,(\d*))?\}", pattern[i:])
+        if match is None or (not match.group(1) and match.group(2) is None):
+            return i, 1
+        minimum = int(match.group(1) or 0)
+        end = i + match.end()
+    else:
+        return i, 1
+    if pattern[end:end + 1] in ("?", "+"):
+        end += 1
+    return end, minimum
+
+def required_literal(pattern: str):
+    """
+    Находит в регулярном выражении самую длинную строку, которая обязана быть в каждом совпадении.
+
+    pattern: текст регулярного выражения
+
+    Учитываются только символы вне групп, классов и альтернатив. Escape-последовательности с буквой
+    или цифрой ('\\d', '\\x41', '\\1' и т. п.) строкой не считаются. Символ под квантификатором
+    с минимумом 0 ('?', '*', '{0,n}') необязателен; под '+' или '{m,n}' с m > 0 он обязателен один раз,
+    но строка на нём заканчивается. Для выражений с '|' или флагами '(?...)' строка не ищется.
+
+    Возвращает кортеж (строка или None, True если всё выражение — обычная строка).
+    """
+    if "|" in pattern.replace("\\|", "") or "(?" in pattern:
+        return None, False
+    runs = []
+    run = ""
+    depth = 0
+    pure = True
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        literal = None
+        if char == "\\" and i + 1 < len(pattern):
+            if pattern[i + 1].isalnum():
+                i = _skip_escape(pattern, i)
+            else:
+                literal = pattern[i + 1]
+                i += 2
+        elif char == "[":
+            i += 2 if pattern[i + 1:i + 2] == "^" else 1
+            if pattern[i:i + 1] == "]":
+                i += 1
+            while i < len(pattern) and pattern[i] != "]":
+                i += 2 if pattern[i] == "\\" else 1
+            i += 1
+        else:
+            if char == "(":
+                depth += 1
+            elif char == ")":
+                depth -= 1
+            elif char not in ".^$*+?{" or (char == "{" and _quantifier(pattern, i)[0] == i):
+                literal = char
+            i += 1
+        end, minimum = _quantifier(pattern, i)
+        quantified = end != i
+        i = end
+        if literal is None or depth or minimum == 0:
+            pure = False
+            runs.append(run)
+            run = ""
+        elif quantified:
+            pure = False
+            runs.append(run + literal)
+            run = ""
+        else:
+            run += literal
+    runs.append(run)
+    longest = max(runs, key=len)
+    return longest or None, pure and bool(longest)
+
+@functools.cache
+def _case_variants() -> dict:
+    """
+    Возвращает словарь ASCII-буква -> символы вне ASCII, которые re без учёта регистра считает
+    равными ей (например, 'k' и знак Кельвина, 's' и 'ſ', 'i' и 'ı'/'İ').
+
+    Таблица строится по самому re; такие символы есть только в базовой плоскости Юникода.
+    """
+    letter_re = re.compile("[a-z]", re.IGNORECASE)
+    variants: dict[str, list[str]] = {}
+    for code in range(0x80, 0x10000):
+        char = chr(code)
+        if letter_re.fullmatch(char):
+            for letter in "abcdefghijklmnopqrstuvwxyz":
+                if re.fullmatch(letter, char, re.IGNORECASE):
+                    variants.setdefault(letter, []).append(char)
+    return variants
+
+@functools.lru_cache(maxsize=32)
+def _literal_finder(pattern: str, flags: int):
+    """
+    Готовит быстрый поиск по байтам для выражения pattern с флагами flags.
+
+    Возвращает кортеж (finder, pure) или None, если быстрый поиск неприменим.
+        finder: bytes-строка для bytes.find или bytes-выражение, если нужен поиск без учёта регистра
+        pure: True, если совпадение finder уже означает совпадение выражения
+    """
+    literal, pure = required_literal(pattern)
+    if literal is None:
+        return None
+    if not flags & re.IGNORECASE:
+        return literal.encode(), pure
+    if not literal.isascii():
+        return None
+    # bytes-выражение без учёта регистра сравнивает только ASCII, поэтому символы вне ASCII,
+    # равные букве в режиме Unicode (_case_variants), перечисляются явно
+    variants = _case_variants()
+    parts = []
+    for char in literal:
+        if char.lower() in variants:
+            parts.append(f"(?:{'|'.join(map(re.escape, [char, *variants[char.lower()]]))})")
+        else:
+            parts.append(re.escape(char))
+    return re.compile("".join(parts).encode(), re.IGNORECASE), pure
+
+def index_literal(pattern_re):
+    """
+    Возвращает обязательную строку выражения для поиска по триграммному индексу или None.
+
+    Индекс хранит триграммы с ASCII-буквами в нижнем регистре, поэтому без учёта регистра
+    годится только ASCII-строка без букв, у которых есть варианты вне ASCII (_case_variants).
+    """
+    literal, _ = required_literal(pattern_re.pattern)
+    if literal is None or not pattern_re.flags & re.IGNORECASE:
+        return literal
+    if not literal.isascii() or set(literal.lower()) & _case_variants().keys():
+        return None
+    return literal
+
+def _search_lines(path, pattern_re):
+    """
+    Ищет совпадения построчно, декодируя каждую строку (медленный путь).
+    """
+    with open(path,"r",encoding='utf-8',errors="replace") as f:
+        for i,line in enumerate(f,1):
+            if pattern_re.search(line):
+                yield i, line.rstrip("\n")
+
+def _search_mapped(path, pattern_re, finder, pure: bool):
+    """
+    Ищет совпадения в отображённом в память файле (быстрый путь).
+
+    Обязательная строка ищется по всему буферу через bytes.find (или bytes-выражение),
+    и только вокруг найденных мест выделяется строка, считается её номер и при необходимости
+    проверяется полное выражение.
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            pos = 0
+            line_no = 1
+            counted = 0
+            while pos < size:
+                if isinstance(finder, bytes):
+                    hit = buf.find(finder, pos)
+                else:
+                    match = finder.search(buf, pos)
+                    hit = match.start() if match else -1
+                if hit == -1:
+                    return
+                start = buf.rfind(b"\n", 0, hit) + 1
+                end = buf.find(b"\n", hit)
+                if end == -1:
+                    end = size
+                while counted < start:
+                    step = min(start, counted + COUNT_CHUNK_SIZE)
+                    line_no += buf[counted:step].count(b"\n")
+                    counted = step
+                line = buf[start:end].decode("utf-8", errors="replace").removesuffix("\r")
+                if pure or pattern_re.search(line):
+                    yield line_no, line
+                pos = end + 1
 
 def search_in_file(path,pattern_re):
     """
@@ -13,15 +245,223 @@ def search_in_file(path,pattern_re):
     path: путь к файлу
     pattern_re: объект re.Pattern для поиска
 
+    Если в выражении есть обязательная строка, файл отображается в память и просматривается
+    целиком по байтам, а строки выделяются только вокруг найденных мест.
+    Иначе файл читается построчно. Некорректные UTF-8 последовательности заменяются на '\ufffd'.
+
     Возвращает генератор кортежей (номер_строки, строка).
+    Вызывает OSError, если файл не удалось прочитать.
+    """
+    fast = _literal_finder(pattern_re.pattern, pattern_re.flags & ~re.UNICODE)
+    if fast is not None:
+        try:
+            yield from _search_mapped(path, pattern_re, *fast)
+            return
+        except ValueError:
+            # Файл нельзя отобразить в память (например, файл из /proc)
+            pass
+    yield from _search_lines(path, pattern_re)
+
+def is_binary(path) -> bool:
+    """
+    Проверяет, является ли файл двоичным: в первых BINARY_SNIFF_SIZE байтах есть нулевой байт
+    или они не являются корректным UTF-8.
+    """
+    with open(path, "rb") as f:
+        block = f.read(BINARY_SNIFF_SIZE)
+    if b"\0" in block:
+        return True
+    try:
+        # final=False: многобайтовый символ может быть обрезан границей блока
+        codecs.getincrementaldecoder("utf-8")().decode(block, final=False)
+    except UnicodeDecodeError:
+        return True
+    return False
+
+def grep_file(path, pattern_re, skip_binary: bool = False, max_count: int | None = None,
+              count_only: bool = False):
+    """
+    Ищет совпадения в одном файле; выполняется в процессах пула.
+
+    skip_binary: не искать в двоичных файлах
+    max_count: прекратить чтение файла после max_count совпадений
+    count_only: только посчитать совпадения, не сохраняя строки
+
+    В двоичном файле строки не сохраняются: поиск останавливается на первом совпадении,
+    если не нужно количество.
+
+    Возвращает кортеж (путь, двоичный ли файл, список (номер_строки, строка), количество совпадений,
+    ошибка или None).
     """
     try:
-        with open(path,"r",encoding='utf-8') as f:
-            for i,line in enumerate(f,1):
-                if pattern_re.search(line):
-                    yield i, line.rstrip("\n")
-    except Exception:
+        binary = is_binary(path)
+        if binary and skip_binary:
+            return path, True, [], 0, None
+        if binary and not count_only:
+            max_count = 1
+        matches = itertools.islice(search_in_file(path, pattern_re), max_count)
+        if binary or count_only:
+            return path, binary, [], sum(1 for _ in matches), None
+        found = list(matches)
+        return path, False, found, len(found), None
+    except OSError as e:
+        return path, False, [], 0, e.strerror or str(e)
+
+def _is_trash(path: str) -> bool:
+    """
+    Проверяет, является ли директория корзиной.
+    """
+    return os.path.basename(path) == TRASH_DIR_NAME or path in TRASH_DIRS.values() or path == str(TRASH_PATH)
+
+def iter_files(path: pathlib.Path, recursive: bool, include=(), exclude=(), exclude_dir=(), use_ignore: bool = True):
+    """
+    Возвращает генератор файлов для поиска: сам path, если это файл,
+    или все файлы директории и её поддиректорий при recursive.
+    Файлы перебираются в отсортированном порядке, чтобы вывод был одинаковым при каждом запуске.
+
+    include: шаблоны имён файлов, в которых искать (если пусто — во всех)
+    exclude: шаблоны имён файлов, которые пропускаются
+    exclude_dir: шаблоны имён директорий, которые не обходятся
+    use_ignore: учитывать файлы .gitignore и .ignore
+
+    Исключённые и игнорируемые директории, а также корзины, отбрасываются при обходе целиком,
+    без чтения их содержимого.
+    """
+    if path.is_file():
+        yield path
+        return
+    if not recursive:
         return
+    rules: dict[str, list] = {}
+    for root, dirs, files in os.walk(path):
+        inherited = rules.pop(root, [])
+        current = load_ignore_rules(root, inherited) if use_ignore else inherited
+        kept = []
+        for name in sorted(dirs):
+            dir_path = os.path.join(root, name)
+            if _is_trash(dir_path) or any(fnmatch.fnmatch(name, p) for p in exclude_dir):
+                continue
+            if current and is_ignored(dir_path, True, current):
+                continue
+            rules[dir_path] = current
+            kept.append(name)
+        dirs[:] = kept
+        for filename in sorted(files):
+            if include and not any(fnmatch.fnmatch(filename, p) for p in include):
+                continue
+            if any(fnmatch.fnmatch(filename, p) for p in exclude):
+                continue
+            file_path = os.path.join(root, filename)
+            if current and is_ignored(file_path, False, current):
+                continue
+            if os.path.isfile(file_path):
+                yield pathlib.Path(file_path)
+
+def _is_small(files: list) -> bool:
+    """
+    Проверяет, что файлов и данных мало и параллельный поиск не окупится.
+    """
+    if len(files) >= PARALLEL_MIN_FILES:
+        return False
+    total = 0
+    for file_path in files:
+        try:
+            total += file_path.stat().st_size
+        except OSError:
+            continue
+    return total < PARALLEL_MIN_BYTES
+
+def grep_files(files, pattern_re, jobs: int = 1, **options):
+    """
+    Ищет совпадения в файлах, при jobs > 1 — в пуле из jobs процессов.
+
+    files: итератор путей к файлам
+    pattern_re: объект re.Pattern для поиска
+    jobs: количество процессов
+    options: параметры grep_file (skip_binary, max_count, count_only)
+
+    Результаты возвращаются в порядке файлов, независимо от того, какой процесс закончил первым.
+    Если файлов и данных мало, поиск выполняется в текущем процессе.
+
+    Возвращает генератор результатов grep_file.
+    """
+    search: Callable[[pathlib.Path], tuple] = functools.partial(grep_file, pattern_re=pattern_re, **options)
+    file_iter: Iterator[pathlib.Path] = iter(files)
+    if jobs > 1:
+        head = list(itertools.islice(file_iter, PARALLEL_MIN_FILES))
+        if not _is_small(head):
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                yield from pool.map(search, itertools.chain(head, file_iter), chunksize=PARALLEL_CHUNK_SIZE)
+            return
+        file_iter = iter(head)
+    for file_path in file_iter:
+        yield search(file_path)
+
+def parse_max_count(args: list):
+    """
+    Извлекает из аргументов grep ограничение '-m N' или '-mN'.
+
+    Вызывает ShellError, если число не указано или отрицательно.
+    Возвращает кортеж (число или None, аргументы без флага).
+    """
+    max_count = None
+    rest = []
+    arg_iter = iter(args)
+    for arg in arg_iter:
+        if arg != '-m' and not (arg.startswith('-m') and arg[2:].isdecimal()):
+            rest.append(arg)
+            continue
+        value = arg[2:] or next(arg_iter, None)
+        if value is None:
+            raise ShellError("grep: option '-m' requires an argument")
+        if not value.isdecimal():
+            raise ShellError(f"grep: invalid max count: '{value}'")
+        max_count = int(value)
+    return max_count, rest
+
+def format_results(results, count_only: bool = False, files_only: bool = False):
+    """
+    Превращает результаты grep_files в строки вывода.
+
+    count_only: для каждого файла печатать "<путь>:<количество совпадений>"
+    files_only: печатать только пути файлов, в которых есть совпадения
+    """
+    for file_path, binary, matches, count, error in results:
+        if error:
+            yield f"grep: {file_path}: {error}"
+        elif files_only:
+            if count:
+                yield str(file_path)
+        elif count_only:
+            yield f"{file_path}:{count}"
+        elif binary:
+            if count:
+                yield f"Binary file {file_path} matches"
+        else:
+            for ln, text in matches:
+                yield f"{file_path}:{ln}: {text}"
+
+def parse_grep_options(args: list):
+    """
+    Выделяет из аргументов grep повторяемые опции с шаблонами (GREP_GLOB_OPTIONS).
+
+    Возвращает кортеж (словарь опция -> список шаблонов, остальные аргументы).
+    Вызывает ShellError, если после опции нет шаблона.
+    """
+    options: dict[str, list[str]] = {option: [] for option in GREP_GLOB_OPTIONS}
+    rest = []
+    arg_iter = iter(args)
+    for arg in arg_iter:
+        option, sep, value = arg.partition("=")
+        if option not in GREP_GLOB_OPTIONS:
+            rest.append(arg)
+            continue
+        if not sep:
+            value = next(arg_iter, None)
+            if value is None:
+                raise ShellError(f"grep: option '{option}' requires a pattern")
+        options[option].append(value)
+    return options, rest
 
 def cmd_grep(args):
     """
@@ -30,40 +470,56 @@ def cmd_grep(args):
     args: список аргументов команды grep
         - '-r' для рекурсивного поиска в директориях
         - '-i' для игнорирования регистра
+        - '-j N' для поиска в N процессах
+        - '-I' чтобы пропускать двоичные файлы
+        - '-c' чтобы печатать для каждого файла только количество совпадений
+        - '-l' чтобы печатать только имена файлов с совпадениями (чтение файла прекращается на первом совпадении)
+        - '-m N' чтобы прекращать чтение файла после N совпадений
+        - '--include GLOB', '--exclude GLOB', '--exclude-dir GLOB' для отбора файлов и директорий по имени
+        - '--no-ignore' чтобы не учитывать файлы .gitignore и .ignore
+        - '--index' для поиска по триграммному индексу директории: индекс обновляется для изменённых файлов,
+          и регулярное выражение проверяется только в файлах, где есть все триграммы обязательной строки шаблона
         - первый аргумент без флагов: шаблон
         - второй аргумент без флагов: путь к файлу или директории
 
+    Для двоичных файлов вместо строк печатается "Binary file <путь> matches".
+    Корзины при рекурсивном поиске пропускаются.
+
     Вызывает ShellError при:
         - недостаточном количестве аргументов
         - некорректном регулярном выражении
         - неверном пути
     Создает запись в истории команд.
     """
-    if len(args) < 2:
-        raise ShellError("Usage: grep [-r] [-i] <pattern> <path>")
-    recursive = '-r' in args
-    ignore_case = '-i' in args
-    without_flags = [i for i in args if i not in ['-r','-i']]
+    jobs, grep_args = parse_jobs(args, "grep")
+    max_count, grep_args = parse_max_count(grep_args)
+    globs, grep_args = parse_grep_options(grep_args)
+    recursive = '-r' in grep_args
+    ignore_case = '-i' in grep_args
+    skip_binary = '-I' in grep_args
+    use_ignore = '--no-ignore' not in grep_args
+    use_index = '--index' in grep_args
+    count_only = '-c' in grep_args
+    files_only = '-l' in grep_args
+    without_flags = [i for i in grep_args if i not in ['-r','-i','-I','-c','-l','--no-ignore','--index']]
+    if len(without_flags) < 2:
+        raise ShellError("Usage: grep [-r] [-i] [-I] [-c] [-l] [-m N] [-j N] [--include GLOB] [--exclude GLOB] "
+                         "[--exclude-dir GLOB] [--no-ignore] [--index] <pattern> <path>")
     pattern = without_flags[0]
     path = normalize(without_flags[1])
     try:
         pattern_re = re.compile(pattern, re.IGNORECASE if ignore_case else 0)
     except re.error:
         raise ShellError(f"grep: invalid pattern '{pattern}'")
-    if path.is_file():
-        for ln,text in search_in_file(path,pattern_re):
-            output = f"{path}:{ln}: {text}"
-            print(output)
-    elif path.is_dir():
-        if recursive:
-            for root, dirs, files in os.walk(path):
-                for filename in files:
-                    file_path = path / filename
-                    if file_path.is_file():
-                        for ln, text in search_in_file(file_path, pattern_re):
-                            output = f"{file_path}:{ln}: {text}"
-                            print(output)
-    else:
+    if not path.exists():
         raise ShellError(f"grep: invalid path '{path}'")
+    files = iter_files(path, recursive, globs["--include"], globs["--exclude"], globs["--exclude-dir"], use_ignore)
+    if use_index and recursive and path.is_dir():
+        files = candidate_files(path, list(files), index_literal(pattern_re), jobs)
+    if files_only:
+        max_count = 1 if max_count is None else min(max_count, 1)
+    results = grep_files(files, pattern_re, jobs, skip_binary=skip_binary, max_count=max_count,
+                         count_only=count_only or files_only)
+    write_lines(format_results(results, count_only, files_only))
     record = {"cmd": "grep","user_input": "grep " + " ".join(args), "number": get_last_history_number() + 1}
     create_history_record(record)
@@ -1,12 +1,32 @@
+import functools
+import heapq
+import itertools
+import math
 import os
 import pathlib
 import platform
+import shutil
+import stat
+import tempfile
 from datetime import datetime
 
+try:
+    import grp
+    import pwd
+except ImportError:
+    # На Windows модулей нет, владелец и группа выводятся как "unknown"
+    grp = pwd = None  # type: ignore[assignment]
+
 from errors.shell_errors import ShellError
 from src.constants import RIGHTS
 from src.history import create_history_record, get_last_history_number
-from src.utils import ensure_exists, normalize
+from src.utils import ensure_exists, human_size, normalize, parse_jobs, write_lines
+from src.utils.walk import walk_parallel
+
+# Больше этого количества имён ls сортирует кусками во временных файлах
+LS_SORT_CHUNK = 100_000
+# Размер блока, которым читаются временные файлы при слиянии отсортированных кусков
+LS_SORT_READ_SIZE = 64 * 1024
 
 
 def cmd_pwd(args):
@@ -25,49 +45,205 @@ def cmd_pwd(args):
     create_history_record(record)
     print(pathlib.Path().cwd())
 
-def cmd_ls_detailed_info(item):
+@functools.lru_cache(maxsize=1024)
+def user_name(uid: int) -> str:
+    """
+    Возвращает имя пользователя по uid или "unknown"; результат кэшируется.
+    """
+    try:
+        return pwd.getpwuid(uid).pw_name
+    except (AttributeError, KeyError):
+        return "unknown"
+
+@functools.lru_cache(maxsize=1024)
+def group_name(gid: int) -> str:
+    """
+    Возвращает имя группы по gid или "unknown"; результат кэшируется.
+    """
+    try:
+        return grp.getgrgid(gid).gr_name
+    except (AttributeError, KeyError):
+        return "unknown"
+
+def entry_stat(item):
+    """
+    Возвращает stat файла; для битой символической ссылки — stat самой ссылки.
+
+    item: pathlib.Path или os.DirEntry (у DirEntry результат stat кэшируется)
+    """
+    try:
+        return item.stat()
+    except FileNotFoundError:
+        return item.stat(follow_symlinks=False)
+
+def cmd_ls_detailed_info(item, stats=None):
     """
         Возвращает подробную информацию о файле или директории.
 
-        item: pathlib.Path объекта файла или директории
+        item: pathlib.Path или os.DirEntry объекта файла или директории
+        stats: уже полученный stat объекта; если не указан, вызывается item.stat()
+
+        Тип, права, владелец и группа определяются по одному stat, имена владельца и группы кэшируются.
 
         Формат возвращаемой строки:
             права доступа, владелец, группа, размер, дата изменения, имя
     """
-    stats = item.stat()
+    if stats is None:
+        stats = entry_stat(item)
+    mode = stats.st_mode
 
     if platform.system() == "Windows":
-        output_r = 'd' if item.is_dir() else '-'
+        output_r = 'd' if stat.S_ISDIR(mode) else '-'
         perms = ""
         perms += "r" if os.access(item, os.R_OK) else "-"
         perms += "w" if os.access(item, os.W_OK) else "-"
         perms += "x" if os.access(item, os.X_OK) else "-"
         output_r += perms * 3
     else:
-        rights = str(oct(stats.st_mode)[-3:])
+        rights = str(oct(mode)[-3:])
         output_r = ""
-        if item.is_dir():
+        if stat.S_ISDIR(mode):
             output_r += 'd'
-        if item.is_file():
+        if stat.S_ISREG(mode):
             output_r += '-'
+        if stat.S_ISLNK(mode):
+            output_r += 'l'
         for k in rights:
             for bit in [4, 2, 1]:
                 output_r += RIGHTS[bit] if (int(k) & bit) else '-'
 
-    try:
-        owner = item.owner()
-    except Exception:
-        owner = "unknown"
-    try:
-        group = item.group()
-    except Exception:
-        group = "unknown"
+    owner = user_name(stats.st_uid)
+    group = group_name(stats.st_gid)
     size = stats.st_size
     mtime = datetime.fromtimestamp(stats.st_mtime).strftime('%Y-%m-%d %H:%M:%S')
     name = item.name
 
     return f"{output_r} {owner} {group} {size} {mtime} {name}"
 
+def _read_chunk(path: str):
+    """
+    Читает отсортированный кусок имён, записанный _spill, блоками по LS_SORT_READ_SIZE
+    и возвращает генератор имён; в памяти держится только текущий блок.
+    """
+    tail = b""
+    with open(path, "rb") as f:
+        while block := f.read(LS_SORT_READ_SIZE):
+            *names, tail = (tail + block).split(b"\0")
+            for name in names:
+                yield os.fsdecode(name)
+    if tail:
+        yield os.fsdecode(tail)
+
+def _spill(names: list, directory: str) -> str:
+    """
+    Сортирует names и записывает их во временный файл в directory; имена разделяются нулевым байтом,
+    который не может встретиться в имени файла. Возвращает путь к файлу.
+    """
+    names.sort()
+    fd, chunk_path = tempfile.mkstemp(dir=directory)
+    with os.fdopen(fd, "wb") as f:
+        f.write(b"\0".join(os.fsencode(name) for name in names))
+    return chunk_path
+
+def sorted_names(path, hidden: bool = False, chunk_size: int | None = None):
+    """
+    Читает имена в директории path и возвращает их в отсортированном порядке,
+    держа в памяти не больше chunk_size (по умолчанию LS_SORT_CHUNK) имён.
+
+    Если имён больше chunk_size, они сортируются кусками по chunk_size во временные файлы,
+    которые затем сливаются через heapq.merge.
+
+    Возвращает генератор кортежей (имя, длина самого длинного имени).
+    """
+    chunk_size = chunk_size or LS_SORT_CHUNK
+    names = []
+    chunks = []
+    max_len = 0
+    tmp = None
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                if not hidden and entry.name.startswith('.'):
+                    continue
+                names.append(entry.name)
+                max_len = max(max_len, len(entry.name))
+                if len(names) >= chunk_size:
+                    tmp = tmp or tempfile.mkdtemp(prefix="ls-sort-")
+                    chunks.append(_spill(names, tmp))
+                    names = []
+        names.sort()
+        for name in heapq.merge(names, *(_read_chunk(chunk) for chunk in chunks)):
+            yield name, max_len
+    finally:
+        if tmp:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+def _grid_rows(names, columns: int = 5):
+    """
+    Собирает имена в строки по columns штук, выравнивая по самому длинному имени.
+    Последняя строка (возможно пустая) выводится всегда, как и при печати по одному имени.
+    """
+    row = []
+    for name, max_len in names:
+        row.append(f"{name:<{max_len}}  ")
+        if len(row) == columns:
+            yield "".join(row)
+            row = []
+    yield "".join(row)
+
+def list_directory(path, hidden: bool = False, detailed: bool = False, unsorted: bool = False):
+    """
+    Печатает содержимое директории path.
+
+    hidden: показывать скрытые файлы
+    detailed: подробный вывод (cmd_ls_detailed_info)
+    unsorted: печатать объекты в порядке чтения директории, по одному в строке, не дожидаясь конца чтения
+
+    Директория читается через os.scandir; для подробного вывода на каждый объект
+    выполняется один stat. Отсортированный вывод держит в памяти не больше LS_SORT_CHUNK имён.
+    """
+    if unsorted:
+        with os.scandir(path) as it:
+            entries = (entry for entry in it if hidden or not entry.name.startswith('.'))
+            write_lines(cmd_ls_detailed_info(entry) if detailed else entry.name for entry in entries)
+        return
+    names = sorted_names(path, hidden)
+    first = next(names, None)
+    if first is None:
+        return
+    names = itertools.chain([first], names)
+    if detailed:
+        write_lines(cmd_ls_detailed_info(pathlib.Path(path) / name) for name, _ in names)
+    else:
+        write_lines(_grid_rows(names))
+
+def list_tree(path, hidden: bool = False, detailed: bool = False, jobs: int = 1):
+    """
+    Печатает содержимое директории path и всех её поддиректорий, как ls -R.
+
+    Каждая директория выводится под заголовком "<путь>:", поддиректории — после родителя в порядке имён.
+    Директории читаются заранее в пуле из jobs потоков (walk_parallel).
+    """
+    descend = None if hidden else (lambda name: not name.startswith('.'))
+    first = True
+    for dir_path, _, entries, error in walk_parallel(path, jobs, descend=descend):
+        if error is not None:
+            print(f"ls: cannot open directory '{dir_path}': {error.strerror or error}")
+            continue
+        if not hidden:
+            entries = [(name, st) for name, st in entries if not name.startswith('.')]
+        if not first:
+            print()
+        first = False
+        print(f"{dir_path}:")
+        if not entries:
+            continue
+        if detailed:
+            write_lines(cmd_ls_detailed_info(pathlib.Path(dir_path) / name, st) for name, st in entries)
+        else:
+            max_len = max(len(name) for name, _ in entries)
+            write_lines(_grid_rows((name, max_len) for name, _ in entries))
+
 def cmd_ls(args):
     """
     Выводит содержимое текущей или указанной директории.
@@ -76,10 +252,14 @@ def cmd_ls(args):
         - '-l' для подробного вывода
         - '-a' для вывода файлов, включая скрытые
         - '-la' для подробного вывода файлов, включая скрытые
+        - '-U' для вывода без сортировки по мере чтения директории
+        - '-R' для рекурсивного вывода поддиректорий
+        - '-j N' для чтения поддиректорий при '-R' в N потоков
 
     Вызывает ShellError, если указанный путь не является директорией.
     Создает запись в истории команд.
     """
+    jobs, args = parse_jobs(args, "ls")
     path = pathlib.Path().cwd()
     detailed = False
     hidden = False
@@ -90,44 +270,128 @@ def cmd_ls(args):
     if args and '-la' in args:
         hidden = True
         detailed = True
-    clean_args = [i for i in args if i not in ['-l', '-a', '-la']]
-    if not clean_args:
-        items = list(path.iterdir())
-        if not hidden:
-            items = [i for i in items if not i.name.startswith('.')]
-        if items and not detailed:
-            max_len = max(len(item.name) for item in items)
-            for i, item in enumerate(sorted(items)):
-                print(f"{item.name:<{max_len}}", end="  ")
-                if (i + 1) % 5 == 0:
-                    print()
-            print()
-        for item in sorted(items):
-            if detailed:
-                print(cmd_ls_detailed_info(item))
-
+    unsorted = '-U' in args
+    recursive = '-R' in args
+    clean_args = [i for i in args if i not in ['-l', '-a', '-la', '-U', '-R']]
+    if not clean_args and recursive:
+        list_tree(path, hidden, detailed, jobs)
+    elif not clean_args:
+        list_directory(path, hidden, detailed, unsorted)
 
     if clean_args:
         for path in clean_args:
             p = ensure_exists(normalize(path),"ls")
-            if p.is_dir():
+            if p.is_dir() and recursive:
+                list_tree(p, hidden, detailed, jobs)
+            elif p.is_dir():
                 if len(args) > 1:
                     print(f"{p}: ")
-                items = list(p.iterdir())
-                if not hidden:
-                    items = [i for i in list(p.iterdir()) if not i.name.startswith('.')]
-                if items and not detailed:
-                    max_len = max(len(item.name) for item in items)
-                    for i, item in enumerate(sorted(items)):
-                        print(f"{item.name:<{max_len}}", end="  ")
-                        if (i + 1) % 5 == 0:
-                            print()
-                    print()
-                for item in sorted(items):
-                    if detailed:
-                        print(cmd_ls_detailed_info(item))
+                list_directory(p, hidden, detailed, unsorted)
             else:
                 raise ShellError(f"ls: '{p}' is not a directory")
     last_cmd_num = get_last_history_number() + 1
     record = {"cmd":"ls","number":last_cmd_num,"user_input": "ls " + " ".join(args)}
     create_history_record(record)
+
+def disk_usage(st, apparent: bool = False) -> int:
+    """
+    Возвращает место, занимаемое объектом на диске (по st_blocks), или его размер при apparent.
+    """
+    if apparent or not hasattr(st, "st_blocks"):
+        return st.st_size
+    return st.st_blocks * 512
+
+def iter_usage(root, jobs: int = 1, max_depth: int | None = None, all_files: bool = False,
+               apparent: bool = False):
+    """
+    Считает размеры директорий дерева root, как du.
+
+    jobs: количество потоков чтения директорий
+    max_depth: выводить только объекты не глубже max_depth (считаются всё равно все)
+    all_files: выводить и файлы, а не только директории
+    apparent: считать размеры файлов, а не занимаемое на диске место
+
+    Файлы с несколькими жёсткими ссылками учитываются один раз по (st_dev, st_ino).
+    Размер директории выводится после размеров её содержимого, как только её поддерево прочитано.
+
+    Возвращает генератор кортежей (размер в байтах, путь) и (None, сообщение) для ошибок чтения.
+    """
+    if not os.path.isdir(root) or os.path.islink(root):
+        yield disk_usage(os.lstat(root), apparent), os.fspath(root)
+        return
+    seen: set[tuple[int, int]] = set()
+    dir_sizes: dict[str, int] = {}
+    open_dirs: list[list] = []
+
+    def close_until(depth: int):
+        while open_dirs and open_dirs[-1][1] >= depth:
+            dir_path, dir_depth, total = open_dirs.pop()
+            if open_dirs:
+                open_dirs[-1][2] += total
+            if max_depth is None or dir_depth <= max_depth:
+                yield total, dir_path
+
+    for dir_path, depth, entries, error in walk_parallel(root, jobs):
+        yield from close_until(depth)
+        total = dir_sizes.pop(dir_path, None)
+        if total is None:
+            total = disk_usage(os.lstat(dir_path), apparent)
+        if error is not None:
+            yield None, f"du: cannot read directory '{dir_path}': {error.strerror or error}"
+            entries = []
+        for name, st in entries:
+            entry_path = os.path.join(dir_path, name)
+            if stat.S_ISDIR(st.st_mode):
+                dir_sizes[entry_path] = disk_usage(st, apparent)
+                continue
+            if st.st_nlink > 1:
+                if (st.st_dev, st.st_ino) in seen:
+                    continue
+                seen.add((st.st_dev, st.st_ino))
+            size = disk_usage(st, apparent)
+            total += size
+            if all_files and (max_depth is None or depth + 1 <= max_depth):
+                yield size, entry_path
+        open_dirs.append([dir_path, depth, total])
+    yield from close_until(0)
+
+def cmd_du(args):
+    """
+    Выводит размеры директорий (и файлов) дерева.
+
+    args: список аргументов команды du
+        - '-h' для размеров в читаемом виде (1.5K, 12M); без него размер выводится в блоках по 1024 байта
+        - '-s' для вывода только итогового размера
+        - '-a' для вывода размеров файлов
+        - '-d N' или '--max-depth N' для вывода объектов не глубже N
+        - '--apparent-size' для суммы размеров файлов вместо занимаемого места
+        - '-j N' для чтения директорий в N потоков
+        - остальные аргументы: пути (по умолчанию текущая директория)
+
+    Вызывает ShellError при неверной глубине или несуществующем пути.
+    Создает запись в истории команд.
+    """
+    jobs, du_args = parse_jobs(args, "du")
+    max_depth = None
+    paths = []
+    du_args = iter(du_args)
+    for arg in du_args:
+        if arg in ('-d', '--max-depth'):
+            value = next(du_args, None)
+            if value is None or not value.isdecimal():
+                raise ShellError(f"du: invalid maximum depth: '{value}'")
+            max_depth = int(value)
+        elif not arg.startswith('-'):
+            paths.append(arg)
+    if '-s' in args:
+        max_depth = 0
+    human = '-h' in args
+    for path in paths or ["."]:
+        p = ensure_exists(normalize(path), "du")
+        usage = iter_usage(p, jobs, max_depth, '-a' in args, '--apparent-size' in args)
+        write_lines(entry if size is None else
+                    f"{human_size(size) if human else math.ceil(size / 1024)}\t{entry}"
+                    for size, entry in usage)
+    last_cmd_num = get_last_history_number() + 1
+    record = {"cmd": "du", "number": last_cmd_num, "user_input": "du " + " ".join(args)}
+    create_history_record(record)
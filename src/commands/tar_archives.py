@@ -1,18 +1,187 @@
+import bz2
+import collections
+import gzip
+import io
+import json
+import lzma
 import tarfile
+import time
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
+from typing import IO, Literal, cast
 
 from errors.shell_errors import ShellError
 from src.history import create_history_record, get_last_history_number
-from src.utils import normalize
+from src.utils import normalize, parse_jobs, write_lines
+from src.utils.checksums import (HashingReader, compare_checksums, load_checksums, save_checksums, stream_hash,
+                                  verify_report)
+from src.utils.gzip_index import is_gzip, load_index, open_member
+from src.utils.helpers import member_matches, split_archives
+from src.utils.manifest import DELETED_MEMBER, apply_deletions, parse_incremental, plan_incremental, save_manifest
 
+# Сжатие архива по расширению имени
+TAR_COMPRESSIONS = {
+    ".tar.gz": "gz", ".tgz": "gz",
+    ".tar.bz2": "bz2", ".tbz2": "bz2",
+    ".tar.xz": "xz", ".txz": "xz",
+    ".tar": "",
+}
+# Режим tarfile.open для записи архива с каждым сжатием
+TAR_WRITE_MODES: dict[str, Literal["w:gz", "w:bz2", "w:xz", "w:"]] = {"gz": "w:gz", "bz2": "w:bz2", "xz": "w:xz", "": "w:"}
+# Уровень gzip при tar -j N, как у tarfile по умолчанию
+TAR_GZIP_LEVEL = 9
+# Размер блока потока tar, который сжимается отдельно при tar -j N
+TAR_BLOCK_SIZE = 1024 * 1024
+# Сколько блоков на поток сжимается заранее, пока предыдущие записываются
+TAR_WINDOW_PER_JOB = 4
+
+
+def compression_for(dest: Path) -> str:
+    """
+    Определяет сжатие архива по расширению dest: "gz", "bz2", "xz" или "" (без сжатия).
+    Для неизвестных расширений используется gzip.
+    """
+    name = dest.name.lower()
+    for suffix, compression in TAR_COMPRESSIONS.items():
+        if name.endswith(suffix):
+            return compression
+    return "gz"
+
+def compress_block(data: bytes, compression: str) -> bytes:
+    """
+    Сжимает блок данных в отдельный поток (член) gzip, bz2 или xz; выполняется в потоках пула.
+    Такие потоки, записанные подряд, распаковываются как один файл.
+    """
+    if compression == "gz":
+        return gzip.compress(data, TAR_GZIP_LEVEL, mtime=0)
+    if compression == "bz2":
+        return bz2.compress(data)
+    return lzma.compress(data, lzma.FORMAT_XZ)
+
+class ParallelCompressWriter:
+    """
+    Файловый объект для записи, который режет поток на блоки по TAR_BLOCK_SIZE байт,
+    сжимает их параллельно в пуле потоков и пишет в fileobj по порядку (как pigz).
+
+    Результат — корректный многочленный gzip (или несколько подряд идущих потоков bz2/xz).
+    """
+
+    def __init__(self, fileobj, compression: str, jobs: int):
+        """
+        fileobj: файл, открытый на запись в двоичном режиме
+        compression: "gz", "bz2" или "xz"
+        jobs: количество потоков сжатия
+        """
+        self.fileobj = fileobj
+        self.compression = compression
+        self.jobs = jobs
+        self.pool = ThreadPoolExecutor(max_workers=jobs)
+        self.pending: collections.deque[Future[bytes]] = collections.deque()
+        self.buffer = bytearray()
+
+    def _submit(self, data: bytes):
+        """
+        Отправляет блок на сжатие; если в очереди больше блоков, чем TAR_WINDOW_PER_JOB на поток,
+        сначала записывает самый старый.
+        """
+        self.pending.append(self.pool.submit(compress_block, data, self.compression))
+        while len(self.pending) > self.jobs * TAR_WINDOW_PER_JOB:
+            self.fileobj.write(self.pending.popleft().result())
+
+    def write(self, data) -> int:
+        self.buffer += data
+        while len(self.buffer) >= TAR_BLOCK_SIZE:
+            self._submit(bytes(self.buffer[:TAR_BLOCK_SIZE]))
+            del self.buffer[:TAR_BLOCK_SIZE]
+        return len(data)
+
+    def close(self):
+        """
+        Сжимает остаток данных и дописывает все блоки; сам fileobj не закрывается.
+        """
+        try:
+            if self.buffer or not self.pending:
+                self._submit(bytes(self.buffer))
+                self.buffer.clear()
+            while self.pending:
+                self.fileobj.write(self.pending.popleft().result())
+        finally:
+            self.pool.shutdown(cancel_futures=True)
+
+class ChecksumTarFile(tarfile.TarFile):
+    """
+    TarFile, который при checksums (словарь) считает SHA-256 данных обычных файлов по мере их записи
+    в архив: имя элемента -> sha256. Ссылки и повторные жёсткие ссылки данных не содержат и не хешируются,
+    как и при проверке в verify_tar.
+    """
+    checksums: dict | None = None
+
+    def addfile(self, tarinfo, fileobj=None):
+        if self.checksums is None or fileobj is None or not tarinfo.isreg():
+            super().addfile(tarinfo, fileobj)
+            return
+        reader = HashingReader(fileobj)
+        super().addfile(tarinfo, reader)
+        self.checksums[tarinfo.name] = reader.digest.hexdigest()
+
+def _add_to_tar(tf: tarfile.TarFile, src: Path, files=None, extra=None):
+    """
+    Добавляет в архив директорию src целиком или только файлы files (пути относительно src),
+    а также элементы extra: словарь имя -> байты.
+    """
+    if files is None:
+        tf.add(str(src), arcname=src.name)
+    else:
+        for rel in files:
+            tf.add(str(src / rel), arcname=f"{src.name}/{rel}", recursive=False)
+    for name, data in (extra or {}).items():
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = int(time.time())
+        tf.addfile(info, io.BytesIO(data))
+
+def tar_directory(src: Path, dest: Path, jobs: int = 1, files=None, extra=None, checksums: bool = False):
+    """
+    Архивирует директорию src в tar-архив dest со сжатием по расширению dest.
+
+    files: архивировать только эти файлы (пути относительно src); по умолчанию всю директорию
+    extra: дополнительные элементы архива, словарь имя -> байты
+    checksums: посчитать SHA-256 обычных файлов при записи (ChecksumTarFile)
+
+    При jobs > 1 и сжатии поток tar сжимается блоками в jobs потоков (ParallelCompressWriter).
+
+    Возвращает словарь имя элемента -> sha256 при checksums, иначе None.
+    """
+    compression = compression_for(dest)
+    if jobs == 1 or not compression:
+        with ChecksumTarFile.open(dest, TAR_WRITE_MODES[compression]) as tf:
+            tf.checksums = {} if checksums else None
+            _add_to_tar(tf, src, files, extra)
+        return tf.checksums
+    with open(dest, "wb") as f:
+        writer = ParallelCompressWriter(f, compression, jobs)
+        try:
+            with ChecksumTarFile.open(fileobj=cast(IO[bytes], writer), mode="w|") as tf:
+                tf.checksums = {} if checksums else None
+                _add_to_tar(tf, src, files, extra)
+        finally:
+            writer.close()
+    return tf.checksums
 
 def cmd_tar(args):
     """
-    Создает tar.gz архив из указанной директории.
+    Создает tar-архив из указанной директории.
 
     args: список аргументов команды tar
+        - '-j N': сжимать архив блоками в N потоков
+        - '--incremental MANIFEST': архивировать только файлы, новые или изменённые с момента
+          создания манифеста MANIFEST, и список удалённых файлов; манифест обновляется.
+          Если манифеста нет, создаётся полный архив.
+        - '--checksums': записать SHA-256 элементов в <архив>.sha256 для untar --verify
         - args[0]: путь к директории для архивации
-        - args[1]: путь и имя создаваемого архива (.tar.gz)
+        - args[1]: путь и имя создаваемого архива; сжатие выбирается по расширению:
+          .tar.gz/.tgz — gzip, .tar.bz2/.tbz2 — bzip2, .tar.xz/.txz — xz, .tar — без сжатия
 
     Вызывает ShellError при:
         - неправильном количестве аргументов
@@ -20,17 +189,30 @@ def cmd_tar(args):
         - при ошибках создания архива
     Создает запись в истории команд.
     """
-    if len(args) != 2:
-        raise ShellError("Usage: tar <folder> <archive.tar.gz>")
+    jobs, tar_args = parse_jobs(args, "tar")
+    manifest, tar_args = parse_incremental(tar_args, "tar")
+    checksums = "--checksums" in tar_args
+    tar_args = [arg for arg in tar_args if arg != "--checksums"]
+    if len(tar_args) != 2:
+        raise ShellError("Usage: tar [-j N] [--incremental MANIFEST] [--checksums] <folder> <archive.tar.gz>")
 
-    src = normalize(args[0])
-    dest = normalize(args[1])
+    src = normalize(tar_args[0])
+    dest = normalize(tar_args[1])
     if not src.exists() or not src.is_dir():
         raise ShellError(f"tar: {src} is not a directory")
 
     try:
-        with tarfile.open(dest, "w:gz") as tf:
-            tf.add(str(src), arcname=src.name)
+        if manifest is None:
+            written = tar_directory(src, dest, jobs, checksums=checksums)
+        else:
+            manifest_path = normalize(manifest)
+            snapshot, files, deleted = plan_incremental(src, manifest_path, jobs)
+            deleted = [f"{src.name}/{rel}" for rel in deleted]
+            extra = {DELETED_MEMBER: json.dumps(deleted).encode()}
+            written = tar_directory(src, dest, jobs, files, extra, checksums)
+            save_manifest(manifest_path, src, snapshot)
+        if written is not None:
+            save_checksums(dest, written)
         record = {
             "cmd": "tar",
             "number": get_last_history_number() + 1,
@@ -41,35 +223,230 @@ def cmd_tar(args):
         raise ShellError(f"tar: error: {e}")
 
 
+def _literal_patterns(patterns):
+    """
+    Возвращает множество шаблонов без символов fnmatch, если все шаблоны такие, иначе None.
+
+    Когда каждый такой шаблон найден как файл, читать архив дальше не нужно.
+    """
+    if not patterns or any(char in pattern for pattern in patterns for char in "*?["):
+        return None
+    return set(patterns)
+
+def _read_deleted(tf: tarfile.TarFile, member: tarfile.TarInfo) -> list:
+    """
+    Читает список удалённых файлов из элемента DELETED_MEMBER инкрементального архива.
+    """
+    extracted = tf.extractfile(member)
+    if extracted is None:
+        raise tarfile.TarError(f"{member.name} is not a regular file")
+    return json.load(extracted)
+
+def _iter_members(tf: tarfile.TarFile, patterns=()):
+    """
+    Перебирает элементы архива tf, подходящие под patterns (если пусто — все); заголовки читаются по мере перебора.
+
+    Если все шаблоны — точные имена, перебор останавливается, как только каждое имя найдено как файл,
+    и остаток архива не распаковывается.
+    """
+    remaining = _literal_patterns(patterns)
+    for member in tf:
+        if member.name != DELETED_MEMBER and patterns and not member_matches(member.name, patterns):
+            continue
+        yield member
+        if remaining is not None and not member.isdir():
+            remaining.discard(member.name)
+            if not remaining:
+                return
+
+def _archive_index(archive: Path, use_index: bool) -> dict | None:
+    """
+    Возвращает индекс <архив>.idx для --index или None, если архив не gzip, --index не указан
+    или архив состоит из одного члена gzip и переходить к элементам не с чего (см. build_index).
+    """
+    if not use_index or not is_gzip(archive):
+        return None
+    index = load_index(archive)
+    return index if index["entries"] is not None else None
+
+def list_tar(archive: Path, patterns=(), use_index: bool = False):
+    """
+    Возвращает имена элементов tar-архива, подходящих под patterns (если пусто — всех);
+    у директорий в конце имени '/'.
+
+    use_index: для многочленного архива gzip (tar -j N) список берётся из индекса <архив>.idx
+    (строится при первом обращении) без распаковки
+    """
+    index = _archive_index(archive, use_index)
+    if index is not None:
+        entries = [(name, is_dir) for name, _, _, is_dir in index["entries"]
+                   if not patterns or member_matches(name, patterns)]
+        for name, is_dir in entries:
+            if name != DELETED_MEMBER:
+                yield f"{name}/" if is_dir else name
+        return
+    with tarfile.open(archive, "r:*") as tf:
+        for member in _iter_members(tf, patterns):
+            if member.name != DELETED_MEMBER:
+                yield f"{member.name}/" if member.isdir() else member.name
+
+def _untar_indexed(archive: Path, index: dict, dest: Path, patterns) -> list:
+    """
+    Распаковывает из архива gzip элементы, подходящие под patterns, переходя к каждому по индексу index.
+
+    Возвращает список удалённых файлов инкрементального архива.
+    """
+    deleted = []
+    directories = []
+    for name, offset, _, is_dir in index["entries"]:
+        if name != DELETED_MEMBER and not member_matches(name, patterns):
+            continue
+        if is_dir:
+            directories.append(offset)
+            continue
+        with open_member(archive, index, offset) as (tf, member):
+            if name == DELETED_MEMBER:
+                deleted = _read_deleted(tf, member)
+            else:
+                tf.extract(member, dest, filter="data")
+    for offset in reversed(directories):
+        with open_member(archive, index, offset) as (tf, member):
+            tf.extract(member, dest, filter="data")
+    return deleted
+
+def untar_archive(archive: Path, dest: Path, patterns=(), use_index: bool = False):
+    """
+    Распаковывает tar-архив archive в dest; сжатие определяется по содержимому.
+
+    patterns: распаковывать только подходящие элементы (member_matches); если пусто — все.
+    Элементы читаются по порядку, и если шаблоны — точные имена файлов, чтение прекращается,
+    как только все они найдены.
+    use_index: для архива gzip переходить к элементам по индексу <архив>.idx, не распаковывая
+    архив с начала. Это работает только для архивов из tar -j N, где каждый блок — отдельный член gzip;
+    обычный tar.gz из одного члена gzip всё равно читается с начала
+
+    Если архив инкрементальный, после распаковки из dest удаляются файлы из его списка удалённых.
+    """
+    if not patterns:
+        with tarfile.open(archive, "r:*") as tf:
+            deleted = []
+            members = []
+            for member in tf:
+                if member.name == DELETED_MEMBER:
+                    deleted = _read_deleted(tf, member)
+                else:
+                    members.append(member)
+            tf.extractall(dest, members=members, filter="data")
+        apply_deletions(dest, deleted, "untar")
+        return
+    index = _archive_index(archive, use_index)
+    if index is not None:
+        deleted = _untar_indexed(archive, index, dest, patterns)
+    else:
+        deleted = []
+        directories = []
+        with tarfile.open(archive, "r:*") as tf:
+            for member in _iter_members(tf, patterns):
+                if member.name == DELETED_MEMBER:
+                    deleted = _read_deleted(tf, member)
+                elif member.isdir():
+                    directories.append(member)
+                else:
+                    tf.extract(member, dest, filter="data")
+            for member in reversed(directories):
+                tf.extract(member, dest, filter="data")
+    apply_deletions(dest, [name for name in deleted if member_matches(name, patterns)], "untar")
+
+def verify_tar(archive: Path):
+    """
+    Проверяет tar-архив без распаковки на диск: архив читается потоком до конца, поэтому проверяются
+    контрольные суммы заголовков tar и сжатого потока (CRC-32 каждого члена gzip, CRC bzip2, проверка xz),
+    а SHA-256 элементов сверяется с файлом контрольных сумм <архив>.sha256, если он есть.
+
+    Элементы лежат в одном сжатом потоке, поэтому проверяются по порядку в одном потоке.
+
+    Возвращает кортеж (количество проверенных элементов, список (имя, причина) для ошибок).
+    """
+    actual = {}
+    failures = []
+    name = str(archive)
+    try:
+        with tarfile.open(archive, "r:*") as tf:
+            for member in tf:
+                if member.isfile():
+                    name = member.name
+                    actual[name] = stream_hash(tf.extractfile(member))
+            name = str(archive)
+            stream = tf.fileobj
+            if stream is not None:
+                while stream.read(TAR_BLOCK_SIZE):
+                    pass
+    except (tarfile.TarError, OSError, EOFError, zlib.error, lzma.LZMAError) as e:
+        failures.append((name, str(e) or type(e).__name__))
+    failures.extend(compare_checksums(actual, load_checksums(archive), {name for name, _ in failures}))
+    return len(actual), failures
+
 def cmd_untar(args):
     """
-    Распаковывает tar.gz архив в текущую директорию.
+    Распаковывает tar-архивы в текущую директорию.
 
     args: список аргументов команды untar
-        - args[0]: путь к архиву (.tar.gz)
+        - '-t': только вывести список элементов архивов
+        - '--verify': проверить архивы без распаковки (контрольные суммы и SHA-256 по <архив>.sha256, см. verify_tar)
+        - '--index': для архивов gzip использовать индекс <архив>.idx (строится при первом обращении),
+          чтобы выводить список и распаковывать отдельные элементы без распаковки архива с начала.
+          Переходить к элементам можно только в многочленных архивах из tar -j N; обычный tar.gz
+          из одного члена gzip читается с начала, как без --index
+        - первый аргумент: архив (.tar, .tar.gz, .tar.bz2, .tar.xz; сжатие определяется по содержимому)
+        - остальные аргументы: шаблоны элементов архива, которые нужно распаковать
+        - 'ARCHIVE ... -- [MEMBER ...]': несколько архивов до '--', шаблоны элементов после него
+
+    Несколько архивов распаковываются по порядку: так применяется цепочка из полного архива
+    и инкрементальных архивов (tar --incremental), включая удаление файлов.
 
     Вызывает ShellError при:
         - неправильном количестве аргументов
         - если архив не найден
         - при ошибках распаковки
+        - если проверка архива нашла ошибки
     Создает запись в истории команд.
     """
-    if len(args) != 1:
-        raise ShellError("Usage: untar <archive.tar.gz>")
+    listing = "-t" in args
+    use_index = "--index" in args
+    verify = "--verify" in args
+    rest = [arg for arg in args if arg not in ("-t", "--index", "--verify")]
+    archive_args, patterns = split_archives(rest)
+    if len(archive_args) < 1:
+        raise ShellError("Usage: untar [-t] [--index] [--verify] <archive.tar[.gz|.bz2|.xz]> [MEMBER ...]\n"
+                         "       untar [-t] [--index] [--verify] <archive.tar[.gz|.bz2|.xz]> [INCREMENTAL ...] -- [MEMBER ...]")
 
-    archive = Path(args[0])
-    if not archive.exists():
-        raise ShellError(f"untar: {archive} not found")
+    archives = [Path(arg) for arg in archive_args]
+    for archive in archives:
+        if not archive.exists():
+            raise ShellError(f"untar: {archive} not found")
 
     try:
-        with tarfile.open(archive, "r:gz") as tf:
-            tf.extractall(Path().cwd(),filter="data")
+        failed = []
+        for archive in archives:
+            if verify:
+                count, failures = verify_tar(archive)
+                write_lines(verify_report(archive, count, failures))
+                if failures:
+                    failed.append(str(archive))
+            elif listing:
+                write_lines(list_tar(archive, patterns, use_index))
+            else:
+                untar_archive(archive, Path().cwd(), patterns, use_index)
+        if failed:
+            raise ShellError(f"untar: verification failed: {', '.join(failed)}")
         record = {
             "cmd": "untar",
             "num": get_last_history_number() + 1,
-            "user_input": " ".join(["untar", str(archive)]),
+            "user_input": " ".join(["untar", *args]),
             "status": "OK"
         }
         create_history_record(record)
+    except ShellError:
+        raise
     except Exception as e:
         raise ShellError(f"untar: error: {e}")
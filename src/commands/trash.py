@@ -0,0 +1,30 @@
+from datetime import datetime
+
+from errors.shell_errors import ShellError
+from src.history import create_history_record, get_last_history_number
+from src.utils.trash import collect_garbage, list_trash
+
+
+def cmd_trash(args):
+    """
+    Показывает содержимое корзин или очищает их.
+
+    args: список аргументов команды trash
+        - пустой или 'list': выводит объекты в корзинах (номер команды rm, размер, дата, исходный путь)
+        - 'gc': удаляет объекты сверх ограничений TRASH_MAX_BYTES и TRASH_MAX_AGE, начиная с самых старых
+
+    Вызывает ShellError при неизвестной подкоманде.
+    Создает запись в истории команд.
+    """
+    if len(args) > 1 or (args and args[0] not in ['list', 'gc']):
+        raise ShellError("Usage: trash [list|gc]")
+    if args == ['gc']:
+        purged, freed = collect_garbage()
+        print(f"trash: purged {purged} items, freed {freed / 2**20:.1f} MB")
+    else:
+        for item in list_trash():
+            size = "?" if item["size"] is None else item["size"]
+            mtime = datetime.fromtimestamp(item["time"]).strftime('%Y-%m-%d %H:%M:%S')
+            print(f"{item['number'] or '-'} {size} {mtime} {item['src'] or item['path']}")
+    record = {"cmd": "trash", "number": get_last_history_number() + 1, "user_input": "trash " + " ".join(args)}
+    create_history_record(record)
@@ -1,9 +1,10 @@
 import shutil
 
 from errors.shell_errors import ShellError
-from src.history import get_last_history_undo_cmd, remove_history_records, get_last_history_number, \
-    create_history_record
+from src.history import (clear_undo_progress, create_history_record, get_last_history_number, get_last_history_undo_cmd,
+                         load_undo_progress, save_undo_progress)
 from src.utils import normalize
+from src.utils.copying import move_path
 
 
 def undo_cp(dest):
@@ -25,6 +26,8 @@ def undo_rm(trash_path,src):
     trash_path: путь в корзине, куда был перемещён файл
     src: исходный путь, куда нужно восстановить файл
 
+    Корзина находится на той же файловой системе, что и src, поэтому обычно это одно переименование.
+
     Вызывает ShellError, если файл полностью удалён и восстановить его нельзя.
     """
     trash_path = normalize(trash_path)
@@ -32,7 +35,7 @@ def undo_rm(trash_path,src):
     if not trash_path.exists():
         raise ShellError("undo: this file/directory was completely deleted; can't undo")
     else:
-        shutil.move(trash_path, src)
+        move_path(trash_path, src, cmd="undo")
 
 def undo_mv(src,dest):
     """
@@ -41,13 +44,16 @@ def undo_mv(src,dest):
     src: исходный путь, куда нужно вернуть файл
     dest: путь к текущему местоположению файла
 
+    Перемещение обратно выполняется так же, как mv: переименованием или, между
+    файловыми системами, копированием с последующим удалением.
+
     Вызывает ShellError, если файл был изменён или удалён после перемещения.
     """
     src = normalize(src)
     dest = normalize(dest)
     if not dest.exists():
         raise ShellError(f"undo: moved file '{dest}' was changed or deleted; can't undo")
-    shutil.move(dest, src)
+    move_path(dest, src, cmd="undo")
 
 def cmd_undo(args):
     """
@@ -56,28 +62,39 @@ def cmd_undo(args):
     args: список аргументов команды undo (должен быть пустым или содержать только 'undo')
 
     Вызывает ShellError, если передано больше одного аргумента.
-    Обновляет историю команд после отмены.
+    Дописывает в историю запись undo с номером отменённой команды ("reverted"),
+    по которой отменённая команда скрывается из истории без перезаписи файла.
+    Запись добавляется, только если отменены все записи команды: если отмена одной из них
+    завершилась ошибкой, команда остаётся в истории и её можно отменить повторно.
+    Уже отменённые записи сохраняются в файле прогресса (save_undo_progress)
+    и при повторной отмене пропускаются.
     """
     if len(args) > 1:
         raise ShellError(f"undo: too many arguments: '{args}'. This command can only be used with 'undo'")
     last_cmd = get_last_history_undo_cmd()
-    showed_info = False
     if not last_cmd:
         raise ShellError("undo: nothing to undo")
-    for data in last_cmd:
-        if data['cmd'] == 'cp':
-            undo_cp(data['dest'])
-            remove_history_records(data['number'])
-        if data['cmd'] == 'rm' and "skipped" not in data:
-            undo_rm(data['trash_path'],data['src'])
-            remove_history_records(data['number'])
-        elif data['cmd'] == 'rm':
-            remove_history_records(data['number'])
-        if data['cmd'] == 'mv':
-            undo_mv(data['src'],data['dest'])
-            remove_history_records(data['number'])
-        if not showed_info:
-            record = {"cmd":"undo", "number":get_last_history_number()+1,"user_input":"undo"}
-            create_history_record(record)
-            print(f"undo: cancelled command '{data["user_input"]}'")
-            showed_info = True
+    number = last_cmd[0]['number']
+    done = load_undo_progress(number)
+    showed_info = False
+    try:
+        for index, data in enumerate(last_cmd):
+            if index not in done:
+                if data['cmd'] == 'cp':
+                    undo_cp(data['dest'])
+                if data['cmd'] == 'rm' and "skipped" not in data:
+                    undo_rm(data['trash_path'],data['src'])
+                if data['cmd'] == 'mv':
+                    undo_mv(data['src'],data['dest'])
+                done.add(index)
+            if not showed_info:
+                print(f"undo: cancelled command '{data["user_input"]}'")
+                showed_info = True
+    except BaseException:
+        if done:
+            save_undo_progress(number, done)
+        raise
+    clear_undo_progress()
+    record = {"cmd": "undo", "number": get_last_history_number() + 1, "user_input": "undo",
+              "reverted": number}
+    create_history_record(record)
@@ -1,10 +1,25 @@
+import errno
+import itertools
 import os
 import pathlib
+import stat
+import sys
+import time
+from datetime import datetime
 
 from errors.shell_errors import ShellError
-from src.history import create_history_record, get_last_history, get_last_history_number
+from src.history import compact_history, create_history_record, get_last_history, get_last_history_number, \
+    query_history
 from src.utils import ensure_exists,normalize
 
+HISTORY_QUERY_OPTIONS = {"--grep": "pattern", "--cmd": "cmd", "--since": "since"}
+# Размер куска, которым cat, head и tail выводят файл
+CAT_CHUNK_SIZE = 1024 * 1024
+# Сколько первых байт проверяется на нулевой байт, чтобы не добавлять перевод строки к двоичному файлу
+BINARY_SNIFF_SIZE = 8 * 1024
+# Как часто tail -f проверяет файл, в секундах
+TAIL_FOLLOW_INTERVAL = 0.5
+
 def cmd_cd(args):
     """
     Переходит в указанную директорию.
@@ -31,12 +46,108 @@ def cmd_cd(args):
     create_history_record(record)
     return os.chdir(path)
 
+def _stdout_fd():
+    """
+    Возвращает дескриптор stdout, если в него можно писать через sendfile (обычный файл или канал), иначе None.
+    """
+    try:
+        fd = sys.stdout.fileno()
+        mode = os.fstat(fd).st_mode
+    except (AttributeError, OSError, ValueError):
+        return None
+    return fd if stat.S_ISREG(mode) or stat.S_ISFIFO(mode) else None
+
+def write_file(f, offset: int = 0) -> int:
+    """
+    Пишет содержимое открытого в двоичном режиме файла f начиная с offset в stdout без декодирования.
+
+    Если stdout — файл или канал, данные передаются через os.sendfile без копирования в Python;
+    иначе файл читается кусками по CAT_CHUNK_SIZE и пишется в sys.stdout.buffer.
+
+    Возвращает позицию в файле, до которой он выведен.
+    """
+    sys.stdout.flush()
+    out_fd = _stdout_fd()
+    if out_fd is not None:
+        try:
+            while True:
+                sent = os.sendfile(out_fd, f.fileno(), offset, CAT_CHUNK_SIZE)
+                if sent == 0:
+                    return offset
+                offset += sent
+        except OSError as e:
+            if e.errno not in (errno.EINVAL, errno.ENOSYS):
+                raise
+    out = getattr(sys.stdout, "buffer", None)
+    f.seek(offset)
+    while chunk := f.read(CAT_CHUNK_SIZE):
+        if out is not None:
+            out.write(chunk)
+        else:
+            sys.stdout.write(chunk.decode("utf-8", errors="replace"))
+        offset += len(chunk)
+    if out is not None:
+        out.flush()
+    return offset
+
+def _ends_as_text(f) -> bool:
+    """
+    Проверяет, что непустой текстовый (без нулевых байт в начале) файл f не заканчивается переводом строки.
+    """
+    size = os.fstat(f.fileno()).st_size
+    if size == 0:
+        return False
+    head = os.pread(f.fileno(), BINARY_SNIFF_SIZE, 0)
+    return b"\0" not in head and os.pread(f.fileno(), 1, size - 1) != b"\n"
+
+def parse_line_count(args: list, cmd: str):
+    """
+    Извлекает из аргументов количество строк '-n N' или '-nN' (по умолчанию 10).
+
+    Вызывает ShellError, если число не указано или не является неотрицательным числом.
+    Возвращает кортеж (количество, аргументы без флага).
+    """
+    count = 10
+    rest = []
+    arg_iter = iter(args)
+    for arg in arg_iter:
+        if arg != '-n' and not (arg.startswith('-n') and arg[2:].isdecimal()):
+            rest.append(arg)
+            continue
+        value = arg[2:] or next(arg_iter, None)
+        if value is None or not value.isdecimal():
+            raise ShellError(f"{cmd}: invalid number of lines: '{value}'")
+        count = int(value)
+    return count, rest
+
+def _open_files(args: list, cmd: str):
+    """
+    Проверяет пути из args и возвращает генератор кортежей (путь, файл, открытый в двоичном режиме).
+
+    Вызывает ShellError, если путь не существует, не является файлом или недоступен для чтения.
+    """
+    if len(args) == 0:
+        raise ShellError(f"{cmd}: empty arguments")
+    for path in args:
+        p = ensure_exists(normalize(path), cmd)
+        if not p.is_file():
+            raise ShellError(f"{cmd}: '{p}' is not a file")
+        try:
+            f = p.open("rb")
+        except PermissionError:
+            raise ShellError(f"{cmd}: Permission denied: '{p}'")
+        with f:
+            yield p, f
+
 def cmd_cat(args):
     """
     Выводит содержимое одного или нескольких файлов.
 
     args: список файлов для вывода
 
+    Файл выводится побайтно кусками (или через sendfile), не загружаясь в память целиком,
+    поэтому двоичные файлы не искажаются. Если текстовый файл не заканчивается переводом строки, он добавляется.
+
     Вызывает ShellError при:
         - если файл не существует
         - если путь не является файлом
@@ -44,21 +155,112 @@ def cmd_cat(args):
 
     Создает запись в истории команд для каждого файла.
     """
-    if len(args) == 0:
-        raise ShellError("cat: empty arguments")
-    for path in args:
-        p = ensure_exists(normalize(path),"cat")
-        if not p.is_file():
-            raise ShellError(f"cat: '{p}' is not a file")
-        try:
-            with p.open("r") as f:
-                content = f.read()
-                print(content)
-            last_cmd_num = get_last_history_number() + 1
-            record = {"cmd": "cat","user_input": "cat " + " ".join(args),"number": last_cmd_num}
-            create_history_record(record)
-        except PermissionError:
-            raise ShellError(f"cat: Permission denied: '{p}'")
+    for p, f in _open_files(args, "cat"):
+        write_file(f)
+        if _ends_as_text(f):
+            print()
+        last_cmd_num = get_last_history_number() + 1
+        record = {"cmd": "cat","user_input": "cat " + " ".join(args),"number": last_cmd_num}
+        create_history_record(record)
+
+def cmd_head(args):
+    """
+    Выводит первые строки файлов.
+
+    args: список аргументов команды head
+        - '-n N' для вывода N первых строк (по умолчанию 10)
+        - остальные аргументы: файлы
+
+    Читается только начало файла, до N-й строки.
+    Вызывает ShellError при ошибках аргументов или доступа к файлам.
+    Создает запись в истории команд.
+    """
+    count, paths = parse_line_count(args, "head")
+    for p, f in _open_files(paths, "head"):
+        if len(paths) > 1:
+            print(f"==> {p} <==")
+        sys.stdout.flush()
+        out = getattr(sys.stdout, "buffer", None)
+        for line in itertools.islice(f, count):
+            if out is not None:
+                out.write(line)
+            else:
+                sys.stdout.write(line.decode("utf-8", errors="replace"))
+        if out is not None:
+            out.flush()
+    record = {"cmd": "head", "user_input": "head " + " ".join(args), "number": get_last_history_number() + 1}
+    create_history_record(record)
+
+def tail_offset(f, count: int, block_size: int = 8 * 1024) -> int:
+    """
+    Возвращает смещение начала последних count строк файла f.
+
+    Файл читается блоками по block_size байт с конца; перевод строки в самом конце файла
+    не считается началом ещё одной строки.
+    """
+    position = os.fstat(f.fileno()).st_size
+    if count == 0:
+        return position
+    end = position
+    newlines = 0
+    while position > 0:
+        step = min(block_size, position)
+        position -= step
+        block = os.pread(f.fileno(), step, position)
+        if position + step == end and block.endswith(b"\n"):
+            block = block[:-1]
+        index = len(block)
+        while (index := block.rfind(b"\n", 0, index)) != -1:
+            newlines += 1
+            if newlines == count:
+                return position + index + 1
+    return 0
+
+def follow(f, offset: int, interval: float | None = None):
+    """
+    Выводит данные, дописываемые в файл f после offset, пока не будет нажато Ctrl+C (как tail -f).
+
+    Файл проверяется раз в interval (по умолчанию TAIL_FOLLOW_INTERVAL) секунд;
+    если файл стал короче (его перезаписали), вывод продолжается с начала.
+    """
+    interval = TAIL_FOLLOW_INTERVAL if interval is None else interval
+    try:
+        while True:
+            size = os.fstat(f.fileno()).st_size
+            if size < offset:
+                offset = 0
+            if size > offset:
+                offset = write_file(f, offset)
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        return
+
+def cmd_tail(args):
+    """
+    Выводит последние строки файлов.
+
+    args: список аргументов команды tail
+        - '-n N' для вывода N последних строк (по умолчанию 10)
+        - '-f' для вывода дописываемых в файл данных до нажатия Ctrl+C
+        - остальные аргументы: файлы
+
+    Файл читается блоками с конца, поэтому время не зависит от размера файла.
+    Вызывает ShellError при ошибках аргументов или доступа к файлам.
+    Создает запись в истории команд.
+    """
+    count, tail_args = parse_line_count(args, "tail")
+    follow_mode = '-f' in tail_args
+    paths = [i for i in tail_args if i != '-f']
+    if follow_mode and len(paths) != 1:
+        raise ShellError("tail: option '-f' requires exactly one file")
+    for p, f in _open_files(paths, "tail"):
+        if len(paths) > 1:
+            print(f"==> {p} <==")
+        offset = write_file(f, tail_offset(f, count))
+        if follow_mode:
+            follow(f, offset)
+    record = {"cmd": "tail", "user_input": "tail " + " ".join(args), "number": get_last_history_number() + 1}
+    create_history_record(record)
 
 def cmd_history(args):
     """
@@ -67,23 +269,53 @@ def cmd_history(args):
     args: список аргументов команды history
         - если указан один аргумент, выводит указанное число последних команд
         - если пустой, выводит последние 10 команд
+        - '--compact' переписывает файл истории без отменённых команд
+        - '--grep PATTERN' ищет команды, содержащие подстроку PATTERN
+        - '--cmd NAME' ищет команды с именем NAME (например, rm)
+        - '--since DATE' ищет команды, выполненные начиная с DATE ("2025-01-31" или "2025-01-31 12:00:00")
+        Условия поиска можно комбинировать; число в этом режиме ограничивает количество найденных команд.
 
     Вызывает ShellError при:
-        - передаче более одного аргумента
+        - передаче более одного числового аргумента
         - если аргумент не является числом
+        - если у опции поиска нет значения или дата указана неверно
 
     Выводит список команд с их номерами.
     """
     history_list_number = 10
-    if len(args) > 1:
-        raise ShellError(f"history: too many arguments: '{args}'")
-    if len(args) == 1:
-        if not args[0].isdecimal():
-            raise ShellError(f"history: invalid argument: '{args[0]}'")
-        history_list_number = int(args[0])
-    history_list = get_last_history(history_list_number)
-    for history in history_list:
-        print(history[0],history[1])
+    if args == ['--compact']:
+        removed = compact_history()
+        print(f"history: compacted, removed {removed} records")
+    else:
+        query = {}
+        positional = []
+        i = 0
+        while i < len(args):
+            if args[i] in HISTORY_QUERY_OPTIONS:
+                if i + 1 >= len(args):
+                    raise ShellError(f"history: option '{args[i]}' requires an argument")
+                query[HISTORY_QUERY_OPTIONS[args[i]]] = args[i + 1]
+                i += 2
+                continue
+            positional.append(args[i])
+            i += 1
+        if len(positional) > 1:
+            raise ShellError(f"history: too many arguments: '{args}'")
+        if positional:
+            if not positional[0].isdecimal():
+                raise ShellError(f"history: invalid argument: '{positional[0]}'")
+            history_list_number = int(positional[0])
+        if "since" in query:
+            try:
+                datetime.fromisoformat(query["since"])
+            except ValueError:
+                raise ShellError(f"history: invalid date: '{query['since']}'")
+        if query:
+            history_list = query_history(**query, n=history_list_number if positional else None)
+        else:
+            history_list = get_last_history(history_list_number)
+        for history in history_list:
+            print(history[0],history[1])
     record = {
         "cmd": "history",
         "user_input": "history " + " ".join(args),
@@ -1,20 +1,174 @@
+import collections
+import hashlib
+import json
 import os
 import pathlib
+import shutil
+import stat
+import threading
+import time
 import zipfile
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
 
 from errors.shell_errors import ShellError
 from src.history import create_history_record, get_last_history_number
-from src.utils import ensure_exists, normalize
+from src.utils import ensure_exists, normalize, parse_jobs, write_lines
+from src.utils.checksums import (compare_checksums, load_checksums, save_checksums, stream_hash,
+                                  verify_report)
+from src.utils.helpers import member_matches, member_path, split_archives
+from src.utils.manifest import DELETED_MEMBER, apply_deletions, parse_incremental, plan_incremental, save_manifest
+from src.utils.zip_writer import ZipWriter
 
+ZIP_DEFAULT_LEVEL = 6
+# Расширения уже сжатых форматов: такие файлы сохраняются в архиве без сжатия
+ZIP_STORED_EXTENSIONS = {
+    ".zip", ".gz", ".tgz", ".bz2", ".xz", ".zst", ".7z", ".rar", ".jar", ".whl", ".apk",
+    ".docx", ".xlsx", ".pptx", ".odt", ".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic",
+    ".mp3", ".aac", ".ogg", ".flac", ".mp4", ".mkv", ".avi", ".mov", ".webm",
+}
+# Пробное сжатие: сколько первых байт сжимается и при какой доле размера файл считается несжимаемым
+ZIP_TRIAL_SIZE = 64 * 1024
+ZIP_TRIAL_MIN_SIZE = 4 * 1024
+ZIP_TRIAL_RATIO = 0.95
+# Файлы больше этого размера сжимаются потоково в основном потоке
+ZIP_PARALLEL_MAX_FILE_SIZE = 64 * 1024 * 1024
+# Сколько файлов и байт на поток сжимается заранее, пока предыдущие записываются в архив
+ZIP_WINDOW_PER_JOB = 4
+ZIP_WINDOW_BYTES_PER_JOB = 32 * 1024 * 1024
+# Размер куска при распаковке одного элемента архива
+UNZIP_CHUNK_SIZE = 1024 * 1024
+
+
+def should_store(path: pathlib.Path, sample: bytes) -> bool:
+    """
+    Проверяет, что файл уже сжат и сжимать его ещё раз бессмысленно:
+    по расширению (ZIP_STORED_EXTENSIONS) или по пробному сжатию первых байт sample.
+    """
+    if path.suffix.lower() in ZIP_STORED_EXTENSIONS:
+        return True
+    if len(sample) < ZIP_TRIAL_MIN_SIZE:
+        return False
+    return len(zlib.compress(sample, 1)) > len(sample) * ZIP_TRIAL_RATIO
+
+def compress_file(path: pathlib.Path, level: int, checksum: bool = False):
+    """
+    Читает и сжимает файл для записи в архив; выполняется в потоках пула (zlib отпускает GIL).
+
+    level: уровень сжатия 0-9; при 0 или для уже сжатых файлов данные сохраняются без сжатия
+    checksum: посчитать SHA-256 прочитанных данных
+
+    Возвращает кортеж (способ сжатия, CRC-32, размер файла, сжатые данные, sha256 или None).
+    """
+    data = path.read_bytes()
+    crc = zlib.crc32(data)
+    digest = hashlib.sha256(data).hexdigest() if checksum else None
+    if level == 0 or should_store(path, data[:ZIP_TRIAL_SIZE]):
+        return zipfile.ZIP_STORED, crc, len(data), data, digest
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    return zipfile.ZIP_DEFLATED, crc, len(data), compressor.compress(data) + compressor.flush(), digest
+
+def zip_directory(src: pathlib.Path, dest: pathlib.Path, level: int = ZIP_DEFAULT_LEVEL, jobs: int = 1,
+                  files=None, extra=None, checksums: bool = False):
+    """
+    Архивирует файлы директории src в zip-архив dest.
+
+    level: уровень сжатия 0-9 (0 — без сжатия)
+    jobs: количество потоков сжатия
+    files: архивировать только эти файлы (пути относительно src); по умолчанию все файлы директории
+    extra: дополнительные элементы архива, словарь имя -> байты или строка
+    checksums: посчитать SHA-256 элементов по данным, которые записываются в архив
+
+    Файлы сжимаются заранее в пуле из jobs потоков и записываются в архив в порядке обхода.
+    Заранее сжимается не больше ZIP_WINDOW_PER_JOB файлов и ZIP_WINDOW_BYTES_PER_JOB байт на поток
+    (но хотя бы один файл). Файлы больше ZIP_PARALLEL_MAX_FILE_SIZE сжимаются потоково
+    в основном потоке, чтобы не держать их в памяти. Уже сжатые файлы сохраняются без сжатия.
+
+    Возвращает словарь имя элемента -> sha256 при checksums, иначе None.
+    """
+    written: dict | None = {} if checksums else None
+    if files is None:
+        files = []
+        for root, dirs, names in os.walk(src):
+            dirs.sort()
+            files.extend(pathlib.Path(root) / name for name in sorted(names))
+    else:
+        files = [src / rel for rel in files]
+
+    with ZipWriter(dest) as zw, ThreadPoolExecutor(max_workers=jobs) as pool:
+        pending: collections.deque[tuple[pathlib.Path, int, Future | None]] = collections.deque()
+        file_iter = iter(files)
+        next_file = next(file_iter, None)
+        in_flight = 0
+        while True:
+            while next_file is not None and len(pending) < jobs * ZIP_WINDOW_PER_JOB:
+                size = next_file.stat().st_size
+                if size > ZIP_PARALLEL_MAX_FILE_SIZE:
+                    pending.append((next_file, 0, None))
+                elif in_flight and in_flight + size > jobs * ZIP_WINDOW_BYTES_PER_JOB:
+                    break
+                else:
+                    pending.append((next_file, size, pool.submit(compress_file, next_file, level, checksums)))
+                    in_flight += size
+                next_file = next(file_iter, None)
+            if not pending:
+                break
+            full_p, size, future = pending.popleft()
+            zinfo = zipfile.ZipInfo.from_file(full_p, full_p.relative_to(src))
+            if future is None:
+                with open(full_p, "rb") as f:
+                    stored = level == 0 or should_store(full_p, f.read(ZIP_TRIAL_SIZE))
+                digest = hashlib.sha256() if checksums else None
+                zw.write_file(zinfo, full_p, 0 if stored else level, digest)
+                if written is not None and digest is not None:
+                    written[zinfo.filename] = digest.hexdigest()
+            else:
+                method, crc, file_size, data, file_digest = future.result()
+                zw.write_compressed(zinfo, method, crc, file_size, data)
+                if written is not None:
+                    written[zinfo.filename] = file_digest
+                in_flight -= size
+        for name, extra_data in (extra or {}).items():
+            zinfo = zipfile.ZipInfo(name, time.localtime()[:6])
+            zinfo.external_attr = 0o600 << 16
+            raw = extra_data.encode() if isinstance(extra_data, str) else extra_data
+            zw.writestr(zinfo, raw, level)
+            if written is not None:
+                written[name] = hashlib.sha256(raw).hexdigest()
+    return written
+
+def parse_level(args: list):
+    """
+    Извлекает из аргументов уровень сжатия '-0'..'-9'.
+
+    Возвращает кортеж (уровень, аргументы без флага); по умолчанию ZIP_DEFAULT_LEVEL.
+    """
+    level = ZIP_DEFAULT_LEVEL
+    rest = []
+    for arg in args:
+        if len(arg) == 2 and arg[0] == '-' and arg[1].isdigit():
+            level = int(arg[1])
+        else:
+            rest.append(arg)
+    return level, rest
 
 def cmd_zip(args):
     """
     Создает zip-архив из указанной директории.
 
     args: список аргументов команды zip
+        - '-0'..'-9': уровень сжатия (0 — только хранение, по умолчанию 6)
+        - '-j N': сжимать файлы в N потоков
+        - '--incremental MANIFEST': архивировать только файлы, новые или изменённые с момента
+          создания манифеста MANIFEST, и список удалённых файлов; манифест обновляется.
+          Если манифеста нет, создаётся полный архив.
+        - '--checksums': записать SHA-256 элементов в <архив>.sha256 для unzip --verify
         - args[0]: путь к директории для архивации
         - args[1]: путь и имя создаваемого архива (.zip)
 
+    Уже сжатые файлы (архивы, изображения, видео — по расширению или пробному сжатию)
+    сохраняются в архиве без сжатия.
+
     Вызывает ShellError при:
         - неправильном количестве аргументов
         - если исходная директория не существует
@@ -23,48 +177,237 @@ def cmd_zip(args):
 
     Создает запись в истории команд.
     """
-    if len(args) != 2:
-        raise ShellError("Usage: zip <folder> <archive.zip>")
-    src = ensure_exists(normalize(args[0]),"zip")
-    dest = normalize(args[1])
+    jobs, zip_args = parse_jobs(args, "zip")
+    level, zip_args = parse_level(zip_args)
+    manifest, zip_args = parse_incremental(zip_args, "zip")
+    checksums = "--checksums" in zip_args
+    zip_args = [arg for arg in zip_args if arg != "--checksums"]
+    if len(zip_args) != 2:
+        raise ShellError("Usage: zip [-0..-9] [-j N] [--incremental MANIFEST] [--checksums] <folder> <archive.zip>")
+    src = ensure_exists(normalize(zip_args[0]),"zip")
+    dest = normalize(zip_args[1])
     if not src.is_dir():
         raise ShellError(f"zip: {src} is not a directory")
     try:
-        with zipfile.ZipFile(dest, "w", zipfile.ZIP_DEFLATED) as zf:
-            for root, _, files in os.walk(src):
-                for file in files:
-                    full_p = pathlib.Path(root) / file
-                    archive_p = full_p.relative_to(src)
-                    zf.write(full_p, archive_p)
+        if manifest is None:
+            written = zip_directory(src, dest, level, jobs, checksums=checksums)
+        else:
+            manifest_path = normalize(manifest)
+            snapshot, files, deleted = plan_incremental(src, manifest_path, jobs)
+            extra = {DELETED_MEMBER: json.dumps(deleted)}
+            written = zip_directory(src, dest, level, jobs, files, extra, checksums)
+            save_manifest(manifest_path, src, snapshot)
+        if written is not None:
+            save_checksums(dest, written)
         last_cmd_number = get_last_history_number() + 1
         record = {"cmd": "zip", "src": str(src), "user_input": "zip " + " ".join(args), "number": last_cmd_number}
         create_history_record(record)
     except Exception as e:
         raise ShellError(f"zip: {e}")
 
+def _zip_mode(info: zipfile.ZipInfo):
+    """
+    Возвращает права доступа элемента архива, созданного в Unix, без setuid/setgid/sticky, или None.
+    """
+    mode = info.external_attr >> 16
+    if info.create_system != 3 or not mode:
+        return None
+    return stat.S_IMODE(mode) & 0o777
+
+def _zip_mtime(info: zipfile.ZipInfo) -> float:
+    """
+    Возвращает время изменения элемента архива (локальное время, как хранит zip).
+    """
+    return time.mktime((*info.date_time, 0, 0, -1))
+
+def extract_zip(archive: pathlib.Path, dest: pathlib.Path, jobs: int = 1, patterns=()) -> int:
+    """
+    Распаковывает zip-архив archive в директорию dest.
+
+    jobs: количество потоков распаковки; у каждого потока свой ZipFile
+    patterns: распаковывать только подходящие элементы (member_matches); если пусто — все
+
+    Сначала создаётся дерево директорий, затем файлы распаковываются параллельно.
+    Права доступа и время изменения восстанавливаются из архива; время директорий — в конце.
+    Если архив инкрементальный, после распаковки из dest удаляются файлы из его списка удалённых.
+
+    Возвращает количество распакованных элементов.
+    """
+    deleted = []
+    with zipfile.ZipFile(archive) as zf:
+        if DELETED_MEMBER in zf.NameToInfo:
+            deleted = json.loads(zf.read(DELETED_MEMBER))
+        infos = [info for info in zf.infolist()
+                 if info.filename != DELETED_MEMBER and (not patterns or member_matches(info.filename, patterns))]
+    targets = [(info, member_path(dest, info.filename, "unzip")) for info in infos]
+    directories = {dest}
+    for info, target in targets:
+        directories.add(target if info.is_dir() else target.parent)
+    for directory in sorted(directories):
+        directory.mkdir(parents=True, exist_ok=True)
+
+    local = threading.local()
+    handles = []
+    lock = threading.Lock()
+
+    def extract_one(info: zipfile.ZipInfo, target: pathlib.Path):
+        zf = getattr(local, "zf", None)
+        if zf is None:
+            zf = local.zf = zipfile.ZipFile(archive)
+            with lock:
+                handles.append(zf)
+        with zf.open(info) as src, open(target, "wb") as out:
+            shutil.copyfileobj(src, out, UNZIP_CHUNK_SIZE)
+        mode = _zip_mode(info)
+        if mode is not None:
+            os.chmod(target, mode)
+        mtime = _zip_mtime(info)
+        os.utime(target, (mtime, mtime))
+
+    try:
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(extract_one, info, target) for info, target in targets if not info.is_dir()]
+            for future in futures:
+                future.result()
+    finally:
+        for zf in handles:
+            zf.close()
+    for info, target in sorted(targets, key=lambda item: len(item[1].parts), reverse=True):
+        if info.is_dir():
+            mode = _zip_mode(info)
+            if mode is not None:
+                os.chmod(target, mode)
+            mtime = _zip_mtime(info)
+            os.utime(target, (mtime, mtime))
+    apply_deletions(dest, [name for name in deleted if not patterns or member_matches(name, patterns)], "unzip")
+    return len(targets)
+
+def list_zip(archive: pathlib.Path, patterns=()):
+    """
+    Возвращает строки списка элементов zip-архива, подходящих под patterns (если пусто — всех):
+    размер, дата изменения, имя и итоговая строка.
+
+    Читается только центральный каталог в конце архива, данные элементов не распаковываются.
+    """
+    with zipfile.ZipFile(archive) as zf:
+        infos = [info for info in zf.infolist()
+                 if info.filename != DELETED_MEMBER and (not patterns or member_matches(info.filename, patterns))]
+    total = 0
+    for info in infos:
+        total += info.file_size
+        year, month, day, hour, minute, _ = info.date_time
+        yield f"{info.file_size:>10}  {year:04}-{month:02}-{day:02} {hour:02}:{minute:02}  {info.filename}"
+    yield f"{total:>10}  {len(infos)} files"
+
+def verify_zip(archive: pathlib.Path, jobs: int = 1):
+    """
+    Проверяет zip-архив без распаковки на диск: каждый элемент читается блоками, CRC-32 сверяется
+    с записанным в архиве, а SHA-256 — с файлом контрольных сумм <архив>.sha256, если он есть.
+
+    jobs: количество потоков; элементы проверяются параллельно, у каждого потока свой ZipFile
+
+    Возвращает кортеж (количество проверенных элементов, список (имя, причина) для ошибок).
+    """
+    with zipfile.ZipFile(archive) as zf:
+        infos = [info for info in zf.infolist() if not info.is_dir()]
+
+    local = threading.local()
+    handles = []
+    lock = threading.Lock()
+
+    def check_one(info: zipfile.ZipInfo):
+        zf = getattr(local, "zf", None)
+        if zf is None:
+            zf = local.zf = zipfile.ZipFile(archive)
+            with lock:
+                handles.append(zf)
+        try:
+            with zf.open(info) as f:
+                return stream_hash(f), None
+        except (zipfile.BadZipFile, zlib.error, EOFError, NotImplementedError, RuntimeError) as e:
+            return None, str(e)
+
+    actual = {}
+    failures = []
+    try:
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            for info, (digest, error) in zip(infos, pool.map(check_one, infos)):
+                if error is None:
+                    actual[info.filename] = digest
+                else:
+                    failures.append((info.filename, error))
+    finally:
+        for zf in handles:
+            zf.close()
+    failures.extend(compare_checksums(actual, load_checksums(archive), {name for name, _ in failures}))
+    return len(infos), failures
+
 def cmd_unzip(args):
     """
-    Распаковывает zip-архив в текущую директорию.
+    Распаковывает zip-архивы в текущую или указанную директорию.
 
     args: список аргументов команды unzip
-        - args[0]: путь к архиву (.zip)
+        - '-j N': распаковывать в N потоков
+        - '-d DIR': распаковать в директорию DIR (создаётся при необходимости)
+        - '-l': только вывести список элементов архивов (читается центральный каталог)
+        - '--verify': проверить архивы без распаковки (CRC-32 и SHA-256 по <архив>.sha256, см. verify_zip)
+        - первый аргумент: архив (.zip); остальные аргументы: шаблоны элементов архива, которые нужно распаковать
+        - 'ARCHIVE ... -- [MEMBER ...]': несколько архивов до '--' распаковываются по порядку,
+          так применяется цепочка из полного и инкрементальных архивов; после '--' — шаблоны элементов
+
+    Элементы с '..' или абсолютными путями не выходят за пределы директории распаковки.
 
     Вызывает ShellError при:
         - неправильном количестве аргументов
         - если архив не существует
         - при ошибках распаковки
+        - если проверка архива нашла ошибки
 
     Создает запись в истории команд.
     """
-    if len(args) != 1:
-        raise ShellError("Usage: unzip <archive.zip>")
-    archive_path = ensure_exists(normalize(args[0]),"unzip")
+    jobs, unzip_args = parse_jobs(args, "unzip")
+    dest = pathlib.Path.cwd()
+    listing = False
+    verify = False
+    rest = []
+    arg_iter = iter(unzip_args)
+    for arg in arg_iter:
+        if arg == "-l":
+            listing = True
+        elif arg == "--verify":
+            verify = True
+        elif arg == "-d":
+            value = next(arg_iter, None)
+            if value is None:
+                raise ShellError("unzip: option '-d' requires a directory")
+            dest = normalize(value)
+        else:
+            rest.append(arg)
+    archive_args, patterns = split_archives(rest)
+    if len(archive_args) < 1:
+        raise ShellError("Usage: unzip [-j N] [-d DIR] [-l] [--verify] <archive.zip> [MEMBER ...]\n"
+                         "       unzip [-j N] [-d DIR] [-l] [--verify] <archive.zip> [INCREMENTAL.zip ...] -- [MEMBER ...]")
+    archives = [ensure_exists(normalize(arg), "unzip") for arg in archive_args]
 
     try:
-        with zipfile.ZipFile(archive_path, "r") as zf:
-            zf.extractall(pathlib.Path.cwd())
+        failed = []
+        for archive_path in archives:
+            if verify:
+                count, failures = verify_zip(archive_path, jobs)
+                write_lines(verify_report(archive_path, count, failures))
+                if failures:
+                    failed.append(str(archive_path))
+            elif listing:
+                write_lines(list_zip(archive_path, patterns))
+            else:
+                extract_zip(archive_path, dest, jobs, patterns)
+        if failed:
+            raise ShellError(f"unzip: verification failed: {', '.join(failed)}")
         last_cmd_number = get_last_history_number() + 1
-        record = {"cmd": "unzip", "src": str(archive_path), "number": last_cmd_number, "user_input": "unzip " + " ".join(args)}
+        record = {"cmd": "unzip", "src": str(archives[0]), "dest": str(dest), "number": last_cmd_number,
+                  "user_input": "unzip " + " ".join(args)}
         create_history_record(record)
+    except ShellError:
+        raise
     except Exception as e:
         raise ShellError(f"unzip: {e}")
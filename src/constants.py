@@ -3,6 +3,22 @@ RIGHTS = {4:'r',2:'w',1:'x'}
 ROOT_DIR = pathlib.Path(__file__).resolve().parent
 PROJECT_ROOT = ROOT_DIR.parent
 TRASH_PATH = PROJECT_ROOT / "src" / ".trash"
+# Корзины на других файловых системах: точка монтирования -> директория корзины.
+# Для файловых систем, которых здесь нет, корзина создаётся в корне как TRASH_DIR_NAME.
+TRASH_DIRS: dict[str, str] = {}
+TRASH_DIR_NAME = ".trash"
+# Ограничения корзины: объём одной корзины в байтах и возраст объектов в секундах (None — без ограничения)
+TRASH_MAX_BYTES: int | None = 10 * 1024 ** 3
+TRASH_MAX_AGE: float | None = 30 * 24 * 60 * 60
+# Как часто фоновый сборщик очищает корзины, в секундах
+TRASH_GC_INTERVAL = 10 * 60
 HISTORY_PATH = PROJECT_ROOT / "src" / ".history"
+# Триграммные индексы для grep --index, по базе SQLite на каждую директорию поиска
+GREP_INDEX_PATH = PROJECT_ROOT / "src" / ".grep-index"
 LOG_FILE = PROJECT_ROOT / "src" / "shell.log"
+# Хранилище истории: "jsonl" (src/.history) или "sqlite" (src/.history.sqlite)
+HISTORY_BACKEND = "jsonl"
+# Когда сбрасывать историю на диск через fsync: "none", "command" (после каждой команды) или "periodic"
+HISTORY_FSYNC_POLICY = "none"
+HISTORY_FSYNC_INTERVAL = 5.0
 TRASH_PATH.mkdir(exist_ok=True)
@@ -0,0 +1,252 @@
+import json
+import os
+import pathlib
+import time
+from datetime import datetime
+
+from src.constants import HISTORY_BACKEND, HISTORY_FSYNC_INTERVAL, HISTORY_FSYNC_POLICY, HISTORY_PATH
+from src.history.jsonl import JsonlHistory
+from src.history.sqlite import SqliteHistory
+
+BACKENDS = {
+    "jsonl": JsonlHistory,
+    "sqlite": SqliteHistory,
+}
+
+_active_session = None
+_last_fsync = 0.0
+
+
+def get_history_backend():
+    """
+    Возвращает хранилище истории, выбранное в HISTORY_BACKEND ("jsonl" или "sqlite").
+
+    Любое хранилище должно реализовывать методы append, last_number, iter_reversed, query и compact.
+    """
+    return BACKENDS[HISTORY_BACKEND](HISTORY_PATH)
+
+def rebuild_history_index():
+    """
+    Перестраивает индекс JSON-файла истории за один проход.
+
+    Используется для миграции существующего .history и для восстановления
+    индекса, если он устарел. Возвращает номер последней команды.
+    """
+    return JsonlHistory(HISTORY_PATH).rebuild_index()
+
+def _write_records(records: list, fsync_policy: str):
+    """
+    Записывает записи в хранилище истории одним обращением.
+
+    records: список словарей с данными команд
+    fsync_policy: "none", "command" или "periodic" (см. HISTORY_FSYNC_POLICY)
+    """
+    global _last_fsync
+    if not records:
+        return
+    now = time.monotonic()
+    sync = fsync_policy == "command" or (
+        fsync_policy == "periodic" and now - _last_fsync >= HISTORY_FSYNC_INTERVAL)
+    get_history_backend().append(records, sync)
+    if sync:
+        _last_fsync = now
+
+
+class HistorySession:
+    """
+    Буфер записей истории для одной пользовательской команды.
+
+    Пока сессия открыта (with HistorySession() as session: ...), create_history_record
+    складывает записи в буфер, а при выходе из блока они записываются одним write().
+    Записи сохраняются и при исключении, чтобы уже выполненные действия можно было отменить.
+    """
+
+    def __init__(self, fsync_policy: str | None = None):
+        """
+        fsync_policy: политика fsync для этой сессии, по умолчанию HISTORY_FSYNC_POLICY
+        """
+        self.records: list[dict] = []
+        self.fsync_policy = fsync_policy or HISTORY_FSYNC_POLICY
+        self._number: int | None = None
+        self._previous: HistorySession | None = None
+
+    @property
+    def number(self) -> int:
+        """
+        Номер команды сессии; выделяется один раз при первом обращении.
+        """
+        if self._number is None:
+            self._number = get_last_history_number() + 1
+        return self._number
+
+    def add(self, record: dict):
+        """
+        Добавляет запись в буфер сессии.
+        """
+        self.records.append(record)
+
+    def flush(self):
+        """
+        Записывает накопленные записи в историю и очищает буфер.
+        """
+        records, self.records = self.records, []
+        _write_records(records, self.fsync_policy)
+
+    def __enter__(self):
+        global _active_session
+        self._previous = _active_session
+        _active_session = self
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        global _active_session
+        _active_session = self._previous
+        self.flush()
+        return False
+
+
+def create_history_record(record: dict):
+    """
+    Добавляет запись в историю команд.
+
+    record: словарь с данными команды, например:
+        {
+            "cmd": "cp",
+            "src": "...",
+            "dest": "...",
+            "number": 1,
+            "user_input": "cp a b"
+        }
+
+    К записи добавляется время выполнения ("timestamp") для поиска через history --since.
+    Если открыта HistorySession, запись попадает в её буфер.
+    """
+    record = {**record, "timestamp": datetime.now().isoformat(timespec="seconds")}
+    if _active_session is not None:
+        _active_session.add(record)
+    else:
+        _write_records([record], HISTORY_FSYNC_POLICY)
+
+def get_last_history_number():
+    """
+    Возвращает номер последней команды в истории.
+
+    Если история пуста, возвращает 0.
+    """
+    return get_history_backend().last_number()
+
+def iter_history_reversed(include_reverted=False):
+    """
+    Лениво перебирает записи истории от последней к первой.
+
+    include_reverted: если False, пропускает записи команд, отменённых через undo
+
+    Возвращает генератор словарей с данными команд.
+    """
+    return get_history_backend().iter_reversed(include_reverted)
+
+def _collect_commands(records, n=None):
+    """
+    Собирает из записей (от последней к первой) не более n различных команд.
+
+    Возвращает список кортежей (номер_команды, user_input), отсортированный по номеру.
+    """
+    res = []
+    for cmd_data in records:
+        if "number" not in cmd_data or "user_input" not in cmd_data:
+            continue
+        item = (cmd_data["number"], cmd_data["user_input"])
+        if item in res:
+            continue
+        if n is not None and len(res) >= n:
+            break
+        res.append(item)
+    return sorted(res,key=lambda x:x[0])
+
+def get_last_history(n=10):
+    """
+    Возвращает последние n команд из истории.
+
+    n: количество последних команд для вывода (по умолчанию 10)
+
+    Возвращает список кортежей (номер_команды, user_input)
+    """
+    return _collect_commands(iter_history_reversed(), n)
+
+def query_history(pattern=None, cmd=None, since=None, n=None):
+    """
+    Ищет команды в истории.
+
+    pattern: подстрока в тексте команды (без учёта регистра)
+    cmd: имя команды, например "rm"
+    since: дата/время в формате ISO ("2025-01-31" или "2025-01-31 12:00:00")
+    n: максимальное количество последних найденных команд (по умолчанию все)
+
+    Возвращает список кортежей (номер_команды, user_input)
+    """
+    if since:
+        since = datetime.fromisoformat(since).isoformat(timespec="seconds")
+    return _collect_commands(get_history_backend().query(pattern, cmd, since), n)
+
+def get_last_history_undo_cmd():
+    """
+    Возвращает последнюю команду undo-доступного типа (cp, mv, rm) для отмены.
+
+    Если команда была многокомандной (multi), возвращает все связанные записи.
+
+    Возвращает список словарей с данными команд или None, если подходящих команд нет.
+    """
+    res = []
+    for cmd_data in iter_history_reversed():
+        if res:
+            if cmd_data.get("number") != res[0]["number"] or len(res) >= int(res[0]["multi"]):
+                break
+            res.append(cmd_data)
+            continue
+        if cmd_data.get("cmd") not in ["rm","cp","mv"]:
+            continue
+        res.append(cmd_data)
+        if "multi" not in cmd_data:
+            break
+    return res
+
+def _undo_progress_path() -> pathlib.Path:
+    """
+    Возвращает путь к файлу прогресса прерванной отмены: <история>.undo-progress.
+    """
+    return pathlib.Path(f"{HISTORY_PATH}.undo-progress")
+
+def load_undo_progress(number: int) -> set:
+    """
+    Возвращает индексы записей команды number, которые уже отменены прерванной ошибкой отменой.
+    """
+    try:
+        with open(_undo_progress_path(), "r", encoding="utf-8") as f:
+            progress = json.load(f)
+    except (OSError, ValueError):
+        return set()
+    return set(progress["done"]) if progress.get("number") == number else set()
+
+def save_undo_progress(number: int, done: set):
+    """
+    Атомарно сохраняет индексы отменённых записей команды number, чтобы повторная отмена их пропустила.
+    """
+    path = _undo_progress_path()
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"number": number, "done": sorted(done)}, f)
+    os.replace(tmp, path)
+
+def clear_undo_progress():
+    """
+    Удаляет файл прогресса отмены после того, как команда отменена полностью.
+    """
+    _undo_progress_path().unlink(missing_ok=True)
+
+def compact_history():
+    """
+    Удаляет из истории записи отменённых команд.
+
+    Возвращает количество удалённых записей.
+    """
+    return get_history_backend().compact()
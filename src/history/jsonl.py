@@ -0,0 +1,231 @@
+import json
+import os
+import pathlib
+import struct
+
+from src.utils import read_lines_reversed
+
+# Запись индекса: смещение строки в .history, её длина и максимальный номер команды на этот момент
+INDEX_ENTRY = struct.Struct("<QQQ")
+
+
+def record_number(record: dict) -> int:
+    """
+    Возвращает номер команды из записи или 0, если номера нет.
+    """
+    try:
+        return int(record.get("number") or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+class JsonlHistory:
+    """
+    История в текстовом файле: одна JSON-запись на строку.
+
+    Рядом с файлом хранится индекс (<history>.idx) с записями фиксированного размера,
+    по которому номер последней команды и добавление записи не зависят от размера истории.
+    """
+
+    def __init__(self, path):
+        """
+        path: путь к файлу истории
+        """
+        self.path = pathlib.Path(path)
+        self.index_path = pathlib.Path(f"{path}.idx")
+
+    def _read_index_tail(self, history_size: int):
+        """
+        Читает последнюю запись индекса.
+
+        history_size: текущий размер файла истории в байтах
+
+        Возвращает кортеж (смещение, длина, номер) или None, если индекса нет
+        либо он не соответствует файлу истории (устарел или повреждён).
+        """
+        try:
+            with open(self.index_path, "rb") as f:
+                index_size = f.seek(0, os.SEEK_END)
+                if index_size % INDEX_ENTRY.size:
+                    return None
+                if index_size == 0:
+                    return (0, 0, 0) if history_size == 0 else None
+                f.seek(index_size - INDEX_ENTRY.size)
+                entry = INDEX_ENTRY.unpack(f.read(INDEX_ENTRY.size))
+        except OSError:
+            return None
+        offset, length, _ = entry
+        if offset + length != history_size:
+            return None
+        return entry
+
+    def rebuild_index(self) -> int:
+        """
+        Перестраивает индекс по файлу истории за один проход.
+
+        Используется для миграции существующего .history и для восстановления
+        индекса, если он устарел. Возвращает номер последней команды.
+        """
+        last_number = 0
+        offset = 0
+        index_tmp = self.index_path.with_name(self.index_path.name + ".tmp")
+        with open(index_tmp, "wb") as index:
+            if self.path.exists():
+                with open(self.path, "rb") as f:
+                    for line in f:
+                        if line.strip():
+                            try:
+                                last_number = max(record_number(json.loads(line)), last_number)
+                            except json.JSONDecodeError:
+                                pass
+                        index.write(INDEX_ENTRY.pack(offset, len(line), last_number))
+                        offset += len(line)
+        os.replace(index_tmp, self.index_path)
+        return last_number
+
+    def append(self, records: list, sync: bool = False):
+        """
+        Дописывает записи в историю и индекс одним вызовом write() на каждый файл.
+
+        records: список словарей с данными команд
+        sync: вызвать fsync после записи
+        """
+        if not records:
+            return
+        lines = [(json.dumps(record) + '\n').encode() for record in records]
+        entries = []
+        with open(self.path, 'ab') as f:
+            offset = f.seek(0, os.SEEK_END)
+            tail = self._read_index_tail(offset)
+            last_number = tail[2] if tail else self.rebuild_index()
+            for record, line in zip(records, lines):
+                last_number = max(record_number(record), last_number)
+                entries.append(INDEX_ENTRY.pack(offset, len(line), last_number))
+                offset += len(line)
+            f.write(b"".join(lines))
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+        with open(self.index_path, 'ab') as index:
+            index.write(b"".join(entries))
+
+    def last_number(self) -> int:
+        """
+        Возвращает номер последней команды в истории.
+
+        Если история пуста, возвращает 0.
+        Номер берётся из последней записи индекса; если индекса нет (старый файл истории),
+        история просматривается целиком, а индекс будет построен при следующей записи.
+        """
+        try:
+            history_size = os.path.getsize(self.path)
+        except OSError:
+            return 0
+        tail = self._read_index_tail(history_size)
+        if tail:
+            return tail[2]
+        last_number = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    last_number = max(record_number(json.loads(line)), last_number)
+                except json.JSONDecodeError:
+                    continue
+        return last_number
+
+    def iter_reversed(self, include_reverted: bool = False):
+        """
+        Лениво перебирает записи истории от последней к первой.
+
+        include_reverted: если False, пропускает записи команд, отменённых через undo
+
+        Файл читается блоками с конца, поэтому для последних записей
+        затрагиваются только последние килобайты истории.
+        Запись undo хранит номер отменённой команды в поле "reverted" и всегда
+        находится после записей этой команды, поэтому встречается раньше них.
+
+        Возвращает генератор словарей с данными команд.
+        """
+        if not self.path.exists():
+            return
+        reverted = set()
+        for line in read_lines_reversed(self.path):
+            if not line.strip():
+                continue
+            try:
+                cmd_data = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if "reverted" in cmd_data:
+                reverted.add(cmd_data["reverted"])
+            if not include_reverted and cmd_data.get("number") in reverted:
+                continue
+            yield cmd_data
+
+    def query(self, pattern: str | None = None, cmd: str | None = None, since: str | None = None):
+        """
+        Ищет записи истории по условиям; все условия необязательны.
+
+        pattern: подстрока в user_input (без учёта регистра)
+        cmd: имя команды
+        since: нижняя граница времени в формате ISO ("2025-01-31T12:00:00")
+
+        JSON-файл не индексирован, поэтому история просматривается целиком с конца.
+        Возвращает генератор словарей с данными команд от последней к первой.
+        """
+        pattern = pattern.lower() if pattern else None
+        for cmd_data in self.iter_reversed():
+            if cmd and cmd_data.get("cmd") != cmd:
+                continue
+            if since and cmd_data.get("timestamp", "") < since:
+                continue
+            if pattern and pattern not in cmd_data.get("user_input", "").lower():
+                continue
+            yield cmd_data
+
+    def compact(self) -> int:
+        """
+        Переписывает историю без записей отменённых команд.
+
+        Сначала собирает номера отменённых команд, затем за один потоковый проход
+        переписывает историю во временный файл вместе с новым индексом и подменяет им старые файлы.
+
+        Возвращает количество удалённых записей.
+        """
+        if not self.path.exists():
+            return 0
+        reverted = set()
+        with open(self.path, "rb") as f:
+            for line in f:
+                if b'"reverted"' not in line:
+                    continue
+                try:
+                    reverted.add(json.loads(line)["reverted"])
+                except (json.JSONDecodeError, KeyError):
+                    continue
+        removed = 0
+        offset = 0
+        last_number = 0
+        history_tmp = self.path.with_name(self.path.name + ".tmp")
+        index_tmp = self.index_path.with_name(self.index_path.name + ".tmp")
+        with open(self.path, "rb") as src, open(history_tmp, "wb") as dest, open(index_tmp, "wb") as index:
+            for line in src:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    removed += 1
+                    continue
+                if record.get("number") in reverted:
+                    removed += 1
+                    continue
+                last_number = max(record_number(record), last_number)
+                dest.write(line)
+                index.write(INDEX_ENTRY.pack(offset, len(line), last_number))
+                offset += len(line)
+        os.replace(history_tmp, self.path)
+        os.replace(index_tmp, self.index_path)
+        return removed
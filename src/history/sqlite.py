@@ -0,0 +1,183 @@
+import functools
+import json
+import pathlib
+import sqlite3
+
+from src.history.jsonl import JsonlHistory, record_number
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    number INTEGER,
+    cmd TEXT,
+    user_input TEXT,
+    timestamp TEXT,
+    reverted INTEGER,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS history_number ON history(number);
+CREATE INDEX IF NOT EXISTS history_cmd ON history(cmd, id);
+CREATE INDEX IF NOT EXISTS history_timestamp ON history(timestamp);
+CREATE INDEX IF NOT EXISTS history_reverted ON history(reverted) WHERE reverted IS NOT NULL;
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+# Полнотекстовый индекс по триграммам для поиска подстроки в user_input (SQLite >= 3.34)
+FTS_SCHEMA = "CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5(user_input, tokenize='trigram')"
+NOT_REVERTED = "(number IS NULL OR number NOT IN (SELECT reverted FROM history WHERE reverted IS NOT NULL))"
+
+
+@functools.lru_cache(maxsize=None)
+def fts_available() -> bool:
+    """
+    Проверяет один раз за процесс, что SQLite поддерживает FTS5 с токенизатором trigram.
+    """
+    conn = sqlite3.connect(":memory:")
+    try:
+        conn.execute(FTS_SCHEMA)
+        return True
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        conn.close()
+
+class SqliteHistory:
+    """
+    История в базе SQLite (<history>.sqlite) с индексами по номеру, команде и времени.
+
+    При первом открытии в базу импортируется существующий JSON-файл истории.
+    """
+
+    def __init__(self, path):
+        """
+        path: путь к JSON-файлу истории; база создаётся рядом с ним
+        """
+        self.jsonl_path = pathlib.Path(path)
+        self.path = pathlib.Path(f"{path}.sqlite")
+        self.fts = fts_available()
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Открывает базу, при необходимости создаёт схему и импортирует JSON-историю.
+
+        Если полнотекстового индекса в базе ещё нет (база создана SQLite без FTS5), он создаётся
+        и заполняется уже записанными командами.
+        """
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        if self.fts and conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'history_fts'").fetchone() is None:
+            with conn:
+                conn.execute(FTS_SCHEMA)
+                conn.execute("INSERT INTO history_fts (rowid, user_input) "
+                             "SELECT id, user_input FROM history WHERE user_input IS NOT NULL")
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'jsonl_imported'").fetchone() is None:
+            with conn:
+                if self.jsonl_path.exists():
+                    records = reversed(list(JsonlHistory(self.jsonl_path).iter_reversed(include_reverted=True)))
+                    self._insert(conn, records)
+                conn.execute("INSERT INTO meta VALUES ('jsonl_imported', '1')")
+        return conn
+
+    def _insert(self, conn: sqlite3.Connection, records):
+        """
+        Вставляет записи в таблицу истории и в полнотекстовый индекс.
+        """
+        for record in records:
+            cursor = conn.execute(
+                "INSERT INTO history (number, cmd, user_input, timestamp, reverted, data) VALUES (?, ?, ?, ?, ?, ?)",
+                (record.get("number"), record.get("cmd"), record.get("user_input"),
+                 record.get("timestamp"), record.get("reverted"), json.dumps(record)))
+            if self.fts and record.get("user_input"):
+                conn.execute("INSERT INTO history_fts (rowid, user_input) VALUES (?, ?)",
+                             (cursor.lastrowid, record["user_input"]))
+
+    def append(self, records: list, sync: bool = False):
+        """
+        Добавляет записи одной транзакцией.
+
+        records: список словарей с данными команд
+        sync: дождаться записи на диск (PRAGMA synchronous=FULL)
+        """
+        if not records:
+            return
+        conn = self._connect()
+        try:
+            conn.execute(f"PRAGMA synchronous={'FULL' if sync else 'NORMAL'}")
+            with conn:
+                self._insert(conn, records)
+        finally:
+            conn.close()
+
+    def last_number(self) -> int:
+        """
+        Возвращает номер последней команды (по индексу history_number) или 0.
+        """
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT MAX(number) FROM history").fetchone()
+        finally:
+            conn.close()
+        return record_number({"number": row[0]})
+
+    def _select(self, where: list, params: list):
+        """
+        Лениво выбирает записи по условиям where от последней к первой.
+        """
+        conn = self._connect()
+        try:
+            sql = "SELECT data FROM history"
+            if where:
+                sql += " WHERE " + " AND ".join(where)
+            for (data,) in conn.execute(sql + " ORDER BY id DESC", params):
+                yield json.loads(data)
+        finally:
+            conn.close()
+
+    def iter_reversed(self, include_reverted: bool = False):
+        """
+        Лениво перебирает записи истории от последней к первой.
+
+        include_reverted: если False, пропускает записи команд, отменённых через undo
+        """
+        return self._select([] if include_reverted else [NOT_REVERTED], [])
+
+    def query(self, pattern: str | None = None, cmd: str | None = None, since: str | None = None):
+        """
+        Ищет записи истории по условиям; все условия необязательны.
+
+        pattern: подстрока в user_input (без учёта регистра); от трёх символов ищется по триграммному индексу
+        cmd: имя команды (индекс history_cmd)
+        since: нижняя граница времени в формате ISO (индекс history_timestamp)
+
+        Возвращает генератор словарей с данными команд от последней к первой.
+        """
+        where, params = [NOT_REVERTED], []
+        if cmd:
+            where.append("cmd = ?")
+            params.append(cmd)
+        if since:
+            where.append("timestamp >= ?")
+            params.append(since)
+        if pattern:
+            if self.fts and len(pattern) >= 3:
+                where.append("id IN (SELECT rowid FROM history_fts WHERE history_fts MATCH ?)")
+                params.append('"' + pattern.replace('"', '""') + '"')
+            else:
+                where.append("instr(lower(user_input), ?) > 0")
+                params.append(pattern.lower())
+        return self._select(where, params)
+
+    def compact(self) -> int:
+        """
+        Удаляет записи отменённых команд. Возвращает количество удалённых записей.
+        """
+        conn = self._connect()
+        try:
+            with conn:
+                condition = "number IN (SELECT reverted FROM history WHERE reverted IS NOT NULL)"
+                if self.fts:
+                    conn.execute(f"DELETE FROM history_fts WHERE rowid IN (SELECT id FROM history WHERE {condition})")
+                removed = conn.execute(f"DELETE FROM history WHERE {condition}").rowcount
+        finally:
+            conn.close()
+        return removed
@@ -6,6 +6,7 @@ import socket
 import sys
 from src.constants import LOG_FILE
 import src.commands as com
+from src.utils.trash import start_trash_collector
 from errors.shell_errors import ShellError
 
 commands = {
@@ -23,6 +24,10 @@ commands = {
     "tar": com.cmd_tar,
     "untar": com.cmd_untar,
     "grep": com.cmd_grep,
+    "trash": com.cmd_trash,
+    "du": com.cmd_du,
+    "head": com.cmd_head,
+    "tail": com.cmd_tail,
 }
 
 logging.basicConfig(
@@ -36,6 +41,7 @@ logging.basicConfig(
 if __name__ == "__main__":
     host = socket.gethostname()
     user = getpass.getuser()
+    start_trash_collector()
     while True:
         cwd = str(pathlib.Path.cwd()).replace(str(pathlib.Path().home()),"~")
         user_input = input(f"{user}@{host}:{cwd}$ ")
@@ -1,7 +1,7 @@
-from .helpers import ensure_exists, move_to_trash, normalize
+from .helpers import ensure_exists, human_size, move_to_trash, normalize, parse_jobs, read_lines_reversed, write_lines
 
 
-commands = [ensure_exists, move_to_trash, normalize]
+commands = [ensure_exists, human_size, move_to_trash, normalize, parse_jobs, read_lines_reversed, write_lines]
 __all__ = [
     "commands",
 ]
@@ -0,0 +1,93 @@
+import hashlib
+import json
+import os
+import pathlib
+
+# Файл контрольных сумм рядом с архивом: <архив>.sha256
+CHECKSUMS_SUFFIX = ".sha256"
+VERIFY_CHUNK_SIZE = 1024 * 1024
+
+
+def checksums_path_for(archive: pathlib.Path) -> pathlib.Path:
+    """
+    Возвращает путь к файлу контрольных сумм архива.
+    """
+    return archive.with_name(f"{archive.name}{CHECKSUMS_SUFFIX}")
+
+class HashingReader:
+    """
+    Файловый объект для чтения, который считает SHA-256 данных, прочитанных из f.
+
+    Через него данные файла хешируются в тот момент, когда записываются в архив,
+    поэтому контрольная сумма совпадает с содержимым элемента архива.
+    """
+
+    def __init__(self, f):
+        self.f = f
+        self.digest = hashlib.sha256()
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.f.read(size)
+        self.digest.update(data)
+        return data
+
+def save_checksums(archive: pathlib.Path, checksums: dict):
+    """
+    Атомарно записывает контрольные суммы элементов архива в <архив>.sha256.
+    """
+    path = checksums_path_for(archive)
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"archive": archive.name, "sha256": checksums}, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+def load_checksums(archive: pathlib.Path) -> dict | None:
+    """
+    Читает контрольные суммы архива; возвращает None, если файла контрольных сумм нет.
+    """
+    path = checksums_path_for(archive)
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["sha256"]
+
+def stream_hash(f) -> str:
+    """
+    Читает файловый объект до конца блоками по VERIFY_CHUNK_SIZE и возвращает SHA-256 прочитанного.
+    """
+    digest = hashlib.sha256()
+    while chunk := f.read(VERIFY_CHUNK_SIZE):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+def compare_checksums(actual: dict, expected: dict | None, unreadable=()) -> list:
+    """
+    Сравнивает SHA-256 элементов архива actual с контрольными суммами expected (если они есть).
+
+    unreadable: элементы, которые не удалось прочитать; их ошибка уже известна, поэтому они
+    не считаются отсутствующими
+
+    Возвращает список кортежей (имя элемента, причина) для несовпавших, лишних и отсутствующих элементов.
+    """
+    if expected is None:
+        return []
+    failures = []
+    for name, digest in actual.items():
+        if name not in expected:
+            failures.append((name, "not in checksums"))
+        elif expected[name] != digest:
+            failures.append((name, "SHA-256 mismatch"))
+    failures.extend((name, "missing from archive") for name in expected
+                    if name not in actual and name not in unreadable)
+    return failures
+
+def verify_report(archive: pathlib.Path, count: int, failures: list):
+    """
+    Возвращает строки отчёта о проверке архива: по строке на каждую ошибку и итоговую строку.
+    """
+    for name, reason in failures:
+        yield f"{archive}: {name}: {reason}"
+    if failures:
+        yield f"{archive}: FAILED ({len(failures)} errors, {count} members)"
+    else:
+        yield f"{archive}: OK ({count} members)"
@@ -0,0 +1,418 @@
+import errno
+import json
+import os
+import pathlib
+import shutil
+import stat
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # type: ignore[assignment]
+
+# Как часто (в секундах) печатать прогресс длительных операций
+PROGRESS_INTERVAL = 1.0
+# Размер буфера для копирования через read/write
+COPY_BUFFER_SIZE = 1024 * 1024
+# Размер части файла, которая копируется одной задачей при перемещении между файловыми системами
+MOVE_CHUNK_SIZE = 64 * 1024 * 1024
+# ioctl клонирования файла на CoW-файловых системах (btrfs, xfs) в Linux
+FICLONE = 0x40049409
+# Ошибки, после которых имеет смысл попробовать следующий способ копирования
+FALLBACK_ERRNOS = {errno.ENOSYS, errno.EXDEV, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP,
+                   errno.EBADF, errno.ENOTTY, errno.EPERM}
+
+
+def _copy_reflink(fsrc, fdst, size: int) -> bool:
+    """
+    Клонирует содержимое файла (FICLONE), если файловая система это поддерживает.
+    """
+    if fcntl is None:
+        return False
+    try:
+        fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+    except OSError as e:
+        if e.errno in FALLBACK_ERRNOS:
+            return False
+        raise
+    return True
+
+def _copy_kernel(fsrc, fdst, size: int, syscall) -> bool:
+    """
+    Копирует файл внутри ядра через os.copy_file_range или os.sendfile.
+
+    Если системный вызов не поддерживается для этих файлов и ничего ещё не скопировано,
+    возвращает False, чтобы был выбран следующий способ.
+    """
+    if syscall is None:
+        return False
+    infd, outfd = fsrc.fileno(), fdst.fileno()
+    copied = 0
+    while True:
+        try:
+            if syscall is os.sendfile:
+                sent = os.sendfile(outfd, infd, copied, COPY_BUFFER_SIZE * 8)
+            else:
+                sent = syscall(infd, outfd, COPY_BUFFER_SIZE * 8, copied, copied)
+        except OSError as e:
+            if copied == 0 and e.errno in FALLBACK_ERRNOS:
+                return False
+            raise
+        if sent == 0:
+            break
+        copied += sent
+    if copied == 0 and size > 0:
+        return False
+    return True
+
+def _copy_buffered(fsrc, fdst):
+    """
+    Копирует файл через readinto в один переиспользуемый буфер.
+    """
+    buffer = bytearray(COPY_BUFFER_SIZE)
+    view = memoryview(buffer)
+    while True:
+        n = fsrc.readinto(buffer)
+        if not n:
+            break
+        fdst.write(view[:n])
+
+def copy_file(src, dest, metadata: bool = False) -> str:
+    """
+    Копирует содержимое файла и права доступа, как shutil.copy, но с самым быстрым доступным способом.
+
+    src: путь к исходному файлу
+    dest: путь к файлу назначения или к директории, в которую нужно скопировать файл
+    metadata: также скопировать время доступа и изменения (как shutil.copy2)
+
+    Способы пробуются по порядку: клонирование (reflink) на CoW-файловых системах,
+    os.copy_file_range, os.sendfile и, наконец, чтение в переиспользуемый буфер.
+    Права выставляются на уже открытый файл назначения, без отдельного прохода по пути.
+
+    Вызывает shutil.SameFileError, если src и dest — один и тот же файл,
+    и shutil.SpecialFileError для именованных каналов.
+    Возвращает название использованного способа: "reflink", "copy_file_range", "sendfile" или "buffered".
+    """
+    if os.path.isdir(dest):
+        dest = os.path.join(dest, os.path.basename(src))
+    src_stat = os.stat(src)
+    if stat.S_ISFIFO(src_stat.st_mode):
+        raise shutil.SpecialFileError(f"`{src}` is a named pipe")
+    try:
+        if os.path.samefile(src, dest):
+            raise shutil.SameFileError(f"{src!r} and {dest!r} are the same file")
+    except FileNotFoundError:
+        pass
+    with open(src, "rb") as fsrc, open(dest, "wb") as fdst:
+        size = src_stat.st_size
+        if size and _copy_reflink(fsrc, fdst, size):
+            strategy = "reflink"
+        elif size and _copy_kernel(fsrc, fdst, size, getattr(os, "copy_file_range", None)):
+            strategy = "copy_file_range"
+        elif size and _copy_kernel(fsrc, fdst, size, getattr(os, "sendfile", None)):
+            strategy = "sendfile"
+        else:
+            fsrc.seek(0)
+            fdst.seek(0)
+            fdst.truncate()
+            _copy_buffered(fsrc, fdst)
+            strategy = "buffered"
+        if hasattr(os, "fchmod"):
+            os.fchmod(fdst.fileno(), stat.S_IMODE(src_stat.st_mode))
+        if metadata:
+            fdst.flush()
+            os.utime(fdst.fileno() if os.utime in os.supports_fd else dest,
+                     ns=(src_stat.st_atime_ns, src_stat.st_mtime_ns))
+    if not hasattr(os, "fchmod"):
+        os.chmod(dest, stat.S_IMODE(src_stat.st_mode))
+    return strategy
+
+
+class CopyProgress:
+    """
+    Потокобезопасный счётчик скопированных файлов и байт.
+
+    Печатает прогресс не чаще раза в PROGRESS_INTERVAL секунд и итоговую строку в finish().
+    """
+
+    def __init__(self, cmd: str, total_bytes: int | None = None):
+        """
+        cmd: имя команды, с которого начинаются строки прогресса
+        total_bytes: общий объём; если известен, в прогрессе печатается оставшееся время
+        """
+        self.cmd = cmd
+        self.total_bytes = total_bytes
+        self.files = 0
+        self.bytes = 0
+        self.strategies: Counter[str] = Counter()
+        self.started = time.monotonic()
+        self._last_report = self.started
+        self._lock = threading.Lock()
+
+    def add(self, nbytes: int, strategy: str | None = None, files: int = 1):
+        """
+        Учитывает скопированные данные: nbytes байт, files файлов и способ, которым они были скопированы.
+        """
+        with self._lock:
+            self.files += files
+            self.bytes += nbytes
+            if strategy:
+                self.strategies[strategy] += files
+            now = time.monotonic()
+            if now - self._last_report >= PROGRESS_INTERVAL:
+                self._last_report = now
+                print(self._report(now))
+
+    def _report(self, now: float) -> str:
+        """
+        Возвращает строку прогресса; при известном общем объёме — со скоростью и оставшимся временем.
+        """
+        line = f"{self.cmd}: {self.files} files, {self.bytes / 2**20:.1f} MB copied"
+        if self.total_bytes:
+            speed = self.bytes / max(now - self.started, 1e-6)
+            eta = (self.total_bytes - self.bytes) / speed if speed else 0
+            line += (f" of {self.total_bytes / 2**20:.1f} MB ({self.bytes * 100 // self.total_bytes}%),"
+                     f" {speed / 2**20:.1f} MB/s, ETA {eta:.0f}s")
+        return line
+
+    def finish(self):
+        """
+        Печатает итог: количество файлов, объём и скорость копирования.
+        """
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        strategies = ", ".join(f"{name}: {count}" for name, count in self.strategies.most_common())
+        print(f"{self.cmd}: {self.files} files, {self.bytes / 2**20:.1f} MB copied "
+              f"in {elapsed:.2f}s ({self.bytes / 2**20 / elapsed:.1f} MB/s)" + (f" [{strategies}]" if strategies else ""))
+
+
+def copy_tree_parallel(src: pathlib.Path, dest: pathlib.Path, jobs: int, cmd: str = "cp",
+                       copy_function=None):
+    """
+    Рекурсивно копирует директорию src в новую директорию dest на пуле из jobs потоков.
+
+    src: исходная директория
+    dest: создаваемая директория назначения (не должна существовать)
+    jobs: количество потоков копирования
+    cmd: имя команды для строк прогресса
+    copy_function: функция копирования одного файла (src, dest), по умолчанию copy_file с копированием времени;
+        если она возвращает название способа копирования, оно учитывается в итоговой строке
+
+    Дерево обходится через os.scandir; директории создаются до того, как их файлы попадают
+    в очередь потоков. Ошибка копирования отдельного файла не прерывает копирование остальных.
+    Атрибуты директорий копируются в конце, начиная с самых глубоких.
+
+    Возвращает список кортежей (путь, исключение) для файлов и директорий, которые не удалось скопировать.
+    """
+    if copy_function is None:
+        def copy_function(path, target):
+            return copy_file(path, target, metadata=True)
+    errors = []
+    progress = CopyProgress(cmd)
+    lock = threading.Lock()
+    dest.mkdir()
+    dirs = [(src, dest)]
+
+    def copy_one(path: str, target: pathlib.Path, size: int):
+        try:
+            strategy = copy_function(path, target)
+        except OSError as e:
+            with lock:
+                errors.append((path, e))
+        else:
+            progress.add(size, strategy if isinstance(strategy, str) else None)
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        i = 0
+        while i < len(dirs):
+            src_dir, dest_dir = dirs[i]
+            i += 1
+            try:
+                with os.scandir(src_dir) as it:
+                    for entry in it:
+                        target = dest_dir / entry.name
+                        try:
+                            if entry.is_dir():
+                                target.mkdir()
+                                dirs.append((pathlib.Path(entry.path), target))
+                            else:
+                                pool.submit(copy_one, entry.path, target, entry.stat().st_size)
+                        except OSError as e:
+                            with lock:
+                                errors.append((entry.path, e))
+            except OSError as e:
+                with lock:
+                    errors.append((str(src_dir), e))
+    for src_dir, dest_dir in reversed(dirs):
+        try:
+            shutil.copystat(src_dir, dest_dir)
+        except OSError as e:
+            errors.append((str(src_dir), e))
+    progress.finish()
+    return errors
+
+
+def _journal_path(src: pathlib.Path) -> pathlib.Path:
+    """
+    Возвращает путь к журналу перемещения src между файловыми системами (рядом с src).
+    """
+    return src.parent / f".{src.name}.mv-journal"
+
+def pending_move_target(src: pathlib.Path):
+    """
+    Возвращает путь назначения незавершённого перемещения src или None, если его нет.
+    """
+    try:
+        with open(_journal_path(src)) as f:
+            return pathlib.Path(json.loads(f.readline())["dest"])
+    except (OSError, ValueError, KeyError):
+        return None
+
+def _copy_chunk(src_file: str, dest_file: str, offset: int, length: int):
+    """
+    Копирует часть файла [offset, offset + length) в тот же диапазон файла назначения.
+
+    Использует os.copy_file_range, а если он недоступен между этими файловыми системами — pread/pwrite.
+    """
+    with open(src_file, "rb") as fsrc, open(dest_file, "r+b") as fdst:
+        infd, outfd = fsrc.fileno(), fdst.fileno()
+        end = offset + length
+        kernel_copy = hasattr(os, "copy_file_range")
+        while offset < end:
+            if kernel_copy:
+                try:
+                    n = os.copy_file_range(infd, outfd, end - offset, offset, offset)
+                except OSError as e:
+                    if e.errno not in FALLBACK_ERRNOS:
+                        raise
+                    kernel_copy = False
+                    continue
+            else:
+                data = os.pread(infd, min(COPY_BUFFER_SIZE * 8, end - offset), offset)
+                n = os.pwrite(outfd, data, offset) if data else 0
+            if n == 0:
+                break
+            offset += n
+
+def _move_across_devices(src: pathlib.Path, dest: pathlib.Path, jobs: int, cmd: str):
+    """
+    Перемещает src в dest на другую файловую систему: параллельное копирование частями, затем удаление src.
+
+    Скопированные части записываются в журнал рядом с src; если перемещение было прервано,
+    повторный вызов докопирует только недостающие части. Исходные файлы удаляются
+    только после того, как скопировано всё дерево.
+    """
+    journal_path = _journal_path(src)
+    done = set()
+    if journal_path.exists():
+        with open(journal_path) as f:
+            f.readline()
+            for line in f:
+                try:
+                    done.add(tuple(json.loads(line)))
+                except ValueError:
+                    continue
+    else:
+        with open(journal_path, "w") as f:
+            f.write(json.dumps({"dest": str(dest)}) + "\n")
+
+    dirs, files, links = [], [], []
+    if src.is_dir() and not src.is_symlink():
+        dirs.append("")
+        for root, dir_names, file_names in os.walk(src):
+            rel_root = os.path.relpath(root, src)
+            for name in dir_names + file_names:
+                rel = os.path.normpath(os.path.join(rel_root, name))
+                path = src / rel
+                if path.is_symlink():
+                    links.append(rel)
+                elif name in dir_names:
+                    dirs.append(rel)
+                else:
+                    files.append((rel, path.stat().st_size))
+    elif src.is_symlink():
+        links.append("")
+    else:
+        files.append(("", src.stat().st_size))
+
+    for rel in dirs:
+        (dest / rel).mkdir(parents=True, exist_ok=True)
+    tasks = []
+    done_bytes = 0
+    for rel, size in files:
+        target = dest / rel
+        chunks = range(max(1, -(-size // MOVE_CHUNK_SIZE)))
+        if not target.exists() or target.stat().st_size != size:
+            done.difference_update((rel, i) for i in chunks)
+            with open(target, "wb") as out:
+                out.truncate(size)
+        for i in chunks:
+            length = min(MOVE_CHUNK_SIZE, size - i * MOVE_CHUNK_SIZE)
+            if (rel, i) in done:
+                done_bytes += length
+            else:
+                tasks.append((rel, i, length, size))
+
+    progress = CopyProgress(cmd, total_bytes=sum(size for _, size in files))
+    progress.add(done_bytes, files=0)
+    lock = threading.Lock()
+
+    def copy_task(rel: str, i: int, length: int, size: int):
+        _copy_chunk(str(src / rel), str(dest / rel), i * MOVE_CHUNK_SIZE, length)
+        with lock, open(journal_path, "a") as journal:
+            journal.write(json.dumps([rel, i]) + "\n")
+        progress.add(length, files=1 if (i + 1) * MOVE_CHUNK_SIZE >= size else 0)
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(copy_task, *task) for task in tasks]
+        try:
+            for future in futures:
+                future.result()
+        except BaseException:
+            pool.shutdown(cancel_futures=True)
+            raise
+
+    for rel in links:
+        target = dest / rel
+        if not target.is_symlink():
+            os.symlink(os.readlink(src / rel), target)
+    for rel, _ in files:
+        shutil.copystat(src / rel, dest / rel)
+    for rel in reversed(dirs):
+        shutil.copystat(src / rel, dest / rel)
+    if dirs:
+        shutil.rmtree(src)
+    else:
+        os.unlink(src)
+    journal_path.unlink()
+    progress.finish()
+
+def move_path(src: pathlib.Path, dest: pathlib.Path, jobs: int = 1, cmd: str = "mv") -> bool:
+    """
+    Перемещает файл или директорию src в путь dest.
+
+    src: перемещаемый путь
+    dest: новый путь (не директория, в которую нужно переместить, а итоговый путь)
+    jobs: количество потоков копирования при перемещении на другую файловую систему
+    cmd: имя команды для строк прогресса
+
+    Сначала пробует os.rename; если пути на разных файловых системах (EXDEV),
+    копирует данные частями в jobs потоков с выводом скорости и оставшегося времени,
+    а затем удаляет исходные файлы. Прерванное перемещение продолжается при повторном вызове.
+
+    Возвращает True, если перемещение выполнялось между файловыми системами.
+    """
+    src = pathlib.Path(src)
+    dest = pathlib.Path(dest)
+    if not _journal_path(src).exists():
+        try:
+            os.rename(src, dest)
+            return False
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+    _move_across_devices(src, dest, jobs, cmd)
+    return True
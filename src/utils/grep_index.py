@@ -0,0 +1,151 @@
+import hashlib
+import os
+import pathlib
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+from src.constants import GREP_INDEX_PATH
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    indexed INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS postings (
+    trigram BLOB NOT NULL,
+    file_id INTEGER NOT NULL,
+    PRIMARY KEY (trigram, file_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_file ON postings(file_id);
+"""
+# Файлы больше этого размера не разбираются на триграммы и всегда попадают в кандидаты
+INDEX_MAX_FILE_SIZE = 64 * 1024 * 1024
+# Меньше этого количества изменённых файлов триграммы считаются в текущем процессе
+PARALLEL_MIN_FILES = 16
+
+
+def index_path_for(root: pathlib.Path) -> pathlib.Path:
+    """
+    Возвращает путь к базе индекса для директории root (в GREP_INDEX_PATH, по хешу пути).
+    """
+    digest = hashlib.sha1(str(root).encode()).hexdigest()[:16]
+    return pathlib.Path(GREP_INDEX_PATH) / f"{root.name or 'root'}-{digest}.sqlite"
+
+def literal_trigrams(literal: str) -> set:
+    """
+    Возвращает триграммы строки literal в том же виде, в каком они хранятся в индексе:
+    байты UTF-8 с ASCII-буквами в нижнем регистре.
+    """
+    data = literal.encode().lower()
+    return {data[i:i + 3] for i in range(len(data) - 2)}
+
+def file_trigrams(path: str):
+    """
+    Читает файл и возвращает множество его триграмм (выполняется в процессах пула).
+
+    Возвращает None, если файл слишком большой или не читается: такой файл всегда считается кандидатом.
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read(INDEX_MAX_FILE_SIZE + 1)
+    except OSError:
+        return None
+    if len(data) > INDEX_MAX_FILE_SIZE:
+        return None
+    data = data.lower()
+    return {data[i:i + 3] for i in range(len(data) - 2)}
+
+def _connect(root: pathlib.Path) -> sqlite3.Connection:
+    """
+    Открывает (и при необходимости создаёт) базу индекса директории root.
+    """
+    path = index_path_for(root)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+def update_index(conn: sqlite3.Connection, files: list, jobs: int = 1) -> int:
+    """
+    Обновляет индекс для файлов files: заново разбираются только новые файлы и файлы,
+    у которых изменились mtime или размер; записи об удалённых файлах удаляются.
+
+    jobs: количество процессов для разбора файлов
+
+    Возвращает количество заново разобранных файлов.
+    """
+    known = {path: (file_id, mtime_ns, size)
+             for file_id, path, mtime_ns, size in conn.execute("SELECT id, path, mtime_ns, size FROM files")}
+    changed = []
+    for file_path in files:
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            continue
+        entry = known.get(str(file_path))
+        if entry is None or entry[1:] != (st.st_mtime_ns, st.st_size):
+            changed.append((str(file_path), st.st_mtime_ns, st.st_size))
+    removed = [(file_id,) for path, (file_id, _, _) in known.items() if not os.path.exists(path)]
+
+    paths = [path for path, _, _ in changed]
+    if jobs > 1 and len(paths) >= PARALLEL_MIN_FILES:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            trigrams = pool.map(file_trigrams, paths, chunksize=4)
+            _store(conn, known, changed, trigrams, removed)
+    else:
+        _store(conn, known, changed, map(file_trigrams, paths), removed)
+    return len(changed)
+
+def _store(conn: sqlite3.Connection, known: dict, changed: list, trigrams, removed: list):
+    """
+    Записывает в индекс триграммы изменённых файлов и удаляет записи об удалённых в одной транзакции.
+    """
+    with conn:
+        conn.executemany("DELETE FROM postings WHERE file_id = ?", removed)
+        conn.executemany("DELETE FROM files WHERE id = ?", removed)
+        for (path, mtime_ns, size), grams in zip(changed, trigrams):
+            entry = known.get(path)
+            if entry is not None:
+                conn.execute("DELETE FROM postings WHERE file_id = ?", (entry[0],))
+                conn.execute("UPDATE files SET mtime_ns = ?, size = ?, indexed = ? WHERE id = ?",
+                             (mtime_ns, size, grams is not None, entry[0]))
+                file_id = entry[0]
+            else:
+                file_id = conn.execute("INSERT INTO files (path, mtime_ns, size, indexed) VALUES (?, ?, ?, ?)",
+                                       (path, mtime_ns, size, grams is not None)).lastrowid
+            if grams:
+                conn.executemany("INSERT INTO postings VALUES (?, ?)", ((gram, file_id) for gram in grams))
+
+def candidate_files(root: pathlib.Path, files: list, literal: str | None, jobs: int = 1) -> list:
+    """
+    Оставляет из files только файлы, которые могут содержать строку literal.
+
+    root: директория поиска; индекс хранится отдельно для каждой директории
+    files: файлы, найденные обходом директории
+    literal: строка, которая обязана быть в каждом совпадении; если она короче трёх байт
+        или не задана, индекс только обновляется, а кандидатами остаются все файлы
+    jobs: количество процессов для обновления индекса
+
+    Перед поиском индекс обновляется, поэтому результат совпадает с полным просмотром.
+    Порядок файлов сохраняется.
+    """
+    conn = _connect(root)
+    try:
+        update_index(conn, files, jobs)
+        grams = literal_trigrams(literal) if literal else set()
+        if not grams:
+            return list(files)
+        placeholders = ", ".join("?" * len(grams))
+        rows = conn.execute(
+            f"SELECT path FROM files WHERE indexed = 0 OR id IN ("
+            f"SELECT file_id FROM postings WHERE trigram IN ({placeholders}) "
+            f"GROUP BY file_id HAVING COUNT(*) = ?)",
+            (*grams, len(grams)))
+        matched = {path for path, in rows}
+    finally:
+        conn.close()
+    return [file_path for file_path in files if str(file_path) in matched]
@@ -0,0 +1,121 @@
+import contextlib
+import gzip
+import json
+import os
+import pathlib
+import tarfile
+import zlib
+
+GZIP_MAGIC = b"\x1f\x8b"
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+def is_gzip(path) -> bool:
+    """
+    Проверяет по сигнатуре, что файл сжат gzip.
+    """
+    with open(path, "rb") as f:
+        return f.read(2) == GZIP_MAGIC
+
+def index_path_for(archive: pathlib.Path) -> pathlib.Path:
+    """
+    Возвращает путь к индексу архива: файл <архив>.idx рядом с ним.
+    """
+    return archive.with_name(f"{archive.name}.idx")
+
+def gzip_members(path) -> list:
+    """
+    Находит границы членов многочленного gzip-файла за один проход распаковки.
+
+    Возвращает список кортежей (смещение в сжатом файле, смещение в распакованных данных)
+    для начала каждого члена.
+    """
+    members = []
+    compressed = 0
+    uncompressed = 0
+    with open(path, "rb") as f:
+        decompressor = None
+        data = b""
+        while True:
+            if not data:
+                data = f.read(READ_CHUNK_SIZE)
+                if not data:
+                    break
+            if decompressor is None:
+                decompressor = zlib.decompressobj(wbits=31)
+                members.append((compressed, uncompressed))
+            before = len(data)
+            uncompressed += len(decompressor.decompress(data))
+            data = decompressor.unused_data
+            compressed += before - len(data)
+            if decompressor.eof:
+                decompressor = None
+    return members
+
+def build_index(archive: pathlib.Path) -> dict:
+    """
+    Строит индекс tar.gz-архива и сохраняет его в <архив>.idx.
+
+    Индекс содержит границы членов gzip (gzip_members) и для каждого элемента tar —
+    имя, смещение его заголовка в распакованных данных, размер и признак директории.
+    Индекс привязан к размеру и mtime архива.
+
+    Распаковку можно начать только с начала члена gzip, поэтому для архива из одного члена
+    (обычный tar.gz, а не tar -j N) элементы не индексируются: "entries" равно None,
+    и индекс только запоминает, что архив читается с начала.
+    """
+    st = archive.stat()
+    members = gzip_members(archive)
+    entries = None
+    if len(members) > 1:
+        with tarfile.open(archive, "r:gz") as tf:
+            entries = [[member.name, member.offset, member.size, member.isdir()] for member in tf]
+    index = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "members": members, "entries": entries}
+    path = index_path_for(archive)
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    os.replace(tmp, path)
+    return index
+
+def load_index(archive: pathlib.Path) -> dict:
+    """
+    Возвращает индекс архива, перестраивая его, если индекса нет или архив изменился.
+    """
+    path = index_path_for(archive)
+    st = archive.stat()
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if index["size"] == st.st_size and index["mtime_ns"] == st.st_mtime_ns:
+            return index
+    except (OSError, ValueError, KeyError):
+        pass
+    return build_index(archive)
+
+@contextlib.contextmanager
+def open_member(archive: pathlib.Path, index: dict, offset: int):
+    """
+    Открывает элемент tar, заголовок которого лежит в распакованных данных по смещению offset.
+
+    Распаковка начинается с ближайшего предшествующего члена gzip, поэтому для архивов,
+    созданных tar -j N, пропускается не больше одного блока, а не весь архив до элемента.
+
+    Возвращает контекстный менеджер, дающий кортеж (TarFile в потоковом режиме, TarInfo элемента).
+    """
+    start_compressed, start_uncompressed = 0, 0
+    for compressed, uncompressed in index["members"]:
+        if uncompressed > offset:
+            break
+        start_compressed, start_uncompressed = compressed, uncompressed
+    with open(archive, "rb") as raw:
+        raw.seek(start_compressed)
+        with gzip.GzipFile(fileobj=raw) as stream:
+            skip = offset - start_uncompressed
+            while skip > 0:
+                chunk = stream.read(min(skip, READ_CHUNK_SIZE))
+                if not chunk:
+                    raise EOFError(f"{archive}: index is out of date")
+                skip -= len(chunk)
+            with tarfile.open(fileobj=stream, mode="r|") as tf:
+                yield tf, tf.next()
@@ -1,9 +1,17 @@
+import fnmatch
+import math
+import os
 import pathlib
-import shutil
+import sys
 import uuid
 
 from errors.shell_errors import ShellError
-from src.constants import TRASH_PATH
+from src.constants import TRASH_DIR_NAME, TRASH_DIRS, TRASH_PATH
+from src.utils.copying import move_path
+from src.utils.trash import record_trashed
+
+# Сколько строк вывода собирается перед одной записью в stdout
+OUTPUT_BATCH_LINES = 1024
 
 
 def normalize(path: str) -> pathlib.Path:
@@ -30,15 +38,199 @@ def ensure_exists(path: pathlib.Path, cmd: str):
         raise ShellError(f"{cmd}: no such file or directory: {path}")
     return path
 
-def move_to_trash(src: pathlib.Path) -> pathlib.Path:
+def parse_jobs(args: list, cmd: str):
+    """
+    Извлекает из аргументов число параллельных потоков: '-j N' или '-jN'.
+
+    args: список аргументов команды
+    cmd: имя команды для сообщения об ошибке
+
+    Вызывает ShellError, если число потоков не указано или не является положительным числом.
+    Возвращает кортеж (число_потоков, аргументы без флага); без флага число потоков равно 1.
+    """
+    jobs = 1
+    rest = []
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg == '-j' or (arg.startswith('-j') and arg[2:].isdecimal()):
+            value = arg[2:]
+            if not value:
+                if i + 1 >= len(args):
+                    raise ShellError(f"{cmd}: option '-j' requires an argument")
+                i += 1
+                value = args[i]
+            if not value.isdecimal() or int(value) < 1:
+                raise ShellError(f"{cmd}: invalid number of jobs: '{value}'")
+            jobs = int(value)
+        else:
+            rest.append(arg)
+        i += 1
+    return jobs, rest
+
+def find_mount_point(path: pathlib.Path) -> pathlib.Path:
+    """
+    Возвращает корень файловой системы, на которой находится path.
+
+    Поднимается по родительским директориям, пока не сменится st_dev.
+    """
+    path = pathlib.Path(os.path.abspath(path))
+    dev = os.lstat(path).st_dev
+    while path.parent != path and os.lstat(path.parent).st_dev == dev:
+        path = path.parent
+    return path
+
+def trash_dir_for(src: pathlib.Path) -> pathlib.Path:
+    """
+    Возвращает корзину на той же файловой системе, что и src, чтобы удаление было переименованием.
+
+    Порядок выбора:
+        - корзина из TRASH_DIRS, если её точка монтирования совпадает с файловой системой src;
+        - основная корзина TRASH_PATH, если она на той же файловой системе;
+        - директория TRASH_DIR_NAME в корне файловой системы src.
+    Если корзину в корне создать нельзя (нет прав), возвращает TRASH_PATH.
+    """
+    dev = os.lstat(src).st_dev
+    for mount, mount_trash in TRASH_DIRS.items():
+        try:
+            if os.stat(mount).st_dev == dev:
+                return pathlib.Path(mount_trash)
+        except OSError:
+            continue
+    default: pathlib.Path = pathlib.Path(TRASH_PATH)
+    try:
+        if os.stat(default).st_dev == dev:
+            return default
+    except OSError:
+        pass
+    trash: pathlib.Path = find_mount_point(src) / TRASH_DIR_NAME
+    try:
+        trash.mkdir(exist_ok=True)
+    except OSError:
+        return default
+    if not os.access(trash, os.W_OK | os.X_OK):
+        return default
+    return trash
+
+def move_to_trash(src: pathlib.Path, number: int | None = None) -> pathlib.Path:
     """
     Перемещает файл или директорию в корзину.
 
     src: путь к файлу или директории для перемещения в корзину
+    number: номер команды rm в истории, сохраняется в индексе корзины
+
+    Корзина выбирается на той же файловой системе (trash_dir_for), поэтому перемещение —
+    это одно переименование независимо от размера. Если такой корзины нет,
+    данные копируются в TRASH_PATH.
 
     Возвращает путь к файлу в корзине.
     """
     trash_name = f"{src.name}__{uuid.uuid4()}"
-    trash_target = pathlib.Path(TRASH_PATH) / trash_name
-    shutil.move(src, trash_target)
+    trash_target = trash_dir_for(src) / trash_name
+    move_path(src, trash_target, cmd="rm")
+    record_trashed(trash_target, src, number)
     return trash_target
+
+def read_lines_reversed(path, block_size: int = 8 * 1024):
+    """
+    Лениво читает строки файла с конца, блоками по block_size байт.
+
+    path: путь к файлу
+    block_size: размер блока, который читается за один раз
+
+    Возвращает генератор строк (bytes без перевода строки) в обратном порядке.
+    Прочитано будет ровно столько блоков, сколько понадобилось потребителю.
+    """
+    with open(path, "rb") as f:
+        position = f.seek(0, os.SEEK_END)
+        if position == 0:
+            return
+        tail = b""
+        last_line = True
+        while position > 0:
+            step = min(block_size, position)
+            position -= step
+            f.seek(position)
+            lines = (f.read(step) + tail).split(b"\n")
+            tail = lines[0]
+            for line in reversed(lines[1:]):
+                if last_line and not line:
+                    last_line = False
+                    continue
+                last_line = False
+                yield line
+        yield tail
+
+def write_lines(lines, batch_size: int = OUTPUT_BATCH_LINES):
+    """
+    Печатает строки в stdout пачками по batch_size одним вызовом write, а не print на каждую строку.
+    """
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= batch_size:
+            sys.stdout.write("\n".join(batch) + "\n")
+            batch.clear()
+    if batch:
+        sys.stdout.write("\n".join(batch) + "\n")
+    sys.stdout.flush()
+
+def human_size(size: int) -> str:
+    """
+    Возвращает размер в байтах в читаемом виде, как du -h: 512, 1.5K, 12M, 3.0G.
+
+    Значения меньше 10 выводятся с одним знаком после запятой, остальные округляются вверх до целого.
+    """
+    if size < 1024:
+        return str(size)
+    value = float(size)
+    for unit in "KMGTPE":
+        value /= 1024
+        if value < 1024 or unit == "E":
+            break
+    rounded = math.ceil(value * 10) / 10
+    if rounded < 10:
+        return f"{rounded:.1f}{unit}"
+    return f"{math.ceil(value)}{unit}"
+
+def member_path(dest: pathlib.Path, name: str, cmd: str) -> pathlib.Path:
+    """
+    Возвращает путь, по которому элемент архива name распаковывается в dest.
+
+    Как и в ZipFile.extract, из имени убираются диск, ведущий '/', компоненты '.', '..' и пустые,
+    поэтому элемент не может оказаться за пределами dest.
+    Вызывает ShellError, если путь всё же выходит за пределы dest (например, через символическую ссылку).
+    """
+    name = name.replace("/", os.sep)
+    if os.altsep:
+        name = name.replace(os.altsep, os.sep)
+    name = os.path.splitdrive(name)[1]
+    parts = [part for part in name.split(os.sep) if part not in ("", ".", "..")]
+    target = dest.joinpath(*parts)
+    if not target.resolve().is_relative_to(dest.resolve()):
+        raise ShellError(f"{cmd}: unsafe member path: '{name}'")
+    return target
+
+def member_matches(name: str, patterns) -> bool:
+    """
+    Проверяет, что элемент архива name подходит под один из шаблонов patterns
+    (шаблон fnmatch или путь директории, тогда подходят все элементы внутри неё).
+    """
+    for pattern in patterns:
+        if fnmatch.fnmatch(name, pattern) or name.startswith(pattern.rstrip("/") + "/"):
+            return True
+    return False
+
+def split_archives(args: list) -> tuple[list, list]:
+    """
+    Делит позиционные аргументы unzip/untar на архивы и шаблоны элементов.
+
+    С разделителем '--' архивы — все аргументы до него (цепочка из полного и инкрементальных
+    архивов), шаблоны — все после него; без разделителя архив — только первый аргумент.
+
+    Возвращает кортеж (архивы, шаблоны).
+    """
+    if "--" in args:
+        separator = args.index("--")
+        return args[:separator], args[separator + 1:]
+    return args[:1], args[1:]
@@ -0,0 +1,115 @@
+import os
+import re
+
+# Файлы с шаблонами игнорирования, которые читаются в каждой директории при обходе
+IGNORE_FILES = (".gitignore", ".ignore")
+
+
+def _translate(pattern: str) -> str:
+    """
+    Переводит шаблон в стиле .gitignore в регулярное выражение для пути относительно директории шаблона.
+
+    '*' и '?' не совпадают с '/', '**' совпадает с любым количеством директорий.
+    """
+    result = ""
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith("**/", i):
+            result += "(?:.*/)?"
+            i += 3
+            continue
+        if pattern.startswith("/**", i) and i + 3 == len(pattern):
+            result += "/.*"
+            break
+        if pattern.startswith("**", i):
+            result += ".*"
+            i += 2
+            continue
+        if char == "*":
+            result += "[^/]*"
+        elif char == "?":
+            result += "[^/]"
+        elif char == "[":
+            end = pattern.find("]", i + 2)
+            if end == -1:
+                result += re.escape(char)
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                result += "[" + body.replace("\\", "\\\\") + "]"
+                i = end
+        elif char == "\\" and i + 1 < len(pattern):
+            i += 1
+            result += re.escape(pattern[i])
+        else:
+            result += re.escape(char)
+        i += 1
+    return result
+
+def parse_ignore_file(path, base: str) -> list:
+    """
+    Читает файл шаблонов игнорирования в стиле .gitignore.
+
+    path: путь к файлу
+    base: директория, относительно которой действуют шаблоны
+
+    Поддерживаются комментарии '#', отрицание '!', шаблоны только для директорий ('/' в конце)
+    и привязка к base ('/' в начале или в середине шаблона).
+
+    Возвращает список правил (base, регулярное выражение, отрицание, только_директории).
+    """
+    rules: list[tuple[str, re.Pattern[str], bool, bool]] = []
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return rules
+    for line in lines:
+        line = line.rstrip()
+        if not line or line.startswith("#"):
+            continue
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        anchored = "/" in line
+        line = line.lstrip("/")
+        if not line:
+            continue
+        regex = _translate(line)
+        if not anchored:
+            regex = "(?:.*/)?" + regex
+        rules.append((base, re.compile(regex + r"\Z"), negate, dir_only))
+    return rules
+
+def load_ignore_rules(directory: str, inherited: list) -> list:
+    """
+    Возвращает правила для директории directory: правила родительских директорий inherited
+    и правила из файлов IGNORE_FILES самой директории.
+    """
+    rules = list(inherited)
+    for name in IGNORE_FILES:
+        ignore_file = os.path.join(directory, name)
+        if os.path.isfile(ignore_file):
+            rules.extend(parse_ignore_file(ignore_file, directory))
+    return rules
+
+def is_ignored(path: str, is_dir: bool, rules: list) -> bool:
+    """
+    Проверяет, игнорируется ли путь path по правилам rules.
+
+    Как и в git, применяется последнее подходящее правило: правило с '!' возвращает путь обратно.
+    """
+    ignored = False
+    for base, regex, negate, dir_only in rules:
+        if dir_only and not is_dir:
+            continue
+        if not path.startswith(base + os.sep):
+            continue
+        rel = path[len(base) + 1:].replace(os.sep, "/")
+        if regex.match(rel):
+            ignored = not negate
+    return ignored
@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+import pathlib
+from concurrent.futures import ThreadPoolExecutor
+
+from errors.shell_errors import ShellError
+from src.utils.helpers import member_path
+
+# Элемент инкрементального архива со списком удалённых с прошлого архива файлов
+DELETED_MEMBER = ".incremental-deleted.json"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_hash(path) -> str:
+    """
+    Возвращает SHA-256 содержимого файла; выполняется в потоках пула (hashlib отпускает GIL).
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def load_manifest(path: pathlib.Path) -> dict | None:
+    """
+    Читает манифест снимка: словарь относительный путь -> [размер, mtime_ns, sha256].
+    Возвращает None, если манифеста ещё нет (первый, полный архив).
+    """
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["files"]
+
+def save_manifest(path: pathlib.Path, src: pathlib.Path, files: dict):
+    """
+    Атомарно записывает манифест снимка директории src: сначала во временный файл, затем переименованием.
+    """
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"root": str(src), "files": files}, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+def scan_changes(src: pathlib.Path, previous: dict | None, jobs: int = 1):
+    """
+    Сравнивает директорию src с предыдущим снимком previous.
+
+    Хеш считается только для новых файлов и файлов, у которых изменились размер или mtime;
+    если хеш совпал с прежним (файл только «тронули»), файл не считается изменённым.
+
+    Возвращает кортеж (новый снимок, изменённые и новые пути, удалённые пути); пути относительно src, через '/'.
+    """
+    previous = previous or {}
+    current = {}
+    to_hash = []
+    for root, dirs, names in os.walk(src):
+        dirs.sort()
+        for name in sorted(names):
+            full_p = pathlib.Path(root) / name
+            rel = full_p.relative_to(src).as_posix()
+            st = full_p.stat()
+            old = previous.get(rel)
+            if old is not None and old[0] == st.st_size and old[1] == st.st_mtime_ns:
+                current[rel] = old
+            else:
+                current[rel] = [st.st_size, st.st_mtime_ns, None]
+                to_hash.append(rel)
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        hashes = pool.map(file_hash, (src / rel for rel in to_hash))
+        changed = []
+        for rel, digest in zip(to_hash, hashes):
+            current[rel][2] = digest
+            old = previous.get(rel)
+            if old is None or old[2] != digest:
+                changed.append(rel)
+    deleted = sorted(set(previous) - set(current))
+    return current, changed, deleted
+
+def apply_deletions(dest: pathlib.Path, names: list, cmd: str) -> int:
+    """
+    Удаляет из dest файлы, перечисленные в списке удалённых инкрементального архива.
+    Пути проверяются так же, как пути элементов архива, и не выходят за пределы dest.
+
+    Возвращает количество удалённых файлов.
+    """
+    removed = 0
+    for name in names:
+        target = member_path(dest, name, cmd)
+        if target.is_file() or target.is_symlink():
+            target.unlink()
+            removed += 1
+    return removed
+
+def parse_incremental(args: list, cmd: str):
+    """
+    Извлекает из аргументов опцию '--incremental MANIFEST'.
+
+    Вызывает ShellError, если после опции нет пути.
+    Возвращает кортеж (путь к манифесту или None, аргументы без опции).
+    """
+    manifest = None
+    rest = []
+    arg_iter = iter(args)
+    for arg in arg_iter:
+        if arg != "--incremental":
+            rest.append(arg)
+            continue
+        manifest = next(arg_iter, None)
+        if manifest is None:
+            raise ShellError(f"{cmd}: option '--incremental' requires a manifest path")
+    return manifest, rest
+
+def plan_incremental(src: pathlib.Path, manifest_path: pathlib.Path, jobs: int = 1):
+    """
+    Готовит инкрементальный архив директории src по манифесту manifest_path.
+
+    Возвращает кортеж (новый снимок, изменённые пути или None, если манифеста нет и нужен полный архив,
+    удалённые пути).
+    """
+    previous = load_manifest(manifest_path)
+    snapshot, changed, deleted = scan_changes(src, previous, jobs)
+    return snapshot, (changed if previous is not None else None), deleted
@@ -0,0 +1,212 @@
+import json
+import logging
+import os
+import pathlib
+import shutil
+import threading
+import time
+
+from src.constants import TRASH_DIRS, TRASH_GC_INTERVAL, TRASH_MAX_AGE, TRASH_MAX_BYTES, TRASH_PATH
+
+# Индекс корзины: по строке JSON на каждый удалённый объект
+INDEX_NAME = ".index.jsonl"
+# Список корзин на других файловых системах (хранится в основной корзине)
+ROOTS_NAME = ".roots"
+# Префикс объектов, которые уже удаляются сборщиком
+PURGING_PREFIX = ".purging-"
+
+_lock = threading.Lock()
+
+
+def _path_size(path: pathlib.Path) -> int:
+    """
+    Возвращает размер файла или суммарный размер файлов директории (без перехода по ссылкам).
+    """
+    st = os.lstat(path)
+    if not os.path.isdir(path) or os.path.islink(path):
+        return st.st_size
+    total = 0
+    for root, dirs, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                continue
+    return total
+
+def _read_index(root: pathlib.Path) -> list:
+    """
+    Читает индекс корзины root.
+
+    Если индекса ещё нет (корзина заполнена до его появления), строит записи
+    по содержимому корзины; размер таких объектов вычисляется при сборке мусора.
+    """
+    index = root / INDEX_NAME
+    entries = []
+    if index.exists():
+        with open(index) as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue
+        return entries
+    try:
+        with os.scandir(root) as it:
+            for entry in it:
+                if not entry.name.startswith("."):
+                    entries.append({"name": entry.name, "src": None, "size": None, "number": None,
+                                    "time": entry.stat(follow_symlinks=False).st_mtime})
+    except OSError:
+        pass
+    return entries
+
+def _write_index(root: pathlib.Path, entries: list):
+    """
+    Атомарно переписывает индекс корзины root.
+    """
+    index = root / INDEX_NAME
+    tmp = root / (INDEX_NAME + ".tmp")
+    with open(tmp, "w") as f:
+        f.writelines(json.dumps(entry) + "\n" for entry in entries)
+    os.replace(tmp, index)
+
+def record_trashed(trash_path: pathlib.Path, src: pathlib.Path, number: int | None = None):
+    """
+    Добавляет объект, перемещённый в корзину, в индекс его корзины.
+
+    trash_path: путь объекта в корзине
+    src: исходный путь объекта
+    number: номер команды rm в истории
+
+    Размер файла берётся из lstat; размер директории вычисляется позже, при сборке мусора,
+    чтобы rm не обходил удаляемое дерево.
+    """
+    root = trash_path.parent
+    is_dir = trash_path.is_dir() and not trash_path.is_symlink()
+    entry = {"name": trash_path.name, "src": str(src), "size": None if is_dir else os.lstat(trash_path).st_size,
+             "number": number, "time": time.time()}
+    with _lock:
+        if not (root / INDEX_NAME).exists():
+            _write_index(root, [e for e in _read_index(root) if e["name"] != trash_path.name])
+        with open(root / INDEX_NAME, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+        if root != pathlib.Path(TRASH_PATH):
+            roots = pathlib.Path(TRASH_PATH) / ROOTS_NAME
+            known = roots.read_text().splitlines() if roots.exists() else []
+            if str(root) not in known:
+                with open(roots, "a") as f:
+                    f.write(str(root) + "\n")
+
+def trash_roots() -> list:
+    """
+    Возвращает все известные корзины: основную, из TRASH_DIRS и созданные в корнях файловых систем.
+    """
+    roots = [pathlib.Path(TRASH_PATH)] + [pathlib.Path(p) for p in TRASH_DIRS.values()]
+    registry = pathlib.Path(TRASH_PATH) / ROOTS_NAME
+    if registry.exists():
+        roots += [pathlib.Path(line) for line in registry.read_text().splitlines() if line]
+    unique = []
+    for root in roots:
+        if root not in unique and root.is_dir():
+            unique.append(root)
+    return unique
+
+def list_trash() -> list:
+    """
+    Возвращает записи индекса всех корзин для объектов, которые ещё в корзине, от старых к новым.
+
+    Каждая запись дополнена полем "path" — путём объекта в корзине.
+    """
+    items = []
+    for root in trash_roots():
+        with _lock:
+            entries = _read_index(root)
+        for entry in entries:
+            path = root / entry["name"]
+            if os.path.lexists(path):
+                items.append({**entry, "path": str(path)})
+    return sorted(items, key=lambda e: e["time"])
+
+def _remove(path: pathlib.Path):
+    """
+    Удаляет файл или директорию, не останавливаясь на ошибках.
+    """
+    if path.is_dir() and not path.is_symlink():
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+def collect_garbage(max_bytes: int | None = TRASH_MAX_BYTES, max_age: float | None = TRASH_MAX_AGE,
+                    now: float | None = None):
+    """
+    Очищает корзины по ограничениям на объём и возраст, начиная с самых старых объектов.
+
+    max_bytes: максимальный объём одной корзины в байтах (None — без ограничения)
+    max_age: максимальный возраст объекта в секундах (None — без ограничения)
+    now: текущее время (для тестов), по умолчанию time.time()
+
+    Решение принимается по индексу, без обхода корзины. Удаляемый объект сначала
+    переименовывается (PURGING_PREFIX), поэтому undo видит либо целый объект, либо сообщение,
+    что он удалён окончательно, и никогда — наполовину удалённую директорию.
+
+    Возвращает кортеж (количество удалённых объектов, освобождено байт).
+    """
+    now = time.time() if now is None else now
+    purged, freed = 0, 0
+    for root in trash_roots():
+        doomed = []
+        with _lock:
+            entries = []
+            for entry in sorted(_read_index(root), key=lambda e: e["time"]):
+                path = root / entry["name"]
+                if not os.path.lexists(path):
+                    continue
+                if entry["size"] is None:
+                    entry["size"] = _path_size(path)
+                entries.append(entry)
+            total = sum(entry["size"] for entry in entries)
+            keep = []
+            for entry in entries:
+                expired = max_age is not None and now - entry["time"] > max_age
+                over_quota = max_bytes is not None and total > max_bytes
+                if expired or over_quota:
+                    purging = root / (PURGING_PREFIX + entry["name"])
+                    try:
+                        os.rename(root / entry["name"], purging)
+                    except FileNotFoundError:
+                        continue
+                    except OSError:
+                        keep.append(entry)
+                        continue
+                    doomed.append(purging)
+                    total -= entry["size"]
+                    purged += 1
+                    freed += entry["size"]
+                else:
+                    keep.append(entry)
+            _write_index(root, keep)
+            doomed += [root / name for name in os.listdir(root)
+                       if name.startswith(PURGING_PREFIX) and root / name not in doomed]
+        for path in doomed:
+            _remove(path)
+    return purged, freed
+
+def start_trash_collector(interval: float = TRASH_GC_INTERVAL) -> threading.Thread:
+    """
+    Запускает фоновый поток, который раз в interval секунд вызывает collect_garbage.
+    """
+    def loop():
+        while True:
+            try:
+                collect_garbage()
+            except Exception as e:
+                logging.error(f"ERROR: trash gc: {e}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=loop, name="trash-gc", daemon=True)
+    thread.start()
+    return thread
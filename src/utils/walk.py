@@ -0,0 +1,74 @@
+import os
+import stat
+from concurrent.futures import ThreadPoolExecutor
+
+# Сколько директорий на поток читается заранее, пока обход выдаёт предыдущие
+WALK_WINDOW_PER_JOB = 4
+
+
+def scan_directory(path: str) -> list:
+    """
+    Читает директорию через os.scandir и возвращает отсортированный по имени список кортежей (имя, lstat).
+
+    Объекты, которые исчезли во время чтения, пропускаются.
+    """
+    entries = []
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                entries.append((entry.name, entry.stat(follow_symlinks=False)))
+            except FileNotFoundError:
+                continue
+    entries.sort(key=lambda item: item[0])
+    return entries
+
+def walk_parallel(root, jobs: int = 1, max_depth: int | None = None, descend=None):
+    """
+    Обходит дерево root и возвращает директории в порядке обхода в глубину (родитель раньше детей,
+    поддиректории по имени), читая директории заранее в пуле из jobs потоков.
+
+    root: корневая директория
+    jobs: количество потоков чтения
+    max_depth: максимальная глубина спуска (0 — только root); None — без ограничения
+    descend: функция (имя) -> bool, решающая, спускаться ли в поддиректорию; по умолчанию во все
+
+    Заранее читается не больше WALK_WINDOW_PER_JOB директорий на поток — ближайшие по порядку обхода,
+    поэтому в памяти одновременно хранятся списки только этих директорий.
+    Символические ссылки на директории не обходятся.
+
+    Возвращает генератор кортежей (путь, глубина, список (имя, lstat) или None, ошибка или None).
+    """
+    limit = jobs * WALK_WINDOW_PER_JOB
+
+    def scan(path: str, depth: int):
+        entries = scan_directory(path)
+        subdirs = []
+        if max_depth is None or depth < max_depth:
+            for name, st in entries:
+                if stat.S_ISDIR(st.st_mode) and (descend is None or descend(name)):
+                    subdirs.append(os.path.join(path, name))
+        return entries, subdirs
+
+    pool = ThreadPoolExecutor(max_workers=jobs)
+    try:
+        # Стек обхода: [путь, глубина, future или None, если директория ещё не отправлена на чтение]
+        stack: list[list] = [[os.fspath(root), 0, None]]
+        outstanding = 0
+        while stack:
+            for node in reversed(stack):
+                if outstanding >= limit:
+                    break
+                if node[2] is None:
+                    node[2] = pool.submit(scan, node[0], node[1])
+                    outstanding += 1
+            path, depth, future = stack.pop()
+            outstanding -= 1
+            try:
+                entries, subdirs = future.result()
+            except OSError as e:
+                yield path, depth, None, e
+                continue
+            yield path, depth, entries, None
+            stack.extend([child, depth + 1, None] for child in reversed(subdirs))
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
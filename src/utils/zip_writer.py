@@ -0,0 +1,166 @@
+import struct
+import zipfile
+import zlib
+
+# Поля заголовков zip (APPNOTE.TXT); при переполнении значения хранятся в расширении zip64
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP_MAX_ENTRIES = 0xFFFF
+LOCAL_HEADER = struct.Struct("<4sHHHHHLLLHH")
+CENTRAL_HEADER = struct.Struct("<4sBBHHHHHLLLHHHHHLL")
+END_RECORD = struct.Struct("<4sHHHHLLH")
+END_RECORD64 = struct.Struct("<4sQBBHLLQQQQ")
+END_LOCATOR64 = struct.Struct("<4sLQL")
+ZIP64_EXTRA_ID = 0x0001
+UTF8_FLAG = 0x800
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+
+def _encode_name(name: str):
+    """
+    Возвращает кортеж (имя элемента в байтах, флаги): не-ASCII имена пишутся в UTF-8 с флагом UTF8_FLAG.
+    """
+    try:
+        return name.encode("ascii"), 0
+    except UnicodeEncodeError:
+        return name.encode("utf-8"), UTF8_FLAG
+
+def _dos_time(date_time) -> tuple:
+    """
+    Возвращает кортеж (время, дата) в формате MS-DOS; даты раньше 1980 года заменяются на 1980-01-01.
+    """
+    year, month, day, hour, minute, second = date_time[:6]
+    if year < 1980:
+        year, month, day, hour, minute, second = 1980, 1, 1, 0, 0, 0
+    return hour << 11 | minute << 5 | second // 2, (year - 1980) << 9 | month << 5 | day
+
+def _zip64_extra(*values: int) -> bytes:
+    """
+    Возвращает расширение zip64 с 8-байтовыми значениями values.
+    """
+    return struct.pack(f"<HH{len(values)}Q", ZIP64_EXTRA_ID, 8 * len(values), *values)
+
+
+class ZipWriter:
+    """
+    Потоковая запись zip-архива с элементами, сжатыми заранее (например, в пуле потоков).
+
+    Элементы описываются zipfile.ZipInfo: имя, время, права и система берутся из него,
+    а способ сжатия, CRC, размеры и смещение заголовка записываются в него при добавлении.
+    Архив читается стандартным zipfile; большие архивы и элементы записываются в формате zip64.
+    """
+
+    def __init__(self, path) -> None:
+        self.f = open(path, "wb")
+        self.infos: list[zipfile.ZipInfo] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self._write_central_directory()
+        finally:
+            self.f.close()
+
+    def _local_header(self, zinfo: zipfile.ZipInfo, zip64: bool) -> bytes:
+        """
+        Возвращает локальный заголовок элемента; при zip64 размеры хранятся в расширении zip64.
+        """
+        name, flags = _encode_name(zinfo.filename)
+        dos_time, dos_date = _dos_time(zinfo.date_time)
+        extra = b""
+        file_size, compress_size = zinfo.file_size, zinfo.compress_size
+        if zip64:
+            extra = _zip64_extra(file_size, compress_size)
+            file_size = compress_size = ZIP64_LIMIT
+        return LOCAL_HEADER.pack(b"PK\x03\x04", 45 if zip64 else 20, flags, zinfo.compress_type, dos_time,
+                                 dos_date, zinfo.CRC, compress_size, file_size, len(name), len(extra)) + name + extra
+
+    def write_compressed(self, zinfo: zipfile.ZipInfo, method: int, crc: int, size: int, data: bytes):
+        """
+        Добавляет элемент с уже сжатыми данными data (способ сжатия method, CRC и размер исходных данных).
+        """
+        zinfo.compress_type = method
+        zinfo.CRC = crc
+        zinfo.file_size = size
+        zinfo.compress_size = len(data)
+        zinfo.header_offset = self.f.tell()
+        self.f.write(self._local_header(zinfo, max(size, len(data)) >= ZIP64_LIMIT))
+        self.f.write(data)
+        self.infos.append(zinfo)
+
+    def writestr(self, zinfo: zipfile.ZipInfo, data: bytes, level: int):
+        """
+        Добавляет элемент с данными data, сжимая их с уровнем level (0 — без сжатия).
+        """
+        if level == 0:
+            self.write_compressed(zinfo, zipfile.ZIP_STORED, zlib.crc32(data), len(data), data)
+            return
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        self.write_compressed(zinfo, zipfile.ZIP_DEFLATED, zlib.crc32(data), len(data),
+                              compressor.compress(data) + compressor.flush())
+
+    def write_file(self, zinfo: zipfile.ZipInfo, path, level: int, digest=None):
+        """
+        Добавляет файл path, сжимая его потоково кусками по STREAM_CHUNK_SIZE (level 0 — без сжатия).
+
+        digest: объект hashlib, который обновляется прочитанными данными файла
+
+        Заголовок пишется до данных и исправляется после них, когда известны CRC и размеры.
+        """
+        zinfo.compress_type = zipfile.ZIP_STORED if level == 0 else zipfile.ZIP_DEFLATED
+        zinfo.CRC = zinfo.compress_size = 0
+        zinfo.header_offset = self.f.tell()
+        zip64 = zinfo.file_size * 1.05 > ZIP64_LIMIT
+        self.f.write(self._local_header(zinfo, zip64))
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15) if level else None
+        crc = size = compress_size = 0
+        with open(path, "rb") as src:
+            while chunk := src.read(STREAM_CHUNK_SIZE):
+                crc = zlib.crc32(chunk, crc)
+                if digest is not None:
+                    digest.update(chunk)
+                size += len(chunk)
+                if compressor is not None:
+                    chunk = compressor.compress(chunk)
+                compress_size += len(chunk)
+                self.f.write(chunk)
+        if compressor is not None:
+            tail = compressor.flush()
+            compress_size += len(tail)
+            self.f.write(tail)
+        if not zip64 and max(size, compress_size) >= ZIP64_LIMIT:
+            raise zipfile.LargeZipFile(f"{zinfo.filename}: file grew while being archived")
+        zinfo.CRC, zinfo.file_size, zinfo.compress_size = crc, size, compress_size
+        end = self.f.tell()
+        self.f.seek(zinfo.header_offset)
+        self.f.write(self._local_header(zinfo, zip64))
+        self.f.seek(end)
+        self.infos.append(zinfo)
+
+    def _write_central_directory(self):
+        """
+        Записывает центральный каталог и конец архива (с записями zip64, если они нужны).
+        """
+        start = self.f.tell()
+        for zinfo in self.infos:
+            name, flags = _encode_name(zinfo.filename)
+            dos_time, dos_date = _dos_time(zinfo.date_time)
+            fields = [zinfo.file_size, zinfo.compress_size, zinfo.header_offset]
+            overflow = [value for value in fields if value >= ZIP64_LIMIT]
+            extra = _zip64_extra(*overflow) if overflow else b""
+            file_size, compress_size, offset = (min(value, ZIP64_LIMIT) for value in fields)
+            version = 45 if overflow else 20
+            self.f.write(CENTRAL_HEADER.pack(b"PK\x01\x02", version, zinfo.create_system, version, flags,
+                                             zinfo.compress_type, dos_time, dos_date, zinfo.CRC, compress_size,
+                                             file_size, len(name), len(extra), 0, 0, 0, zinfo.external_attr,
+                                             offset) + name + extra)
+        end = self.f.tell()
+        count, size = len(self.infos), end - start
+        if count >= ZIP_MAX_ENTRIES or size >= ZIP64_LIMIT or start >= ZIP64_LIMIT:
+            self.f.write(END_RECORD64.pack(b"PK\x06\x06", END_RECORD64.size - 12, 45, 3, 45, 0, 0,
+                                           count, count, size, start))
+            self.f.write(END_LOCATOR64.pack(b"PK\x06\x07", 0, end, 1))
+        self.f.write(END_RECORD.pack(b"PK\x05\x06", 0, 0, min(count, ZIP_MAX_ENTRIES), min(count, ZIP_MAX_ENTRIES),
+                                     min(size, ZIP64_LIMIT), min(start, ZIP64_LIMIT), 0))
@@ -24,6 +24,7 @@ def mock_create_history_record():
         patch("src.commands.grep.create_history_record"),
         patch("src.commands.info.create_history_record"),
         patch("src.commands.tar_archives.create_history_record"),
+        patch("src.commands.trash.create_history_record"),
         patch("src.commands.undo.create_history_record"),
         patch("src.commands.viewer.create_history_record"),
         patch("src.commands.zip_archives.create_history_record"),
@@ -31,7 +32,7 @@ def mock_create_history_record():
     mocks = [p.start() for p in patches]
     for mock in mocks:
         mock.return_value = "fake history"
-    yield mocks[4]
+    yield mocks[5]
     for p in patches:
         p.stop()
 
@@ -48,15 +49,20 @@ def mock_history_path(monkeypatch):
     monkeypatch.setattr(viewer, "get_last_history", history.get_last_history)
     monkeypatch.setattr(viewer, "get_last_history_number", history.get_last_history_number)
     monkeypatch.setattr(undo, "get_last_history_undo_cmd", history.get_last_history_undo_cmd)
-    monkeypatch.setattr(undo, "remove_history_records", history.remove_history_records)
     monkeypatch.setattr(undo, "create_history_record", history.create_history_record)
     yield
 
     os.remove(fake_path)
+    for sidecar in pathlib.Path(fake_path).parent.glob(pathlib.Path(fake_path).name + ".*"):
+        sidecar.unlink()
 @pytest.fixture
 def mock_trash(monkeypatch):
     import src.commands.filesystem as fs
     import src.utils.helpers as helpers
+    import src.utils.trash as trash
     tmp_trash = tempfile.mkdtemp()
     monkeypatch.setattr(helpers, "TRASH_PATH", tmp_trash)
+    monkeypatch.setattr(trash, "TRASH_PATH", tmp_trash)
     monkeypatch.setattr(fs, "move_to_trash", helpers.move_to_trash)
+    yield tmp_trash
+    shutil.rmtree(tmp_trash, ignore_errors=True)
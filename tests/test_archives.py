@@ -2,6 +2,8 @@ import pathlib
 from src.commands import cmd_zip, cmd_unzip, cmd_tar, cmd_untar
 from src.utils import normalize
 import os
+import pytest
+from errors.shell_errors import ShellError
 def create_test_structure(base):
     base_p = normalize(base)
     base_p.mkdir()
@@ -49,3 +51,310 @@ def test_tar_and_untar(temp_dir, mock_create_history_record):
     assert extracted_base.exists()
     compare_dirs_content(base, extracted_base)
     os.chdir(project_cwd)
+
+def test_zip_parallel_levels_and_stored_files(temp_dir, mock_create_history_record, monkeypatch):
+    import zipfile
+    import src.commands.zip_archives as zip_archives
+    temp_path = normalize(temp_dir)
+    src = temp_path / "src"
+    (src / "sub").mkdir(parents=True)
+    (src / "text.txt").write_text("compressible line\n" * 5000)
+    (src / "photo.png").write_text("not really a png " * 500)
+    (src / "sub" / "random.bin").write_bytes(os.urandom(100_000))
+    (src / "sub" / "big.log").write_text("big file line\n" * 20_000)
+    (src / "empty.txt").write_text("")
+    monkeypatch.setattr(zip_archives, "ZIP_PARALLEL_MAX_FILE_SIZE", 200_000)
+    cmd_zip(["-j", "3", str(src), str(temp_path / "parallel.zip")])
+    cmd_zip([str(src), str(temp_path / "serial.zip")])
+    cmd_zip(["-0", "-j", "2", str(src), str(temp_path / "stored.zip")])
+
+    with zipfile.ZipFile(temp_path / "parallel.zip") as zf:
+        assert zf.testzip() is None
+        methods = {info.filename: info.compress_type for info in zf.infolist()}
+        assert methods == {"empty.txt": zipfile.ZIP_DEFLATED, "photo.png": zipfile.ZIP_STORED,
+                           "text.txt": zipfile.ZIP_DEFLATED, "sub/big.log": zipfile.ZIP_DEFLATED,
+                           "sub/random.bin": zipfile.ZIP_STORED}
+        contents = {name: zf.read(name) for name in methods}
+    assert contents["sub/random.bin"] == (src / "sub" / "random.bin").read_bytes()
+    with zipfile.ZipFile(temp_path / "serial.zip") as zf:
+        assert {name: zf.read(name) for name in zf.namelist()} == contents
+    with zipfile.ZipFile(temp_path / "stored.zip") as zf:
+        assert zf.testzip() is None
+        assert {info.compress_type for info in zf.infolist()} == {zipfile.ZIP_STORED}
+
+def test_zip_window_bounded_by_bytes(temp_dir, mock_create_history_record, monkeypatch):
+    import stat
+    import zipfile
+    import src.commands.zip_archives as zip_archives
+    from src.utils.zip_writer import ZipWriter
+    temp_path = normalize(temp_dir)
+    src = temp_path / "src"
+    src.mkdir()
+    for i in range(20):
+        (src / f"файл{i:02}.txt").write_text(f"line {i}\n" * 500)
+    (src / "файл00.txt").chmod(0o640)
+    started, written, in_flight = [], [], []
+    compress_file, write_compressed = zip_archives.compress_file, ZipWriter.write_compressed
+
+    def tracked_compress(path, *args):
+        started.append(path)
+        return compress_file(path, *args)
+
+    def tracked_write(self, zinfo, *compressed):
+        in_flight.append(len(started) - len(written))
+        written.append(zinfo.filename)
+        write_compressed(self, zinfo, *compressed)
+
+    monkeypatch.setattr(zip_archives, "compress_file", tracked_compress)
+    monkeypatch.setattr(ZipWriter, "write_compressed", tracked_write)
+    monkeypatch.setattr(zip_archives, "ZIP_WINDOW_BYTES_PER_JOB", 10_000)
+    cmd_zip(["-j", "2", str(src), str(temp_path / "a.zip")])
+
+    assert len(written) == 20 and max(in_flight) <= 5
+    with zipfile.ZipFile(temp_path / "a.zip") as zf:
+        assert zf.testzip() is None
+        assert zf.namelist() == sorted(path.name for path in src.iterdir())
+        assert zf.read("файл07.txt") == (src / "файл07.txt").read_bytes()
+        assert stat.S_IMODE(zf.getinfo("файл00.txt").external_attr >> 16) == 0o640
+
+def test_tar_parallel_and_compression_by_extension(temp_dir, mock_create_history_record, monkeypatch):
+    import gzip
+    import subprocess
+    import tarfile
+    import src.commands.tar_archives as tar_archives
+    project_cwd = os.getcwd()
+    temp_path = normalize(temp_dir)
+    base = create_test_structure(temp_path / "src_tar")
+    (base / "big.txt").write_text("".join(f"line {i}\n" for i in range(20000)))
+    monkeypatch.setattr(tar_archives, "TAR_BLOCK_SIZE", 16 * 1024)
+    for name, mode in [("a.tar.gz", "r:gz"), ("a.tar.bz2", "r:bz2"), ("a.tar.xz", "r:xz"), ("a.tar", "r:")]:
+        archive = temp_path / name
+        cmd_tar(["-j", "3", str(base), str(archive)])
+        with tarfile.open(archive, mode) as tf:
+            assert tf.extractfile("src_tar/big.txt").read() == (base / "big.txt").read_bytes()
+        extract_dir = temp_path / f"extracted_{name}"
+        extract_dir.mkdir()
+        os.chdir(extract_dir)
+        cmd_untar([str(archive)])
+        compare_dirs_content(base, extract_dir / base.name)
+    os.chdir(project_cwd)
+    with open(temp_path / "a.tar.gz", "rb") as f:
+        assert f.read().count(b"\x1f\x8b\x08") > 1
+    assert gzip.decompress((temp_path / "a.tar.gz").read_bytes()) == (temp_path / "a.tar").read_bytes()
+    listing = subprocess.run(["tar", "-tzf", str(temp_path / "a.tar.gz")], capture_output=True, text=True)
+    if listing.returncode != 127:
+        assert "src_tar/big.txt" in listing.stdout.splitlines()
+
+def test_unzip_parallel_to_dir_with_filter_and_guards(temp_dir, mock_create_history_record):
+    import stat
+    import time
+    import zipfile
+    temp_path = normalize(temp_dir)
+    archive = temp_path / "a.zip"
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zf:
+        script = zipfile.ZipInfo("bin/run.sh", date_time=(2020, 5, 17, 10, 30, 0))
+        script.external_attr = (stat.S_IFREG | 0o750) << 16
+        script.create_system = 3
+        zf.writestr(script, "#!/bin/sh\n")
+        zf.writestr("docs/a.txt", "a" * 10000)
+        zf.writestr("docs/deep/b.txt", "b")
+        zf.writestr("../evil.txt", "evil")
+        zf.writestr("/abs.txt", "abs")
+        zf.writestr("empty/", "")
+    dest = temp_path / "out"
+    cmd_unzip(["-j", "3", "-d", str(dest), str(archive)])
+    run = dest / "bin" / "run.sh"
+    assert stat.S_IMODE(run.stat().st_mode) == 0o750
+    assert run.stat().st_mtime == time.mktime((2020, 5, 17, 10, 30, 0, 0, 0, -1))
+    assert (dest / "docs" / "a.txt").read_text() == "a" * 10000
+    assert (dest / "docs" / "deep" / "b.txt").read_text() == "b"
+    assert (dest / "evil.txt").read_text() == "evil" and not (temp_path / "evil.txt").exists()
+    assert (dest / "abs.txt").read_text() == "abs"
+    assert (dest / "empty").is_dir()
+
+    filtered = temp_path / "filtered"
+    cmd_unzip(["-d", str(filtered), str(archive), "docs", "*.sh"])
+    assert sorted(str(p.relative_to(filtered)) for p in filtered.rglob("*") if p.is_file()) == \
+        ["bin/run.sh", "docs/a.txt", "docs/deep/b.txt"]
+
+def test_incremental_chain(temp_dir, mock_create_history_record):
+    import time
+    import zipfile
+    project_cwd = os.getcwd()
+    temp_path = normalize(temp_dir)
+    base = create_test_structure(temp_path / "data")
+    manifest_tar = temp_path / "tar.manifest"
+    manifest_zip = temp_path / "zip.manifest"
+    cmd_tar(["--incremental", str(manifest_tar), str(base), str(temp_path / "full.tar.gz")])
+    cmd_zip(["--incremental", str(manifest_zip), str(base), str(temp_path / "full.zip")])
+
+    (base / "file1.txt").write_text("file1 changed")
+    (base / "file2.txt").unlink()
+    (base / "subdir" / "new.txt").write_text("new")
+    touched = base / "subdir" / "file3.txt"
+    os.utime(touched, (time.time() + 100, time.time() + 100))
+    cmd_tar(["--incremental", str(manifest_tar), str(base), str(temp_path / "inc1.tar.gz")])
+    cmd_zip(["-j", "2", "--incremental", str(manifest_zip), str(base), str(temp_path / "inc1.zip")])
+    with zipfile.ZipFile(temp_path / "inc1.zip") as zf:
+        assert sorted(zf.namelist()) == [".incremental-deleted.json", "file1.txt", "subdir/new.txt"]
+
+    (base / "subdir" / "new.txt").unlink()
+    cmd_tar(["--incremental", str(manifest_tar), str(base), str(temp_path / "inc2.tar.gz")])
+    cmd_zip(["--incremental", str(manifest_zip), str(base), str(temp_path / "inc2.zip")])
+
+    restored_tar = temp_path / "restored_tar"
+    restored_tar.mkdir()
+    os.chdir(restored_tar)
+    cmd_untar([*(str(temp_path / name) for name in ("full.tar.gz", "inc1.tar.gz", "inc2.tar.gz")), "--"])
+    restored_zip = temp_path / "restored_zip" / base.name
+    cmd_unzip(["-d", str(restored_zip), *(str(temp_path / name) for name in ("full.zip", "inc1.zip", "inc2.zip")), "--"])
+    os.chdir(project_cwd)
+    for restored in (restored_tar / base.name, restored_zip):
+        files = {p.relative_to(restored).as_posix(): p.read_text() for p in restored.rglob("*") if p.is_file()}
+        assert files == {"file1.txt": "file1 changed", "subdir/file3.txt": "file3"}
+
+def test_extract_member_twice(temp_dir, mock_create_history_record):
+    project_cwd = os.getcwd()
+    temp_path = normalize(temp_dir)
+    base = temp_path / "src"
+    (base / "docs").mkdir(parents=True)
+    (base / "docs" / "a.txt").write_text("a")
+    (base / "b.txt").write_text("b")
+    cmd_zip([str(base), str(temp_path / "a.zip")])
+    cmd_tar([str(base), str(temp_path / "a.tar.gz")])
+    out = temp_path / "out"
+    out.mkdir()
+    os.chdir(out)
+    try:
+        for _ in range(2):
+            cmd_unzip([str(temp_path / "a.zip"), "docs/a.txt"])
+            cmd_untar([str(temp_path / "a.tar.gz"), "src/docs/a.txt"])
+        assert sorted(p.relative_to(out).as_posix() for p in out.rglob("*") if p.is_file()) == \
+            ["docs/a.txt", "src/docs/a.txt"]
+        cmd_unzip([str(temp_path / "a.zip"), "--", "b.txt"])
+        cmd_untar([str(temp_path / "a.tar.gz"), "--", "src/b.txt"])
+        assert (out / "b.txt").read_text() == "b" and (out / "src" / "b.txt").read_text() == "b"
+    finally:
+        os.chdir(project_cwd)
+
+def test_list_and_extract_single_members(temp_dir, mock_create_history_record, monkeypatch, capsys):
+    import tarfile
+    import src.commands.tar_archives as tar_archives
+    import src.utils.gzip_index as gzip_index
+    project_cwd = os.getcwd()
+    temp_path = normalize(temp_dir)
+    base = create_test_structure(temp_path / "src_list")
+    (base / "big.txt").write_text("".join(f"line {i}\n" for i in range(20000)))
+    (base / "last.txt").write_text("last")
+    archive_zip = temp_path / "a.zip"
+    archive_tgz = temp_path / "a.tar.gz"
+    cmd_zip([str(base), str(archive_zip)])
+    monkeypatch.setattr(tar_archives, "TAR_BLOCK_SIZE", 16 * 1024)
+    cmd_tar(["-j", "2", str(base), str(archive_tgz)])
+    capsys.readouterr()
+
+    cmd_unzip(["-l", str(archive_zip), "*.txt"])
+    lines = capsys.readouterr().out.splitlines()
+    assert [line.split()[-1] for line in lines[:-1]] == \
+        ["big.txt", "file1.txt", "file2.txt", "last.txt", "subdir/file3.txt"]
+    assert lines[-1].split() == [str(sum(p.stat().st_size for p in base.rglob("*.txt"))), "5", "files"]
+
+    with tarfile.open(archive_tgz) as tf:
+        expected = [m.name + ("/" if m.isdir() else "") for m in tf]
+    cmd_untar(["-t", str(archive_tgz)])
+    assert capsys.readouterr().out.splitlines() == expected
+    cmd_untar(["-t", "--index", str(archive_tgz)])
+    assert capsys.readouterr().out.splitlines() == expected
+    assert gzip_index.index_path_for(archive_tgz).exists()
+    index = gzip_index.load_index(archive_tgz)
+    assert len(index["members"]) > 1
+
+    opened = []
+    real_open_member = gzip_index.open_member
+    monkeypatch.setattr(tar_archives, "open_member",
+                        lambda *a: opened.append(a[2]) or real_open_member(*a))
+    out_index = temp_path / "out_index"
+    out_index.mkdir()
+    os.chdir(out_index)
+    cmd_untar(["--index", str(archive_tgz), "src_list/last.txt", "src_list/subdir"])
+    assert (out_index / "src_list" / "last.txt").read_text() == "last"
+    assert (out_index / "src_list" / "subdir" / "file3.txt").read_text() == "file3"
+    assert not (out_index / "src_list" / "big.txt").exists()
+    assert len(opened) == 3
+
+    single_tgz = temp_path / "single.tar.gz"
+    cmd_tar([str(base), str(single_tgz)])
+    capsys.readouterr()
+    cmd_untar(["-t", "--index", str(single_tgz)])
+    assert capsys.readouterr().out.splitlines() == expected
+    assert gzip_index.load_index(single_tgz)["entries"] is None
+    (out_index / "src_list" / "last.txt").unlink()
+    cmd_untar(["--index", str(single_tgz), "src_list/last.txt"])
+    assert (out_index / "src_list" / "last.txt").read_text() == "last"
+    assert len(opened) == 3
+
+    read_members = []
+    real_next = tarfile.TarFile.next
+    monkeypatch.setattr(tarfile.TarFile, "next", lambda self: read_members.append(1) or real_next(self))
+    out_stream = temp_path / "out_stream"
+    out_stream.mkdir()
+    os.chdir(out_stream)
+    cmd_untar([str(archive_tgz), expected[1]])
+    os.chdir(project_cwd)
+    assert [p.name for p in out_stream.rglob("*") if p.is_file()] == [expected[1].split("/")[-1]]
+    assert len(read_members) < len(expected)
+
+def test_verify_with_checksums(temp_dir, mock_create_history_record, capsys):
+    project_cwd = os.getcwd()
+    temp_path = normalize(temp_dir)
+    base = create_test_structure(temp_path / "src_verify")
+    os.chdir(project_cwd)
+    (base / "big.txt").write_text("".join(f"line {i}\n" for i in range(20000)))
+    archive_zip = temp_path / "a.zip"
+    archive_tgz = temp_path / "a.tar.gz"
+    cmd_zip(["-j", "2", "--checksums", str(base), str(archive_zip)])
+    cmd_tar(["--checksums", str(base), str(archive_tgz)])
+    assert (temp_path / "a.zip.sha256").exists() and (temp_path / "a.tar.gz.sha256").exists()
+    capsys.readouterr()
+
+    cmd_unzip(["-j", "2", "--verify", str(archive_zip)])
+    cmd_untar(["--verify", str(archive_tgz)])
+    assert capsys.readouterr().out.splitlines() == [f"{archive_zip}: OK (4 members)", f"{archive_tgz}: OK (4 members)"]
+
+    (base / "file1.txt").write_text("other")
+    cmd_zip(["--checksums", str(base), str(temp_path / "b.zip")])
+    (temp_path / "b.zip.sha256").write_text((temp_path / "a.zip.sha256").read_text())
+    with pytest.raises(ShellError):
+        cmd_unzip(["--verify", str(temp_path / "b.zip")])
+    assert "file1.txt: SHA-256 mismatch" in capsys.readouterr().out
+
+    data = bytearray(archive_zip.read_bytes())
+    data[len(data) // 3] ^= 0xFF
+    archive_zip.write_bytes(bytes(data))
+    with pytest.raises(ShellError):
+        cmd_unzip(["--verify", str(archive_zip)])
+    assert "FAILED" in capsys.readouterr().out
+
+    data = bytearray(archive_tgz.read_bytes())
+    data[len(data) // 2] ^= 0xFF
+    archive_tgz.write_bytes(bytes(data))
+    with pytest.raises(ShellError):
+        cmd_untar(["--verify", str(archive_tgz)])
+    assert "FAILED" in capsys.readouterr().out
+
+def test_verify_checksums_with_links(temp_dir, mock_create_history_record, capsys):
+    temp_path = normalize(temp_dir)
+    base = temp_path / "links"
+    base.mkdir()
+    (base / "data.txt").write_text("data")
+    (base / "link.txt").symlink_to("data.txt")
+    os.link(base / "data.txt", base / "hard.txt")
+    archive_zip = temp_path / "links.zip"
+    archive_tgz = temp_path / "links.tar.gz"
+    cmd_zip(["--checksums", str(base), str(archive_zip)])
+    cmd_tar(["-j", "2", "--checksums", str(base), str(archive_tgz)])
+    capsys.readouterr()
+
+    cmd_unzip(["--verify", str(archive_zip)])
+    cmd_untar(["--verify", str(archive_tgz)])
+    assert capsys.readouterr().out.splitlines() == [f"{archive_zip}: OK (3 members)", f"{archive_tgz}: OK (1 members)"]
@@ -1,5 +1,12 @@
+import errno
+import os
+
+import pytest
+
+from errors.shell_errors import ShellError
 from src.commands.filesystem import cmd_rm,cmd_cp,cmd_mv
 from src.utils import normalize,ensure_exists
+from src.utils.copying import copy_file
 from unittest.mock import patch
 
 def test_cp(temp_dir, mock_create_history_record):
@@ -53,3 +60,109 @@ def test_rm_without_ask(temp_dir, mock_create_history_record, mock_trash):
     src.write_text("test text")
     cmd_rm([str(src),"-f"])
     assert not src.exists()
+
+def test_cp_recursive_parallel(temp_dir, capsys, mock_create_history_record):
+    temp_path = normalize(temp_dir)
+    src = temp_path / "src_dir"
+    (src / "a" / "b").mkdir(parents=True)
+    for i in range(20):
+        (src / "a" / "b" / f"file{i}.txt").write_text(f"text {i}")
+    (src / "top.txt").write_text("top")
+    dest = temp_path / "copied"
+    cmd_cp(["-r", "-j", "4", str(src), str(dest)])
+    assert (dest / "top.txt").read_text() == "top"
+    assert sorted(p.name for p in (dest / "a" / "b").iterdir()) == sorted(p.name for p in (src / "a" / "b").iterdir())
+    assert "21 files" in capsys.readouterr().out
+
+def test_cp_parallel_collects_errors(temp_dir, capsys, mock_create_history_record):
+    temp_path = normalize(temp_dir)
+    src = temp_path / "src_dir"
+    src.mkdir()
+    (src / "good.txt").write_text("good")
+    os.mkfifo(src / "pipe")
+    dest = temp_path / "copied"
+    with pytest.raises(ShellError):
+        cmd_cp(["-r", "-j2", str(src), str(dest)])
+    assert (dest / "good.txt").read_text() == "good"
+    assert "pipe" in capsys.readouterr().out
+
+def test_cp_verbose_reports_strategy(temp_dir, capsys, mock_create_history_record):
+    temp_path = normalize(temp_dir)
+    src = temp_path / "big.bin"
+    src.write_bytes(os.urandom(3 * 2**20 + 17))
+    src.chmod(0o640)
+    dest = temp_path / "big_copy.bin"
+    cmd_cp(["-v", str(src), str(dest)])
+    assert dest.read_bytes() == src.read_bytes()
+    assert dest.stat().st_mode & 0o777 == 0o640
+    output = capsys.readouterr().out
+    assert any(strategy in output for strategy in ["reflink", "copy_file_range", "sendfile", "buffered"])
+
+def test_copy_file_falls_back_to_buffered(temp_dir):
+    temp_path = normalize(temp_dir)
+    src = temp_path / "data.bin"
+    src.write_bytes(os.urandom(2**20 + 5))
+    dest_dir = temp_path / "dest_dir"
+    dest_dir.mkdir()
+    dest = temp_path / "data_copy.bin"
+    unsupported = OSError(errno.ENOSYS, "not supported")
+    with patch("src.utils.copying._copy_reflink", return_value=False), \
+            patch("src.utils.copying.os.copy_file_range", side_effect=unsupported, create=True), \
+            patch("src.utils.copying.os.sendfile", side_effect=unsupported, create=True):
+        assert copy_file(src, dest_dir) == "buffered"
+    assert (dest_dir / "data.bin").read_bytes() == src.read_bytes()
+    assert copy_file(src, dest) in ["reflink", "copy_file_range", "sendfile"]
+    assert dest.read_bytes() == src.read_bytes()
+
+def test_mv_cross_device_resumes(temp_dir, capsys, monkeypatch, mock_create_history_record):
+    import src.utils.copying as copying
+    temp_path = normalize(temp_dir)
+    src = temp_path / "src_dir"
+    (src / "sub").mkdir(parents=True)
+    (src / "a.txt").write_text("0123456789")
+    (src / "sub" / "b.txt").write_text("abcdefghijklmnopqrstuvwxyz")
+    dest = temp_path / "moved"
+
+    def rename(*args):
+        raise OSError(errno.EXDEV, "Invalid cross-device link")
+
+    copy_chunk = copying._copy_chunk
+    calls = []
+
+    def flaky_copy_chunk(*args):
+        calls.append(args)
+        if len(calls) == 3:
+            raise OSError(errno.EIO, "I/O error")
+        copy_chunk(*args)
+
+    monkeypatch.setattr(copying.os, "rename", rename)
+    monkeypatch.setattr(copying, "MOVE_CHUNK_SIZE", 4)
+    monkeypatch.setattr(copying, "_copy_chunk", flaky_copy_chunk)
+    with pytest.raises(OSError):
+        cmd_mv([str(src), str(dest)])
+    journal = temp_path / ".src_dir.mv-journal"
+    assert src.exists() and journal.exists()
+    copied_chunks = len(journal.read_text().splitlines()) - 1
+    first_run_calls = len(calls)
+    cmd_mv(["-j", "3", str(src), str(dest)])
+    assert not src.exists() and not journal.exists()
+    assert (dest / "a.txt").read_text() == "0123456789"
+    assert (dest / "sub" / "b.txt").read_text() == "abcdefghijklmnopqrstuvwxyz"
+    assert len(calls) - first_run_calls == 10 - copied_chunks
+    assert "MB/s" in capsys.readouterr().out
+
+def test_trash_on_same_filesystem(temp_dir, mock_trash, monkeypatch):
+    import src.utils.helpers as helpers
+    temp_path = normalize(temp_dir)
+    src = temp_path / "file.txt"
+    src.write_text("text")
+    monkeypatch.setattr(helpers, "TRASH_PATH", "/nonexistent/trash")
+    monkeypatch.setattr(helpers, "find_mount_point", lambda path: temp_path)
+    trash_path = helpers.move_to_trash(src)
+    assert trash_path.parent == temp_path / ".trash"
+    assert trash_path.read_text() == "text" and not src.exists()
+    assert (normalize(mock_trash) / ".roots").read_text().splitlines() == [str(temp_path / ".trash")]
+    other_trash = temp_path / "other_trash"
+    monkeypatch.setattr(helpers, "TRASH_DIRS", {str(temp_path): str(other_trash)})
+    other_trash.mkdir()
+    assert helpers.trash_dir_for(trash_path) == other_trash
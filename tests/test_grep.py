@@ -27,3 +27,161 @@ def test_grep_flag_recursive(temp_dir, capsys, mock_create_history_record):
     output = capsys.readouterr().out
     assert "Hello1" in output
     assert "Hello2" in output
+
+def test_grep_parallel_matches_serial(temp_dir, capsys, mock_create_history_record, monkeypatch):
+    import src.commands.grep as grep
+    temp_path = normalize(temp_dir)
+    for d in range(3):
+        sub = temp_path / f"dir{d}" / "nested"
+        sub.mkdir(parents=True)
+        for f in range(10):
+            (sub / f"file{f}.txt").write_text("".join(f"line {i} needle{d}{f}\n" if i % 7 == 0 else f"line {i}\n"
+                                                      for i in range(50)))
+    cmd_grep(["-r", "needle", str(temp_path)])
+    serial = capsys.readouterr().out
+    monkeypatch.setattr(grep, "PARALLEL_MIN_FILES", 4)
+    cmd_grep(["-r", "-j", "3", "needle", str(temp_path)])
+    parallel = capsys.readouterr().out
+    assert serial == parallel
+    assert serial.count("\n") == 3 * 10 * 8
+    assert "nested/file0.txt:1: line 0 needle00" in serial
+
+def test_grep_literal_fast_path_matches_line_search(temp_dir):
+    import re
+    from src.commands.grep import _search_lines, required_literal, search_in_file
+    temp_path = normalize(temp_dir)
+    src = temp_path / "file.txt"
+    src.write_bytes("первая строка\r\nfoo bar\nбез совпадений\nFOO.baz\n\nxfoo\nfoo".encode())
+    assert required_literal("fo+ ba[rz]") == (" ba", False)
+    assert required_literal("foo|bar") == (None, False)
+    for pattern, flags in [("foo", 0), ("foo", re.IGNORECASE), ("o\\.b", re.IGNORECASE),
+                           ("^foo$", 0), ("строка$", 0), ("fo+ ba[rz]", 0), ("x?foo", 0)]:
+        pattern_re = re.compile(pattern, flags)
+        assert list(search_in_file(src, pattern_re)) == list(_search_lines(src, pattern_re)), pattern
+    folded = temp_path / "folded.txt"
+    folded.write_text("lıne one\nLİNE two\nline three\nſky \u212aite\n")
+    for pattern in ["line", "LINE", "sky", "kite"]:
+        pattern_re = re.compile(pattern, re.IGNORECASE)
+        assert list(search_in_file(folded, pattern_re)) == list(_search_lines(folded, pattern_re)), pattern
+    assert len(list(search_in_file(folded, re.compile("line", re.IGNORECASE)))) == 3
+    assert list(search_in_file(src, re.compile("foo"))) == [(2, "foo bar"), (6, "xfoo"), (7, "foo")]
+
+def test_required_literal_skips_quantifiers_and_escapes(temp_dir):
+    import re
+    from src.commands.grep import _search_lines, required_literal, search_in_file
+    temp_path = normalize(temp_dir)
+    src = temp_path / "file.txt"
+    lines = ["xxxxxxxxxx", "xx", "xxx", "Abc", "A12bc", "aab", "9a9", "x{a}", "ab1ab1", "a\tb", "Éé", "ab ab", "abbb"]
+    src.write_text("\n".join(lines) + "\n")
+    assert required_literal("x{10}") == ("x", False)
+    assert required_literal("x{2,3}") == ("x", False)
+    assert required_literal("\\x41bc") == ("bc", False)
+    assert required_literal("ab{0,2}c") == ("a", False)
+    assert required_literal("x{a}") == ("x{a}", True)
+    patterns = ["x{10}", "x{2,3}", "x{,3}", "\\x41bc", "\\u0041bc", "\\N{LATIN CAPITAL LETTER A}bc", "\\101bc",
+                "\\0", "(ab1)\\1", "a\\tb", "\\d\\d", "\\w+b", "x{a}", "ab{2,}", "ab{1}", "(ab) \\1", "a+?b",
+                "\\u00c9", "[\\]x]{2}"]
+    for pattern in patterns:
+        pattern_re = re.compile(pattern)
+        expected = [(i, line) for i, line in enumerate(lines, 1) if pattern_re.search(line)]
+        assert list(_search_lines(src, pattern_re)) == expected, pattern
+        assert list(search_in_file(src, pattern_re)) == expected, pattern
+        literal, _ = required_literal(pattern)
+        assert all(literal in line for _, line in expected if literal), pattern
+
+def test_grep_binary_files(temp_dir, capsys, mock_create_history_record):
+    temp_path = normalize(temp_dir)
+    (temp_path / "data.bin").write_bytes(b"\x00\x01needle\x00\nneedle")
+    (temp_path / "text.txt").write_text("needle\n")
+    cmd_grep(["-r", "needle", str(temp_path)])
+    output = capsys.readouterr().out
+    assert f"Binary file {temp_path / 'data.bin'} matches\n" in output
+    assert "text.txt:1: needle" in output
+    cmd_grep(["-r", "-I", "needle", str(temp_path)])
+    output = capsys.readouterr().out
+    assert "data.bin" not in output
+    assert "text.txt:1: needle" in output
+
+def test_grep_globs_and_ignore_files(temp_dir, capsys, mock_create_history_record):
+    temp_path = normalize(temp_dir)
+    for rel in ["a.py", "b.txt", "node_modules/m.py", "build/out.py", "src/build/keep.py",
+                "src/gen.log", "src/keep.log", ".trash/old.py"]:
+        (temp_path / rel).parent.mkdir(parents=True, exist_ok=True)
+        (temp_path / rel).write_text("needle\n")
+    (temp_path / ".gitignore").write_text("# build output\n/build/\n*.log\n!keep.log\n")
+    cmd_grep(["-r", "--exclude-dir", "node_modules", "needle", str(temp_path)])
+    found = {line.split(":")[0] for line in capsys.readouterr().out.splitlines()}
+    assert found == {str(temp_path / rel) for rel in ["a.py", "b.txt", "src/build/keep.py", "src/keep.log"]}
+    cmd_grep(["-r", "--include=*.py", "--exclude", "b*", "--no-ignore", "needle", str(temp_path)])
+    found = {line.split(":")[0] for line in capsys.readouterr().out.splitlines()}
+    assert found == {str(temp_path / rel) for rel in ["a.py", "node_modules/m.py", "build/out.py", "src/build/keep.py"]}
+
+def test_grep_index_matches_full_scan(temp_dir, capsys, mock_create_history_record, monkeypatch):
+    import os
+    import src.utils.grep_index as grep_index
+    temp_path = normalize(temp_dir)
+    monkeypatch.setattr(grep_index, "GREP_INDEX_PATH", temp_path / "index")
+    tree = temp_path / "tree"
+    for i in range(20):
+        (tree / f"dir{i % 3}").mkdir(parents=True, exist_ok=True)
+        (tree / f"dir{i % 3}" / f"file{i}.log").write_text(f"line {i}\n" + ("ERROR disk full\n" if i % 5 == 0 else ""))
+    (tree / "dir0" / "dotless.log").write_text("lıne one\nERROR DİSK\n")
+    for args in (["ERROR disk"], ["-i", "error"], ["-i", "DISK"], ["d[i]sk full$"], ["^line"], ["-i", "line"]):
+        cmd_grep(["-r", *args, str(tree)])
+        full = capsys.readouterr().out
+        cmd_grep(["-r", "--index", *args, str(tree)])
+        assert capsys.readouterr().out == full, args
+
+    changed = tree / "dir1" / "file1.log"
+    changed.write_text("ERROR disk quota\n")
+    os.utime(changed, ns=(1, 1))
+    (tree / "dir0" / "file0.log").unlink()
+    cmd_grep(["-r", "--index", "ERROR disk", str(tree)])
+    output = capsys.readouterr().out
+    assert "file1.log:1: ERROR disk quota" in output
+    assert "file0.log" not in output
+    assert output.count("\n") == 4
+    conn = grep_index._connect(tree)
+    assert grep_index.update_index(conn, list(tree.rglob("*.log"))) == 0
+    conn.close()
+    candidates = grep_index.candidate_files(tree, sorted(tree.rglob("*.log")), "disk quota")
+    assert candidates == [changed]
+
+def test_grep_index_quantifier_and_escape_patterns(temp_dir, capsys, mock_create_history_record, monkeypatch):
+    import src.utils.grep_index as grep_index
+    temp_path = normalize(temp_dir)
+    monkeypatch.setattr(grep_index, "GREP_INDEX_PATH", temp_path / "index")
+    tree = temp_path / "tree"
+    tree.mkdir()
+    for i, text in enumerate(["xxxxxxxxxx\n", "x10 x{10}\n", "Abcdef\n", "41bcdef\n", "id 1234 end\n", "2,3 xyz\n"]):
+        (tree / f"file{i}.txt").write_text(text)
+    for pattern in ["x{10}", "x{2,3}z?", "\\x41bcdef", "\\u0041bcd", "id \\d{4} end", "\\101bcdef", "(x)\\1{3}"]:
+        cmd_grep(["-r", pattern, str(tree)])
+        full = capsys.readouterr().out
+        assert full, pattern
+        cmd_grep(["-r", "--index", pattern, str(tree)])
+        assert capsys.readouterr().out == full, pattern
+
+def test_grep_count_files_and_max_count(temp_dir, capsys, mock_create_history_record):
+    temp_path = normalize(temp_dir)
+    (temp_path / "a.txt").write_text("hit 1\nmiss\nhit 2\nhit 3\n")
+    (temp_path / "b.txt").write_text("miss\n")
+    cmd_grep(["-r", "-c", "hit", str(temp_path)])
+    assert capsys.readouterr().out == f"{temp_path / 'a.txt'}:3\n{temp_path / 'b.txt'}:0\n"
+    cmd_grep(["-r", "-l", "hit", str(temp_path)])
+    assert capsys.readouterr().out == f"{temp_path / 'a.txt'}\n"
+    cmd_grep(["-m", "2", "hit", str(temp_path / "a.txt")])
+    assert capsys.readouterr().out == f"{temp_path / 'a.txt'}:1: hit 1\n{temp_path / 'a.txt'}:3: hit 2\n"
+    cmd_grep(["-c", "-m1", "h.t", str(temp_path / "a.txt")])
+    assert capsys.readouterr().out == f"{temp_path / 'a.txt'}:1\n"
+
+def test_grep_writes_output_in_batches(monkeypatch):
+    import io
+    import sys
+    from src.commands.grep import write_lines
+    out = io.StringIO()
+    writes = []
+    monkeypatch.setattr(out, "write", lambda text: writes.append(text))
+    monkeypatch.setattr(sys, "stdout", out)
+    write_lines((f"line {i}" for i in range(5)), batch_size=2)
+    assert writes == ["line 0\nline 1\n", "line 2\nline 3\n", "line 4\n"]
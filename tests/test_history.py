@@ -0,0 +1,127 @@
+import json
+import pathlib
+from unittest.mock import patch
+
+import pytest
+
+import src.history as history
+from src.history import create_history_record, get_last_history_number, rebuild_history_index
+from src.history.jsonl import INDEX_ENTRY, JsonlHistory
+
+
+def test_last_number_from_index(mock_history_path):
+    for i in range(1, 4):
+        create_history_record({"cmd": "ls", "user_input": "ls", "number": i})
+    assert JsonlHistory(history.HISTORY_PATH).index_path.stat().st_size == 3 * INDEX_ENTRY.size
+    assert get_last_history_number() == 3
+
+
+def test_migrate_plain_history(mock_history_path):
+    lines = [json.dumps({"cmd": "ls", "user_input": "ls", "number": i}) for i in (5, 2, 7)]
+    pathlib.Path(history.HISTORY_PATH).write_text("\n".join(lines) + "\n")
+    assert get_last_history_number() == 7
+    assert not JsonlHistory(history.HISTORY_PATH).index_path.exists()
+    create_history_record({"cmd": "pwd", "user_input": "pwd", "number": 8})
+    assert get_last_history_number() == 8
+    assert rebuild_history_index() == 8
+
+
+def test_stale_index_is_rebuilt(mock_history_path):
+    create_history_record({"cmd": "ls", "user_input": "ls", "number": 1})
+    with open(history.HISTORY_PATH, "a") as f:
+        f.write(json.dumps({"cmd": "ls", "user_input": "ls", "number": 10}) + "\n")
+    assert get_last_history_number() == 10
+    create_history_record({"cmd": "ls", "user_input": "ls", "number": 11})
+    assert get_last_history_number() == 11
+
+
+def test_iter_history_reversed(mock_history_path):
+    for i in range(1, 2001):
+        create_history_record({"cmd": "ls", "user_input": f"ls {i}", "number": i})
+    records = history.iter_history_reversed()
+    assert [next(records)["number"] for _ in range(3)] == [2000, 1999, 1998]
+    assert history.get_last_history(3) == [(1998, "ls 1998"), (1999, "ls 1999"), (2000, "ls 2000")]
+
+
+def test_undo_cmd_stops_at_command_boundary(mock_history_path):
+    create_history_record({"cmd": "cp", "user_input": "cp a b", "number": 1})
+    for name in ("x", "y"):
+        create_history_record({"cmd": "mv", "src": name, "user_input": "mv x y dir", "number": 2, "multi": 3})
+    records = history.get_last_history_undo_cmd()
+    assert [r["src"] for r in records] == ["y", "x"]
+
+
+def test_reverted_records_are_hidden_and_compacted(mock_history_path):
+    create_history_record({"cmd": "cp", "user_input": "cp a b", "number": 1})
+    create_history_record({"cmd": "mv", "user_input": "mv c d", "number": 2})
+    create_history_record({"cmd": "undo", "user_input": "undo", "number": 3, "reverted": 2})
+    assert history.get_last_history_undo_cmd()[0]["number"] == 1
+    assert history.get_last_history() == [(1, "cp a b"), (3, "undo")]
+    assert history.compact_history() == 1
+    assert "mv c d" not in pathlib.Path(history.HISTORY_PATH).read_text()
+    assert get_last_history_number() == 3
+    create_history_record({"cmd": "ls", "user_input": "ls", "number": 4})
+    assert history.get_last_history() == [(1, "cp a b"), (3, "undo"), (4, "ls")]
+
+
+def test_history_session_writes_once(mock_history_path):
+    create_history_record({"cmd": "ls", "user_input": "ls", "number": 1})
+    with patch("src.history.jsonl.os.fsync") as fsync:
+        with history.HistorySession(fsync_policy="command") as session:
+            for name in ("a", "b", "c"):
+                create_history_record({"cmd": "rm", "src": name, "user_input": "rm a b c",
+                                       "number": session.number, "multi": 3})
+            assert history.get_last_history_number() == 1
+        fsync.assert_called_once()
+    assert session.number == 2
+    assert get_last_history_number() == 2
+    assert [r["src"] for r in history.get_last_history_undo_cmd()] == ["c", "b", "a"]
+    assert JsonlHistory(history.HISTORY_PATH).index_path.stat().st_size == 4 * INDEX_ENTRY.size
+
+
+@pytest.mark.parametrize("backend", ["jsonl", "sqlite"])
+def test_query_history(mock_history_path, monkeypatch, backend):
+    monkeypatch.setattr(history, "HISTORY_BACKEND", backend)
+    create_history_record({"cmd": "rm", "user_input": "rm notes.txt", "number": 1})
+    create_history_record({"cmd": "cp", "user_input": "cp Notes.txt backup", "number": 2})
+    create_history_record({"cmd": "rm", "user_input": "rm old.log", "number": 3})
+    create_history_record({"cmd": "undo", "user_input": "undo", "number": 4, "reverted": 3})
+    assert get_last_history_number() == 4
+    assert history.query_history(cmd="rm") == [(1, "rm notes.txt")]
+    assert history.query_history(pattern="notes") == [(1, "rm notes.txt"), (2, "cp Notes.txt backup")]
+    assert history.query_history(pattern="s.t", cmd="cp") == [(2, "cp Notes.txt backup")]
+    assert history.query_history(since="2000-01-01", n=1) == [(4, "undo")]
+    assert history.query_history(since="9999-01-01") == []
+    assert history.get_last_history_undo_cmd()[0]["number"] == 2
+    assert history.compact_history() == 1
+
+
+def test_sqlite_imports_jsonl_history(mock_history_path, monkeypatch):
+    create_history_record({"cmd": "cp", "user_input": "cp a b", "number": 1})
+    create_history_record({"cmd": "ls", "user_input": "ls", "number": 2})
+    monkeypatch.setattr(history, "HISTORY_BACKEND", "sqlite")
+    assert get_last_history_number() == 2
+    assert history.get_last_history() == [(1, "cp a b"), (2, "ls")]
+    create_history_record({"cmd": "pwd", "user_input": "pwd", "number": 3})
+    assert history.get_last_history(1) == [(3, "pwd")]
+
+
+def test_sqlite_query_uses_fts_index(mock_history_path, monkeypatch):
+    import sqlite3
+    from src.history import sqlite
+    if not sqlite.fts_available():
+        pytest.skip("SQLite without FTS5 trigram tokenizer")
+    monkeypatch.setattr(history, "HISTORY_BACKEND", "sqlite")
+    create_history_record({"cmd": "rm", "user_input": "rm notes.txt", "number": 1})
+    statements = []
+    connect = sqlite3.connect
+
+    def traced_connect(*args, **kwargs):
+        conn = connect(*args, **kwargs)
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    monkeypatch.setattr(sqlite.sqlite3, "connect", traced_connect)
+    assert history.query_history(pattern="NOTES") == [(1, "rm notes.txt")]
+    assert any("history_fts MATCH" in sql for sql in statements)
+    assert not any("instr(" in sql for sql in statements)
@@ -49,3 +49,140 @@ def test_missing_dir():
         cmd_ls(["/not_existing_path"])
     except ShellError as e:
         assert "no such" in str(e)
+
+def test_ls_l_uses_one_stat_and_cached_names(capsys, temp_dir, mock_create_history_record, monkeypatch):
+    import os
+    import pwd
+    import src.commands.info as info
+    temp_path = normalize(temp_dir)
+    for i in range(5):
+        (temp_path / f"file{i}.txt").write_text("x" * i)
+    (temp_path / "sub").mkdir()
+    os.symlink(temp_path / "missing", temp_path / "broken")
+    info.user_name.cache_clear()
+    lookups = []
+    real_getpwuid = pwd.getpwuid
+    monkeypatch.setattr(info.pwd, "getpwuid", lambda uid: lookups.append(uid) or real_getpwuid(uid))
+    cmd_ls([str(temp_path), "-l"])
+    cmd_ls([str(temp_path), "-l"])
+    lines = capsys.readouterr().out.splitlines()
+    assert lookups == [os.getuid()]
+    file_line = next(line for line in lines if line.endswith(" file3.txt"))
+    owner = real_getpwuid(os.getuid()).pw_name
+    assert file_line.startswith("-rw") and f" {owner} " in file_line and " 3 " in file_line
+    assert any(line.startswith("drwx") and line.endswith(" sub") for line in lines)
+    assert any(line.startswith("l") and line.endswith(" broken") for line in lines)
+
+def test_ls_external_sort_matches_in_memory(capsys, temp_dir, mock_create_history_record, monkeypatch):
+    import src.commands.info as info
+    temp_path = normalize(temp_dir)
+    for i in range(23):
+        (temp_path / f"f{(i * 7) % 23:02d}").write_text("")
+    (temp_path / ".hidden").write_text("")
+    cmd_ls([str(temp_path)])
+    in_memory = capsys.readouterr().out
+    monkeypatch.setattr(info, "LS_SORT_CHUNK", 4)
+    assert [name for name, _ in info.sorted_names(temp_path, hidden=True)] == sorted(
+        p.name for p in temp_path.iterdir())
+    cmd_ls([str(temp_path)])
+    assert capsys.readouterr().out == in_memory
+    assert in_memory.splitlines()[0] == "f00  f01  f02  f03  f04  "
+    assert len(in_memory.splitlines()) == 5
+
+def test_ls_external_sort_reads_chunks_incrementally(temp_dir, monkeypatch):
+    import tracemalloc
+    import src.commands.info as info
+    temp_path = normalize(temp_dir)
+    names = [f"{(i * 7919) % 20_000:05d}-{'x' * 40}" for i in range(20_000)]
+    for name in names:
+        (temp_path / name).touch()
+    monkeypatch.setattr(info, "LS_SORT_READ_SIZE", 1000)
+    tracemalloc.start()
+    try:
+        merged = info.sorted_names(temp_path, chunk_size=1000)
+        first = next(merged)
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert first == (min(names), len(names[0]))
+    assert current < 500_000
+    assert [first[0]] + [name for name, _ in merged] == sorted(names)
+
+def test_ls_unsorted_streams_entries(capsys, temp_dir, mock_create_history_record):
+    temp_path = normalize(temp_dir)
+    names = {f"file{i}" for i in range(12)}
+    for name in names:
+        (temp_path / name).write_text("")
+    cmd_ls([str(temp_path), "-U"])
+    header, *lines = capsys.readouterr().out.splitlines()
+    assert header == f"{temp_path}: "
+    assert len(lines) == len(names) and set(lines) == names
+    cmd_ls([str(temp_path), "-U", "-l"])
+    lines = capsys.readouterr().out.splitlines()[1:]
+    assert {line.split()[-1] for line in lines} == names
+
+def test_du_counts_hardlinks_once_and_limits_depth(capsys, temp_dir, mock_create_history_record):
+    import os
+    from src.commands.info import cmd_du
+    temp_path = normalize(temp_dir)
+    (temp_path / "a" / "b").mkdir(parents=True)
+    (temp_path / "a" / "one.bin").write_bytes(b"x" * 1000)
+    (temp_path / "a" / "b" / "two.bin").write_bytes(b"x" * 3000)
+    os.link(temp_path / "a" / "b" / "two.bin", temp_path / "a" / "link.bin")
+    dirs_size = sum(os.lstat(p).st_size for p in (temp_path, temp_path / "a", temp_path / "a" / "b"))
+    cmd_du(["--apparent-size", "-a", "-j", "3", str(temp_path)])
+    sizes = {line.split("\t")[1]: line.split("\t")[0] for line in capsys.readouterr().out.splitlines()}
+    assert sizes[str(temp_path)] == str(-(-(dirs_size + 4000) // 1024))
+    assert len([p for p in sizes if p.endswith(".bin")]) == 2
+    assert list(sizes)[-1] == str(temp_path)
+
+    cmd_du(["--apparent-size", "-h", "-d", "1", str(temp_path)])
+    lines = capsys.readouterr().out.splitlines()
+    assert [line.split("\t")[1] for line in lines] == [str(temp_path / "a"), str(temp_path)]
+    cmd_du(["-s", str(temp_path)])
+    assert capsys.readouterr().out.splitlines()[0].endswith(f"\t{temp_path}")
+
+def test_human_size():
+    from src.utils.helpers import human_size
+    assert [human_size(n) for n in (0, 1023, 1024, 1536, 10 * 1024 + 1, 5 * 1024 ** 3)] == \
+        ["0", "1023", "1.0K", "1.5K", "11K", "5.0G"]
+
+def test_ls_recursive(capsys, temp_dir, mock_create_history_record):
+    temp_path = normalize(temp_dir)
+    (temp_path / "b" / "c").mkdir(parents=True)
+    (temp_path / ".hidden").mkdir()
+    (temp_path / "a.txt").write_text("")
+    (temp_path / "b" / "c" / "d.txt").write_text("")
+    cmd_ls([str(temp_path), "-R", "-j", "2"])
+    output = capsys.readouterr().out
+    assert output == (f"{temp_path}:\na.txt  b      \n\n{temp_path / 'b'}:\nc  \n\n"
+                      f"{temp_path / 'b' / 'c'}:\nd.txt  \n")
+
+def test_walk_parallel_bounds_prefetch(temp_dir, monkeypatch):
+    import threading
+    import src.utils.walk as walk
+    temp_path = normalize(temp_dir)
+    for i in range(30):
+        (temp_path / f"d{i:02}" / "sub").mkdir(parents=True)
+    monkeypatch.setattr(walk, "WALK_WINDOW_PER_JOB", 2)
+    scanned = []
+    lock = threading.Lock()
+    scan_directory = walk.scan_directory
+
+    def counting_scan(path):
+        with lock:
+            scanned.append(path)
+        return scan_directory(path)
+
+    monkeypatch.setattr(walk, "scan_directory", counting_scan)
+    walker = walk.walk_parallel(temp_path, jobs=2)
+    visited = []
+    for path, _, entries, error in walker:
+        assert error is None
+        visited.append(path)
+        assert len(scanned) <= len(visited) + 2 * 2
+    expected = [str(temp_path)]
+    for i in range(30):
+        expected += [str(temp_path / f"d{i:02}"), str(temp_path / f"d{i:02}" / "sub")]
+    assert visited == expected
+    assert sorted(scanned) == sorted(expected)
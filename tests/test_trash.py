@@ -0,0 +1,60 @@
+import json
+import pathlib
+import time
+
+import pytest
+
+from errors.shell_errors import ShellError
+from src.commands.filesystem import cmd_rm
+from src.commands.trash import cmd_trash
+from src.commands.undo import cmd_undo
+from src.utils import normalize
+from src.utils.trash import INDEX_NAME, collect_garbage, list_trash
+
+
+def create_files(base, sizes):
+    paths = []
+    for i, size in enumerate(sizes):
+        path = base / f"file{i}.bin"
+        path.write_bytes(b"x" * size)
+        paths.append(path)
+    return paths
+
+
+def test_rm_indexes_trash(temp_dir, capsys, mock_trash, mock_create_history_record):
+    temp_path = normalize(temp_dir)
+    paths = create_files(temp_path, [10, 20])
+    (temp_path / "dir").mkdir()
+    (temp_path / "dir" / "inner.txt").write_text("inner")
+    cmd_rm(["-f"] + [str(p) for p in paths])
+    cmd_rm(["-r", "-f", str(temp_path / "dir")])
+    items = list_trash()
+    assert [item["src"] for item in items] == [str(p) for p in paths] + [str(temp_path / "dir")]
+    assert [item["size"] for item in items] == [10, 20, None]
+    cmd_trash(["list"])
+    assert str(paths[1]) in capsys.readouterr().out
+
+
+def test_gc_purges_oldest_first(temp_dir, mock_trash, mock_create_history_record):
+    temp_path = normalize(temp_dir)
+    paths = create_files(temp_path, [100, 100, 100])
+    cmd_rm(["-f"] + [str(p) for p in paths])
+    index = pathlib.Path(mock_trash) / INDEX_NAME
+    entries = [json.loads(line) for line in index.read_text().splitlines()]
+    for age, entry in zip([300, 200, 100], entries):
+        entry["time"] = time.time() - age
+    index.write_text("".join(json.dumps(e) + "\n" for e in entries))
+    assert collect_garbage(max_bytes=150, max_age=None) == (2, 200)
+    assert [item["src"] for item in list_trash()] == [str(paths[2])]
+    assert collect_garbage(max_bytes=None, max_age=50) == (1, 100)
+    assert list_trash() == []
+
+
+def test_undo_rm_after_gc(temp_dir, mock_trash, mock_history_path):
+    temp_path = normalize(temp_dir)
+    (path,) = create_files(temp_path, [10])
+    cmd_rm(["-f", str(path)])
+    collect_garbage(max_bytes=0, max_age=None)
+    with pytest.raises(ShellError, match="completely deleted"):
+        cmd_undo([])
+    assert not path.exists()
@@ -1,3 +1,6 @@
+import pytest
+
+from errors.shell_errors import ShellError
 from src.utils import normalize
 from src.commands.undo import cmd_undo
 from src.commands.filesystem import cmd_cp,cmd_mv,cmd_rm
@@ -46,3 +49,68 @@ def test_undo_rm(temp_dir,mock_history_path,mock_trash):
     assert not src1.exists()
     cmd_undo([])
     assert src1.exists()
+
+def test_undo_twice(temp_dir,mock_history_path):
+    temp_path = normalize(temp_dir)
+    src1 = temp_path / "file1.txt"
+    src1.write_text("test")
+    dest1 = temp_path / "copy1.txt"
+    dest2 = temp_path / "copy2.txt"
+    cmd_cp([str(src1),str(dest1)])
+    cmd_cp([str(src1),str(dest2)])
+    cmd_undo([])
+    assert dest1.exists() and not dest2.exists()
+    cmd_undo([])
+    assert not dest1.exists()
+
+def test_undo_mv_cross_device(temp_dir,mock_history_path,monkeypatch):
+    import errno
+    import src.utils.copying as copying
+
+    def rename(*args):
+        raise OSError(errno.EXDEV, "Invalid cross-device link")
+
+    monkeypatch.setattr(copying.os, "rename", rename)
+    temp_path = normalize(temp_dir)
+    src1 = temp_path / "file1.txt"
+    src1.write_text("test1")
+    dest = temp_path / "dir"
+    dest.mkdir()
+    cmd_mv([str(src1),str(dest)])
+    assert (dest / "file1.txt").read_text() == "test1" and not src1.exists()
+    cmd_undo([])
+    assert src1.read_text() == "test1" and not (dest / "file1.txt").exists()
+
+def test_undo_failed_record_can_be_retried(temp_dir,mock_history_path,mock_trash):
+    import shutil
+    import src.history as history
+    temp_path = normalize(temp_dir)
+    src1 = temp_path / "a.txt"
+    src1.write_text("a")
+    src2 = temp_path / "b.txt"
+    src2.write_text("b")
+    with patch("builtins.input",return_value="y"):
+        cmd_rm([str(src1),str(src2)])
+    restored, broken = history.get_last_history_undo_cmd()
+    shutil.move(broken["trash_path"], temp_path / "backup")
+    with pytest.raises(ShellError):
+        cmd_undo([])
+    assert normalize(restored["src"]).exists() and not normalize(broken["src"]).exists()
+    shutil.move(temp_path / "backup", broken["trash_path"])
+    cmd_undo([])
+    assert src1.read_text() == "a" and src2.read_text() == "b"
+
+def test_undo_rm_of_purged_file_fails_even_if_name_reused(temp_dir,mock_history_path,mock_trash):
+    import os
+    import src.history as history
+    temp_path = normalize(temp_dir)
+    src1 = temp_path / "file1.txt"
+    src1.write_text("old")
+    with patch("builtins.input",return_value="y"):
+        cmd_rm([str(src1)])
+    os.remove(history.get_last_history_undo_cmd()[0]["trash_path"])
+    src1.write_text("unrelated")
+    with pytest.raises(ShellError, match="completely deleted"):
+        cmd_undo([])
+    assert src1.read_text() == "unrelated"
+    assert history.get_last_history_undo_cmd()[0]["cmd"] == "rm"
@@ -1,3 +1,7 @@
+import contextlib
+import io
+from unittest.mock import patch
+
 import pytest
 
 from src.commands.viewer import cmd_cd,cmd_cat,cmd_history
@@ -67,3 +71,64 @@ def test_history_records_multiple(capsys,mock_history_path):
     assert "cp 0 0.txt" in output
     assert "cp 1 1.txt" in output
     assert "cp 2 2.txt" not in output
+
+def test_history_query(capsys,mock_history_path):
+    create_history_record({"cmd": "rm", "user_input": "rm a.txt", "number": 1})
+    create_history_record({"cmd": "cp", "user_input": "cp a.txt b.txt", "number": 2})
+    cmd_history(["--cmd", "rm"])
+    output = capsys.readouterr().out
+    assert "rm a.txt" in output and "cp a.txt" not in output
+    cmd_history(["--grep", "B.TXT", "--since", "2000-01-01"])
+    output = capsys.readouterr().out
+    assert "cp a.txt b.txt" in output and "rm a.txt" not in output
+    with pytest.raises(ShellError):
+        cmd_history(["--since", "yesterday"])
+
+def test_cat_streams_binary_and_large_files(temp_dir, capsysbinary, mock_create_history_record, monkeypatch):
+    import src.commands.viewer as viewer
+    temp_path = normalize(temp_dir)
+    data = bytes(range(256)) * 50
+    (temp_path / "data.bin").write_bytes(data)
+    (temp_path / "text.txt").write_bytes("строка\n".encode() * 3)
+    monkeypatch.setattr(viewer, "CAT_CHUNK_SIZE", 1000)
+    cmd_cat([str(temp_path / "data.bin"), str(temp_path / "text.txt")])
+    assert capsysbinary.readouterr().out == data + "строка\n".encode() * 3
+
+def test_head_and_tail(temp_dir, capsys, mock_create_history_record):
+    from src.commands.viewer import cmd_head, cmd_tail, tail_offset
+    temp_path = normalize(temp_dir)
+    f = temp_path / "log.txt"
+    f.write_text("".join(f"line {i}\n" for i in range(1, 101)))
+    cmd_head(["-n", "3", str(f)])
+    assert capsys.readouterr().out == "line 1\nline 2\nline 3\n"
+    cmd_tail(["-n2", str(f)])
+    assert capsys.readouterr().out == "line 99\nline 100\n"
+    cmd_tail([str(f)])
+    assert capsys.readouterr().out.splitlines() == [f"line {i}" for i in range(91, 101)]
+    with contextlib.redirect_stdout(io.StringIO()) as out:
+        cmd_head(["-n", "2", str(f)])
+    assert out.getvalue() == "line 1\nline 2\n"
+    with patch("src.commands.viewer.create_history_record") as record, pytest.raises(ShellError):
+        cmd_tail([str(temp_path / "missing.txt")])
+    record.assert_not_called()
+    with open(f, "rb") as fh:
+        assert tail_offset(fh, 1, block_size=4) == len("".join(f"line {i}\n" for i in range(1, 100)))
+        assert tail_offset(fh, 500, block_size=16) == 0
+        assert tail_offset(fh, 0) == f.stat().st_size
+
+def test_tail_follow(temp_dir, capsys, mock_create_history_record, monkeypatch):
+    import src.commands.viewer as viewer
+    from src.commands.viewer import cmd_tail
+    temp_path = normalize(temp_dir)
+    f = temp_path / "log.txt"
+    f.write_text("old\n")
+    steps = iter([lambda: f.open("a").write("new 1\n"), lambda: f.write_text("rotated\n")])
+
+    def sleep(_):
+        step = next(steps, None)
+        if step is None:
+            raise KeyboardInterrupt
+        step()
+    monkeypatch.setattr(viewer.time, "sleep", sleep)
+    cmd_tail(["-f", str(f)])
+    assert capsys.readouterr().out == "old\nnew 1\nrotated\n"